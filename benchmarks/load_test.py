@@ -0,0 +1,630 @@
+"""Load test the core API flows against a real server.
+
+Starts the app under gunicorn, as in production, on a scratch PostgreSQL
+database. The database is seeded with a synthetic catalog, customers and
+order history. Concurrent clients then send a weighted mix of browse,
+checkout, POS sale, dispatch, driver-location and notification requests. The
+report gives throughput, errors, p50/p95/p99 latency and server-side
+database time for each endpoint. Each run is saved as JSON under
+benchmarks/results/, and a later run can be checked against one of those
+files:
+
+    python -m benchmarks.load_test --scale small --duration 30 --clients 8
+    python -m benchmarks.load_test --mix checkout=3,browse_products=1
+    python -m benchmarks.load_test --baseline benchmarks/results/<run>.json
+
+The database is wiped and reseeded. Only point --database-url (or
+LOADTEST_DATABASE_URL) at a throwaway database. Without one, a temporary
+cluster is created with initdb and pg_ctl. They must be on PATH or in PG_BIN,
+and cannot run as root. Most blueprints need PostgreSQL, so there is no
+SQLite-only mode. SQLITE_DB_PATH points the app's SQLite store (POS sales and
+products, order management, dashboards) at a fresh file in the run directory,
+seeded with the same catalog, so src/dankdash.db is never written.
+
+Notifications stay on this machine. SendGrid, Gmail and the Twilio REST
+client are never configured. The voice-AI notification flow uses its
+simulated Twilio channel, which only writes to the integration event log.
+Rate limiting is off on the server under test, since all traffic comes from
+one address. Other settings, e.g. LOAD_SHEDDING_ENABLED, are passed through
+from the environment.
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import argparse
+import glob
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'results')
+GUNICORN_CONFIG = os.path.join(REPO_ROOT, 'gunicorn.conf.py')
+
+SCALES = {
+    'small': {'products': 200, 'customers': 2000, 'orders': 10000, 'drivers': 20},
+    'medium': {'products': 2000, 'customers': 50000, 'orders': 250000, 'drivers': 100},
+    'large': {'products': 10000, 'customers': 250000, 'orders': 2000000, 'drivers': 500}
+}
+
+# Tables the seed owns; truncated before every run so runs start from the same state
+SEEDED_TABLES = [
+    'inventory', 'inventory_adjustments', 'orders', 'order_items', 'pos_transactions', 'customers',
+    'accounting_entries', 'sku_daily_sales', 'daily_sales_rollup', 'idempotency_keys',
+    'pos_integration_sales', 'integration_logs', 'auth_sessions'
+]
+
+CATEGORIES = ['Flower', 'Pre-Rolls', 'Edibles', 'Concentrates', 'Vapes', 'Topicals', 'Accessories']
+STRAINS = ['Blue Dream', 'OG Kush', 'Sour Diesel', 'Gelato', 'Wedding Cake', 'Gorilla Glue', 'Durban Poison',
+           'Pineapple Express', 'Northern Lights', 'Jack Herer', 'Granddaddy Purple', 'Green Crack']
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Patel', 'Johnson', 'Nguyen', 'Kim', 'Brown', 'Lopez', 'Davis']
+ORDER_STATUSES = ['delivered'] * 8 + ['pending', 'cancelled']
+DELIVERY_STATUSES = ['assigned', 'picked_up', 'in_transit', 'delivered']
+
+# Driver pings are scattered around this point
+DEPOT = (39.7392, -104.9903)
+
+REQUEST_TIMEOUT_SECONDS = 30
+
+class SeedData:
+    """Synthetic catalog and customers, regenerated identically from the seed"""
+
+    def __init__(self, scale, seed):
+        rng = random.Random(seed)
+        self.scale = scale
+        self.products = [{
+            'sku': f'LT-{i:06d}',
+            'name': f'{rng.choice(STRAINS)} {category} {i}',
+            'category': category,
+            'price': round(rng.uniform(5, 80), 2),
+            'stock': rng.randint(1000, 100000),
+            'thc': round(rng.uniform(0, 30), 2),
+            'cbd': round(rng.uniform(0, 5), 2)
+        } for i, category in ((i, rng.choice(CATEGORIES)) for i in range(scale['products']))]
+        self.customers = [{
+            'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            'email': f'customer{i}@loadtest.invalid',
+            'phone': f'+1555{i:07d}'
+        } for i in range(scale['customers'])]
+
+    def customer(self, rng):
+        # Skewed so a minority of customers place most orders
+        return self.customers[int(len(self.customers) * rng.random() ** 2)]
+
+    def cart(self, rng):
+        return [{
+            'id': product['sku'],
+            'name': product['name'],
+            'price': product['price'],
+            'quantity': rng.randint(1, 3)
+        } for product in rng.sample(self.products, rng.randint(1, min(4, len(self.products))))]
+
+# Each scenario: (method, route as reported by Flask, builder returning (path, body, headers))
+def browse_products(rng, data):
+    return '/api/products', None, {}
+
+def browse_inventory(rng, data):
+    return f'/api/inventory?category={rng.choice(CATEGORIES)}', None, {}
+
+def pos_products(rng, data):
+    return '/api/pos/products', None, {}
+
+def checkout(rng, data):
+    customer = data.customer(rng)
+    return '/api/checkout', {
+        'customer': customer,
+        'items': data.cart(rng),
+        'paymentMethod': 'card',
+        'fulfillmentMethod': rng.choice(['delivery', 'pickup'])
+    }, {'Idempotency-Key': str(uuid.UUID(int=rng.getrandbits(128)))}
+
+def pos_sale(rng, data):
+    return '/api/pos/sale', {
+        'customer': data.customer(rng),
+        'items': data.cart(rng),
+        'payment': {'method': 'cash', 'amountReceived': 500},
+        'cashier': 'Load Test'
+    }, {}
+
+def available_drivers(rng, data):
+    return '/api/dispatch/available-drivers', None, {}
+
+def delivery_status(rng, data):
+    return f'/api/dispatch/delivery-status/{rng.randint(1, data.scale["drivers"] * 10)}', {
+        'status': rng.choice(DELIVERY_STATUSES)
+    }, {}
+
+def location_ping(rng, data):
+    return f'/api/dispatch/driver-location/{rng.randint(1, data.scale["drivers"])}', {
+        'latitude': round(DEPOT[0] + rng.uniform(-0.2, 0.2), 6),
+        'longitude': round(DEPOT[1] + rng.uniform(-0.2, 0.2), 6)
+    }, {}
+
+def notify(rng, data):
+    customer = data.customer(rng)
+    return '/api/voice-ai/checkout-integration', {
+        'order_data': {
+            'customer_email': customer['email'],
+            'customer_phone': customer['phone'],
+            'order_number': f'LT-{rng.getrandbits(32):08X}',
+            'total': round(rng.uniform(10, 300), 2)
+        }
+    }, {}
+
+SCENARIOS = {
+    'browse_products': ('GET', '/api/products', browse_products),
+    'browse_inventory': ('GET', '/api/inventory', browse_inventory),
+    'pos_products': ('GET', '/api/pos/products', pos_products),
+    'checkout': ('POST', '/api/checkout', checkout),
+    'pos_sale': ('POST', '/api/pos/sale', pos_sale),
+    'available_drivers': ('GET', '/api/dispatch/available-drivers', available_drivers),
+    'delivery_status': ('PUT', '/api/dispatch/delivery-status/<int:delivery_id>', delivery_status),
+    'location_ping': ('PUT', '/api/dispatch/driver-location/<int:driver_id>', location_ping),
+    'notify': ('POST', '/api/voice-ai/checkout-integration', notify)
+}
+
+MIXES = {
+    'mixed': {'browse_products': 30, 'browse_inventory': 10, 'pos_products': 10, 'checkout': 15, 'pos_sale': 15,
+              'available_drivers': 5, 'delivery_status': 5, 'location_ping': 10, 'notify': 5},
+    'browse': {'browse_products': 50, 'browse_inventory': 25, 'pos_products': 25},
+    'checkout': {'browse_products': 20, 'checkout': 50, 'pos_sale': 30},
+    'dispatch': {'available_drivers': 30, 'delivery_status': 20, 'location_ping': 50}
+}
+
+def parse_mix(spec):
+    """A named mix or 'scenario=weight,...'"""
+    if spec in MIXES:
+        return MIXES[spec]
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f'Unknown scenario {name!r}; choose from {", ".join(SCENARIOS)} or a mix: {", ".join(MIXES)}')
+        mix[name] = float(weight or 1)
+    return mix
+
+def find_pg_binary(name):
+    candidates = [os.path.join(os.environ['PG_BIN'], name)] if os.environ.get('PG_BIN') else []
+    candidates += [shutil.which(name)] + sorted(glob.glob(f'/usr/lib/postgresql/*/bin/{name}'), reverse=True)
+    return next((path for path in candidates if path and os.path.exists(path)), None)
+
+@contextmanager
+def temporary_postgres(run_dir):
+    """A throwaway cluster listening only on a socket in run_dir"""
+    initdb, pg_ctl = find_pg_binary('initdb'), find_pg_binary('pg_ctl')
+    if not initdb or not pg_ctl:
+        raise SystemExit('No PostgreSQL to test against: pass --database-url, or put initdb and pg_ctl on PATH (or PG_BIN)')
+
+    data_dir = os.path.join(run_dir, 'pgdata')
+    created = subprocess.run([initdb, '-D', data_dir, '-U', 'postgres', '-A', 'trust', '--no-sync'],
+                             capture_output=True, text=True)
+    if created.returncode != 0:
+        raise SystemExit(f'initdb failed (it refuses to run as root):\n{created.stderr}')
+    subprocess.run([pg_ctl, '-D', data_dir, '-l', os.path.join(run_dir, 'postgres.log'), '-w',
+                    '-o', f"-k {run_dir} -c listen_addresses=''", 'start'], check=True, stdout=subprocess.DEVNULL)
+    try:
+        yield {'DATABASE_URL': 'postgresql://postgres@/postgres', 'PGHOST': run_dir}
+    finally:
+        subprocess.run([pg_ctl, '-D', data_dir, '-m', 'fast', '-w', 'stop'], stdout=subprocess.DEVNULL)
+
+@contextmanager
+def given_postgres(url):
+    yield {'DATABASE_URL': url}
+
+def seed_postgres(data, orders, seed):
+    """Reset the seeded tables and bulk-load the synthetic data, then derive order_items and rollups"""
+    from psycopg2.extras import execute_values
+    from src.database_config import db_config
+    from src.services.analytics import rebuild_daily_rollups, rebuild_sku_rollups
+    from src.services.customer_stats import recompute_customer_stats
+    from src.services.order_items import backfill_table
+    from src.services.table_versions import bump_version
+
+    db_config.init_database()
+    rng = random.Random(seed + 1)
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'TRUNCATE {", ".join(SEEDED_TABLES)} RESTART IDENTITY CASCADE')
+        execute_values(cursor, '''
+            INSERT INTO inventory (sku, name, category, description, price, cost, stock_quantity, thc_percentage, cbd_percentage, status)
+            VALUES %s
+        ''', [(p['sku'], p['name'], p['category'], f'Synthetic {p["category"].lower()}', p['price'],
+               round(p['price'] * 0.55, 2), p['stock'], p['thc'], p['cbd'], 'active') for p in data.products],
+            page_size=1000)
+        execute_values(cursor, 'INSERT INTO customers (name, email, phone, address) VALUES %s', [
+            (c['name'], c['email'], c['phone'], f'{i} Load Test Ave') for i, c in enumerate(data.customers)
+        ], page_size=1000)
+
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        batch = []
+        for i in range(orders):
+            customer = data.customer(rng)
+            items = data.cart(rng)
+            subtotal = round(sum(item['price'] * item['quantity'] for item in items), 2)
+            tax = round(subtotal * 0.0875, 2)
+            created_at = now - timedelta(seconds=rng.randint(0, 180 * 86400))
+            batch.append((f'LT-ORD-{i:08d}', customer['name'], customer['email'], customer['phone'], json.dumps(items),
+                          subtotal, tax, round(subtotal + tax, 2), 'card', rng.choice(ORDER_STATUSES), 'website',
+                          'delivery', created_at, created_at))
+            if len(batch) == 5000 or i == orders - 1:
+                execute_values(cursor, '''
+                    INSERT INTO orders (id, customer_name, customer_email, customer_phone, items, subtotal, tax, total,
+                                        payment_method, status, source, fulfillment_method, created_at, updated_at)
+                    VALUES %s
+                ''', batch, page_size=1000)
+                batch = []
+        conn.commit()
+        # The catalog was replaced underneath any ETags handed out before
+        bump_version(conn, 'inventory')
+
+        backfill_table(conn, 'orders', 'id', 'order', batch_size=5000)
+        rebuild_sku_rollups(conn)
+        rebuild_daily_rollups(conn)
+        recompute_customer_stats(conn, batch_size=5000)
+        conn.commit()
+        cursor.execute('ANALYZE')
+        conn.commit()
+    finally:
+        conn.close()
+
+def seed_sqlite(data, path):
+    """The app's SQLite store at path (SQLITE_DB_PATH), with the same catalog"""
+    from src.database import Database
+
+    conn = Database(path).get_connection()
+    try:
+        conn.execute('DELETE FROM inventory')
+        conn.executemany('''
+            INSERT INTO inventory (id, name, category, price, stock, thc_content, cbd_content, description)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(p['sku'], p['name'], p['category'], p['price'], p['stock'], p['thc'], p['cbd'],
+               f'Synthetic {p["category"].lower()}') for p in data.products])
+        conn.commit()
+    finally:
+        conn.close()
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def request(port, method, path, body=None, headers=None, timeout=REQUEST_TIMEOUT_SECONDS):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        payload = json.dumps(body).encode() if body is not None else None
+        conn.request(method, path, body=payload, headers={'Content-Type': 'application/json', **(headers or {})})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+@contextmanager
+def app_server(run_dir, database_env, workers, threads):
+    """gunicorn serving src.main:app from run_dir, stopped on exit"""
+    port = free_port()
+    metrics_dir = os.path.join(run_dir, 'metrics')
+    os.makedirs(metrics_dir, exist_ok=True)
+    env = {
+        **os.environ,
+        **database_env,
+        'PYTHONPATH': os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')])),
+        'PROMETHEUS_MULTIPROC_DIR': metrics_dir,
+        'RATE_LIMIT_ENABLED': 'false',
+        'LOG_LEVEL': os.environ.get('LOG_LEVEL', 'WARNING')
+    }
+    log_path = os.path.join(run_dir, 'server.log')
+    with open(log_path, 'w') as log:
+        server = subprocess.Popen([
+            sys.executable, '-m', 'gunicorn', 'src.main:app', '--config', GUNICORN_CONFIG,
+            '--workers', str(workers), '--threads', str(threads), '--bind', f'127.0.0.1:{port}',
+            '--timeout', '120'
+        ], cwd=run_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        deadline = time.monotonic() + 120
+        while True:
+            if server.poll() is not None:
+                raise SystemExit(f'Server exited during startup, see {log_path}')
+            try:
+                if request(port, 'GET', '/metrics', timeout=2)[0] == 200:
+                    break
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise SystemExit(f'Server did not come up within 120s, see {log_path}')
+            time.sleep(0.25)
+        yield port
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+def server_route_totals(port):
+    """{(method, route): [request seconds, db seconds, requests]} from /metrics, summed over workers"""
+    from prometheus_client.parser import text_string_to_metric_families
+
+    totals = defaultdict(lambda: [0.0, 0.0, 0])
+    status, body = request(port, 'GET', '/metrics')
+    if status != 200:
+        return totals
+    for family in text_string_to_metric_families(body.decode()):
+        for sample in family.samples:
+            key = (sample.labels.get('method'), sample.labels.get('route'))
+            if sample.name == 'dankdash_http_request_duration_seconds_sum':
+                totals[key][0] += sample.value
+            elif sample.name == 'dankdash_http_request_db_seconds_sum':
+                totals[key][1] += sample.value
+            elif sample.name == 'dankdash_http_request_duration_seconds_count':
+                totals[key][2] += int(sample.value)
+    return totals
+
+def run_clients(port, mix, data, clients, warmup, duration, seed):
+    """Closed loop: each client sends its next request as soon as the last one returns"""
+    names, weights = list(mix), list(mix.values())
+    samples = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        conn = None
+        recorded = []
+        while time.perf_counter() < stop_at:
+            name = rng.choices(names, weights)[0]
+            method, _, build = SCENARIOS[name]
+            path, body, headers = build(rng, data)
+            payload = json.dumps(body).encode() if body is not None else None
+            headers = {'Content-Type': 'application/json', **headers} if payload else headers
+            sent = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=REQUEST_TIMEOUT_SECONDS)
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if response.will_close:
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                # Refused, reset or timed out; reported as status 0
+                status = 0
+                if conn is not None:
+                    conn.close()
+                conn = None
+            if sent >= measure_from:
+                recorded.append((name, status, time.perf_counter() - sent))
+        if conn is not None:
+            conn.close()
+        with lock:
+            samples.extend(recorded)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    time.sleep(max(0, measure_from - time.perf_counter()))
+    measured_start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - measured_start
+
+def percentile(sorted_values, q):
+    return sorted_values[max(0, min(len(sorted_values) - 1, math.ceil(q * len(sorted_values)) - 1))]
+
+def latency_stats(latencies, seconds):
+    latencies = sorted(latencies)
+    if not latencies:
+        return {'requests': 0, 'rps': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / seconds, 2),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2)
+    }
+
+def summarize(samples, seconds, server_before, server_after):
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    for name, status, elapsed in samples:
+        latencies[name].append(elapsed)
+        statuses[name][status] += 1
+
+    endpoints = {}
+    for name in sorted(latencies):
+        method, route, _ = SCENARIOS[name]
+        errors = sum(count for status, count in statuses[name].items() if not 200 <= status < 400)
+        before, after = server_before[(method, route)], server_after[(method, route)]
+        server_requests = after[2] - before[2]
+        endpoints[name] = {
+            'method': method,
+            'route': route,
+            **latency_stats(latencies[name], seconds),
+            'errors': errors,
+            'statuses': {str(status): count for status, count in sorted(statuses[name].items())},
+            'server_ms': round((after[0] - before[0]) / server_requests * 1000, 2) if server_requests else None,
+            'db_ms': round((after[1] - before[1]) / server_requests * 1000, 2) if server_requests else None
+        }
+
+    overall = latency_stats([elapsed for _, _, elapsed in samples], seconds)
+    overall['errors'] = sum(endpoint['errors'] for endpoint in endpoints.values())
+    return endpoints, overall
+
+def print_report(endpoints, overall):
+    print(f'\n{"endpoint":<20} {"requests":>9} {"errors":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} '
+          f'{"p99 ms":>8} {"max ms":>8} {"server":>8} {"db ms":>7}')
+    for name, e in endpoints.items():
+        server_ms = f'{e["server_ms"]:8.1f}' if e['server_ms'] is not None else f'{"-":>8}'
+        db_ms = f'{e["db_ms"]:7.1f}' if e['db_ms'] is not None else f'{"-":>7}'
+        print(f'{name:<20} {e["requests"]:>9} {e["errors"]:>7} {e["rps"]:>8.1f} {e["p50_ms"]:>8.1f} '
+              f'{e["p95_ms"]:>8.1f} {e["p99_ms"]:>8.1f} {e["max_ms"]:>8.1f} {server_ms} {db_ms}')
+    print(f'{"overall":<20} {overall["requests"]:>9} {overall["errors"]:>7} {overall["rps"]:>8.1f} '
+          f'{overall["p50_ms"]:>8.1f} {overall["p95_ms"]:>8.1f} {overall["p99_ms"]:>8.1f} {overall["max_ms"]:>8.1f}')
+
+    for name, e in endpoints.items():
+        if e['errors']:
+            failing = ', '.join(f'{status}: {count}' for status, count in e['statuses'].items()
+                                if not 200 <= int(status) < 400)
+            print(f'  {name} {e["method"]} {e["route"]} errors by status: {failing}')
+
+def compare(result, baseline, threshold):
+    """Regressions against a saved run: slower p95/p99, lower throughput or more errors"""
+    if {k: baseline['config'].get(k) for k in ('mix', 'scale', 'clients', 'workers', 'threads')} != \
+            {k: result['config'].get(k) for k in ('mix', 'scale', 'clients', 'workers', 'threads')}:
+        print('\nNote: the baseline was run with a different mix, scale or concurrency')
+
+    regressions = []
+    print(f'\nAgainst {baseline["started_at"]} ({baseline.get("git_revision") or "unknown revision"}):')
+    for name, current in result['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if not before or not before['requests'] or not current['requests']:
+            continue
+        changes = []
+        for metric in ('p95_ms', 'p99_ms'):
+            ratio = current[metric] / before[metric] if before[metric] else 1.0
+            changes.append(f'{metric[:3]} {before[metric]:.1f} -> {current[metric]:.1f} ms')
+            if ratio > 1 + threshold:
+                regressions.append(f'{name} {metric[:3]} {before[metric]:.1f} -> {current[metric]:.1f} ms')
+        changes.append(f'{before["rps"]:.1f} -> {current["rps"]:.1f} req/s')
+        if current['rps'] < before['rps'] * (1 - threshold):
+            regressions.append(f'{name} throughput {before["rps"]:.1f} -> {current["rps"]:.1f} req/s')
+        before_errors, current_errors = before['errors'] / before['requests'], current['errors'] / current['requests']
+        if current_errors > before_errors + 0.01:
+            regressions.append(f'{name} error rate {before_errors:.1%} -> {current_errors:.1%}')
+        print(f'  {name:<20} ' + ', '.join(changes))
+    return regressions
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Load test the core API flows against a seeded local server')
+    parser.add_argument('--scale', choices=SCALES, default='small', help='synthetic data size (default small)')
+    parser.add_argument('--products', type=int, help='override the number of products')
+    parser.add_argument('--customers', type=int, help='override the number of customers')
+    parser.add_argument('--orders', type=int, help='override the number of historical orders')
+    parser.add_argument('--mix', default='mixed', help=f'{", ".join(MIXES)} or scenario=weight,... (default mixed)')
+    parser.add_argument('--clients', type=int, default=8, help='concurrent clients (default 8)')
+    parser.add_argument('--duration', type=float, default=30, help='measured seconds (default 30)')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds first (default 5)')
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1), help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=1, help='threads per gunicorn worker (default 1)')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for data and traffic (default 1)')
+    parser.add_argument('--database-url', default=os.environ.get('LOADTEST_DATABASE_URL'),
+                        help='throwaway PostgreSQL database; it is wiped (default: temporary cluster)')
+    parser.add_argument('--results-dir', default=RESULTS_DIR, help='where runs are saved')
+    parser.add_argument('--no-save', action='store_true', help="don't save this run")
+    parser.add_argument('--baseline', help='saved run to compare against; exits 1 on a regression')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown vs the baseline (default 0.2)')
+    parser.add_argument('--keep-run-dir', action='store_true', help='keep server logs and the scratch SQLite store')
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    mix = parse_mix(args.mix)
+    scale = dict(SCALES[args.scale])
+    for key in ('products', 'customers', 'orders'):
+        if getattr(args, key) is not None:
+            scale[key] = getattr(args, key)
+    results_dir = os.path.abspath(args.results_dir)
+    baseline = json.load(open(args.baseline)) if args.baseline else None
+
+    run_dir = tempfile.mkdtemp(prefix='dankdash-load-')
+    sqlite_path = os.path.join(run_dir, 'dankdash.db')
+    database = given_postgres(args.database_url) if args.database_url else temporary_postgres(run_dir)
+    failed = True
+
+    try:
+        with database as database_env:
+            # The app reads these at import, here and in the gunicorn workers
+            os.environ.update(database_env, SQLITE_DB_PATH=sqlite_path)
+            os.chdir(run_dir)
+            sys.path.insert(0, REPO_ROOT)
+
+            data = SeedData(scale, args.seed)
+            print(f'Seeding {scale["products"]} products, {scale["customers"]} customers, {scale["orders"]} orders...')
+            seeding_started = time.perf_counter()
+            seed_postgres(data, scale['orders'], args.seed)
+            seed_sqlite(data, sqlite_path)
+            print(f'Seeded in {time.perf_counter() - seeding_started:.1f}s')
+
+            with app_server(run_dir, database_env, args.workers, args.threads) as port:
+                if 'notify' in mix:
+                    # The simulated Twilio channel is per-worker state; enough posts reach every worker
+                    for _ in range(args.workers * 4):
+                        request(port, 'POST', '/api/voice-ai/config', {'twilio': {'enabled': True}})
+
+                print(f'Running {args.clients} clients against {args.workers} workers x {args.threads} threads: '
+                      f'{args.warmup:.0f}s warm-up, {args.duration:.0f}s measured, mix {args.mix}')
+                started_at = datetime.now(timezone.utc)
+                server_before = defaultdict(lambda: [0.0, 0.0, 0])
+
+                def snapshot_after_warmup():
+                    server_before.update(server_route_totals(port))
+                warmup_done = threading.Timer(args.warmup, snapshot_after_warmup)
+                warmup_done.start()
+                samples, seconds = run_clients(port, mix, data, args.clients, args.warmup, args.duration, args.seed)
+                warmup_done.join()
+                server_after = server_route_totals(port)
+
+        endpoints, overall = summarize(samples, seconds, server_before, server_after)
+        print_report(endpoints, overall)
+
+        result = {
+            'started_at': started_at.isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'config': {
+                'mix': args.mix, 'weights': mix, 'scale': args.scale, **scale, 'clients': args.clients,
+                'duration': args.duration, 'warmup': args.warmup, 'workers': args.workers, 'threads': args.threads,
+                'seed': args.seed, 'database': 'url' if args.database_url else 'temporary cluster',
+                'load_shedding': os.environ.get('LOAD_SHEDDING_ENABLED', 'true')
+            },
+            'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+            'measured_seconds': round(seconds, 2),
+            'overall': overall,
+            'endpoints': endpoints
+        }
+        if not args.no_save:
+            os.makedirs(results_dir, exist_ok=True)
+            mix_label = args.mix if args.mix in MIXES else 'custom'
+            path = os.path.join(results_dir, f'{started_at.strftime("%Y%m%dT%H%M%SZ")}-{mix_label}-{args.scale}.json')
+            with open(path, 'w') as f:
+                json.dump(result, f, indent=2)
+            print(f'\nSaved {path}')
+
+        regressions = compare(result, baseline, args.threshold) if baseline else []
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        failed = False
+        return 1 if regressions else 0
+    finally:
+        os.chdir(REPO_ROOT)
+        if args.keep_run_dir or failed:
+            print(f'Run directory kept: {run_dir}')
+        else:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Benchmark login password checks under concurrency.
+
+Runs a burst of concurrent logins (one thread each, like gthread workers) with
+hashing inline in the request thread and through the password process pool,
+while a probe thread repeatedly does a small pure-Python "other request".
+Reports login throughput and the probe's latency, which is what the rest of
+the site feels during a login burst. No database is needed:
+
+    python -m benchmarks.password_hashing_bench [logins] [concurrency]
+
+PASSWORD_HASH_METHOD and PASSWORD_HASH_WORKERS apply as in production; with
+PASSWORD_HASH_WORKERS=0 the pooled run hashes inline too.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import statistics
+import sys
+import threading
+import time
+
+from src.services import passwords
+
+PASSWORD = 'Correct-Horse-9'
+
+def probe_request():
+    """Stand-in for a cheap endpoint: a little pure-Python work"""
+    return sum(i * i for i in range(20000))
+
+def run_burst(check, logins, concurrency):
+    latencies = []
+    done = threading.Event()
+
+    def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            probe_request()
+            latencies.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    prober = threading.Thread(target=probe)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: check(), range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+
+    assert all(results), 'a password check failed'
+    latencies.sort()
+    return {
+        'logins_per_second': logins / elapsed,
+        'probe_p50_ms': statistics.median(latencies) * 1000,
+        'probe_p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+    }
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    pwhash = passwords.hash_job(PASSWORD, passwords.PASSWORD_HASH_METHOD)
+
+    print(f'{logins} logins, {concurrency} concurrent, {passwords.PASSWORD_HASH_METHOD}, '
+          f'{passwords.PASSWORD_HASH_WORKERS} pool workers, queue limit {passwords.PASSWORD_HASH_MAX_PENDING}\n')
+
+    start = time.perf_counter()
+    for _ in range(20):
+        probe_request()
+    print(f'{"idle probe":<24} {"":>10}  p50 {(time.perf_counter() - start) / 20 * 1000:7.1f} ms')
+
+    def inline():
+        return passwords.verify_job(pwhash, PASSWORD, passwords.PASSWORD_HASH_METHOD)[0]
+
+    def pooled():
+        while True:
+            try:
+                return passwords.verify_password(pwhash, PASSWORD)[0]
+            except passwords.PasswordHashingBusy:
+                # What a client does with the 503's Retry-After, compressed
+                time.sleep(0.05)
+
+    passwords.verify_password(pwhash, PASSWORD)  # start the pool outside the timing
+    for label, check in [('inline', inline), ('process pool', pooled)]:
+        result = run_burst(check, logins, concurrency)
+        print(f'{label:<24} {result["logins_per_second"]:7.1f}/s  '
+              f'p50 {result["probe_p50_ms"]:7.1f} ms  p95 {result["probe_p95_ms"]:7.1f} ms')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Benchmark the inventory listing serializers on a 50k-row response.
+
+Compares the old per-row dict building + jsonify path with passing rows
+straight to the fast encoder, both buffered and streamed. Rows are built in
+memory with the same types psycopg2 returns (Decimal, date, aware datetime),
+so no database is needed:
+
+    python -m benchmarks.serialization_bench [rows]
+"""
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from flask import Flask, jsonify
+import sys
+import time
+
+from src.services.serialization import FastJSONProvider, dumps, orjson, stream_json_list
+
+COLUMNS = [
+    'id', 'sku', 'name', 'category', 'subcategory', 'description', 'price', 'cost',
+    'stock_quantity', 'reserved_quantity', 'min_stock_level', 'max_stock_level', 'unit',
+    'weight_grams', 'thc_percentage', 'cbd_percentage', 'strain_type', 'brand', 'supplier',
+    'batch_number', 'expiry_date', 'lab_tested', 'lab_results', 'status', 'created_at', 'updated_at'
+]
+
+def make_rows(count):
+    now = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    return [{
+        'id': i,
+        'sku': f'SKU-{i:06d}',
+        'name': f'Product {i}',
+        'category': 'Flower',
+        'subcategory': 'Indica',
+        'description': 'Benchmark product',
+        'price': Decimal('35.00'),
+        'cost': Decimal('20.50'),
+        'stock_quantity': i % 200,
+        'reserved_quantity': 0,
+        'min_stock_level': 5,
+        'max_stock_level': 500,
+        'unit': 'each',
+        'weight_grams': Decimal('3.500'),
+        'thc_percentage': Decimal('22.40'),
+        'cbd_percentage': Decimal('0.80'),
+        'strain_type': 'indica',
+        'brand': 'DankDash',
+        'supplier': 'Supplier',
+        'batch_number': f'B-{i % 1000}',
+        'expiry_date': date(2027, 1, 1),
+        'lab_tested': True,
+        'lab_results': None,
+        'status': 'active',
+        'created_at': now,
+        'updated_at': now
+    } for i in range(count)]
+
+def legacy_item(item):
+    """Per-row conversion as get_inventory did it before the fast path"""
+    return {
+        'id': item['id'],
+        'sku': item['sku'],
+        'name': item['name'],
+        'category': item['category'],
+        'subcategory': item['subcategory'],
+        'description': item['description'],
+        'price': float(item['price']) if item['price'] else None,
+        'cost': float(item['cost']) if item['cost'] else None,
+        'stock_quantity': item['stock_quantity'],
+        'reserved_quantity': item['reserved_quantity'],
+        'min_stock_level': item['min_stock_level'],
+        'max_stock_level': item['max_stock_level'],
+        'unit': item['unit'],
+        'weight_grams': float(item['weight_grams']) if item['weight_grams'] else None,
+        'thc_percentage': float(item['thc_percentage']) if item['thc_percentage'] else None,
+        'cbd_percentage': float(item['cbd_percentage']) if item['cbd_percentage'] else None,
+        'strain_type': item['strain_type'],
+        'brand': item['brand'],
+        'supplier': item['supplier'],
+        'batch_number': item['batch_number'],
+        'expiry_date': item['expiry_date'].isoformat() if item['expiry_date'] else None,
+        'lab_tested': item['lab_tested'],
+        'lab_results': item['lab_results'],
+        'status': item['status'],
+        'created_at': item['created_at'].isoformat(),
+        'updated_at': item['updated_at'].isoformat()
+    }
+
+def timed(label, func, repeat=3):
+    best = None
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'{label:<40} {best * 1000:9.1f} ms  {size / 1024 / 1024:6.1f} MiB')
+    return best
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rows = make_rows(count)
+    print(f'{count} inventory rows, orjson {"available" if orjson else "NOT installed (stdlib fallback)"}\n')
+
+    legacy_app = Flask('legacy')
+    fast_app = Flask('fast')
+    fast_app.json = FastJSONProvider(fast_app)
+
+    def legacy():
+        with legacy_app.app_context():
+            items = [legacy_item(row) for row in rows]
+            return len(jsonify({'success': True, 'inventory': items, 'count': len(items)}).get_data())
+
+    def fast_provider():
+        with fast_app.app_context():
+            items = [legacy_item(row) for row in rows]
+            return len(jsonify({'success': True, 'inventory': items, 'count': len(items)}).get_data())
+
+    def fast_rows():
+        return len(dumps({'success': True, 'inventory': rows, 'count': len(rows)}))
+
+    def streamed():
+        with fast_app.test_request_context('/'):
+            response = stream_json_list('inventory', iter(rows), envelope={'success': True})
+            return sum(len(chunk) for chunk in response.response)
+
+    baseline = timed('legacy dict build + jsonify', legacy)
+    for label, func in [
+        ('legacy dict build + orjson provider', fast_provider),
+        ('rows as-is + fast dumps', fast_rows),
+        ('rows as-is + streamed', streamed)
+    ]:
+        elapsed = timed(label, func)
+        print(f'{"":<40} {baseline / elapsed:9.1f}x faster than legacy')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+# Loaded automatically by gunicorn from the working directory.
+#
+# Prometheus metrics are written per worker to PROMETHEUS_MULTIPROC_DIR and
+# merged by /metrics. The directory is emptied when the server starts, so
+# counters from a previous run don't leak in, and a worker's live gauges are
+# dropped when it exits.
+import os
+import shutil
+import tempfile
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'dankdash-metrics'))
+
+def on_starting(server):
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
@@ -2,14 +2,19 @@ import sqlite3
 import json
 from datetime import datetime
 import os
+from src.services.db_instrumentation import TimedSqliteConnection
+from src.services.table_versions import init_sqlite_versions_table, bump_sqlite_version
+from src.services.order_items import init_sqlite_order_items_table, write_line_items
+from src.services.analytics import init_sqlite_analytics_tables, record_daily_totals
 
 class Database:
-    def __init__(self, db_path="dankdash.db"):
-        self.db_path = db_path
+    def __init__(self, db_path=None):
+        # SQLITE_DB_PATH puts this store in the same file as the other SQLite screens
+        self.db_path = db_path or os.environ.get('SQLITE_DB_PATH', 'dankdash.db')
         self.init_database()
     
     def get_connection(self):
-        return sqlite3.connect(self.db_path)
+        return sqlite3.connect(self.db_path, factory=TimedSqliteConnection)
     
     def init_database(self):
         """Initialize all database tables"""
@@ -104,6 +109,13 @@ class Database:
             )
         ''')
         
+        # Change counters behind listing ETags
+        init_sqlite_versions_table(cursor)
+        
+        # Normalized line items and daily totals for POS sales
+        init_sqlite_order_items_table(cursor)
+        init_sqlite_analytics_tables(cursor)
+        
         conn.commit()
         conn.close()
         
@@ -137,42 +149,47 @@ class Database:
         conn.close()
     
     def create_sale(self, sale_data):
-        """Create a new sale record"""
+        """Create a new sale record with its stock, accounting, line item and daily total writes in one transaction"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO sales (
-                id, timestamp, customer_name, customer_email, customer_phone,
-                items, subtotal, tax, total, payment_method, cash_received,
-                change_amount, status, cashier, location
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            sale_data['id'],
-            sale_data['timestamp'],
-            sale_data['customer']['name'],
-            sale_data['customer'].get('email', ''),
-            sale_data['customer'].get('phone', ''),
-            json.dumps(sale_data['items']),
-            sale_data['subtotal'],
-            sale_data['tax'],
-            sale_data['total'],
-            sale_data['payment_method'],
-            sale_data.get('cash_received', 0),
-            sale_data.get('change', 0),
-            sale_data.get('status', 'completed'),
-            sale_data.get('cashier', 'POS User'),
-            sale_data.get('location', 'Main Store')
-        ))
-        
-        conn.commit()
-        conn.close()
-        
-        # Update inventory
-        self.update_inventory_from_sale(sale_data['items'])
-        
-        # Create accounting entries
-        self.create_accounting_entries(sale_data)
+        try:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO sales (
+                    id, timestamp, customer_name, customer_email, customer_phone,
+                    items, subtotal, tax, total, payment_method, cash_received,
+                    change_amount, status, cashier, location
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                sale_data['id'],
+                sale_data['timestamp'],
+                sale_data['customer']['name'],
+                sale_data['customer'].get('email', ''),
+                sale_data['customer'].get('phone', ''),
+                json.dumps(sale_data['items']),
+                sale_data['subtotal'],
+                sale_data['tax'],
+                sale_data['total'],
+                sale_data['payment_method'],
+                sale_data.get('cash_received', 0),
+                sale_data.get('change', 0),
+                sale_data.get('status', 'completed'),
+                sale_data.get('cashier', 'POS User'),
+                sale_data.get('location', 'Main Store')
+            ))
+            
+            write_line_items(cursor, sale_data['id'], sale_data['items'], source='pos')
+            record_daily_totals(cursor, 'pos', sale_data['subtotal'], sale_data['tax'], sale_data['total'])
+            
+            # Update inventory
+            self.update_inventory_from_sale(cursor, sale_data['items'])
+            
+            # Create accounting entries
+            self.create_accounting_entries(cursor, sale_data)
+            
+            conn.commit()
+        finally:
+            conn.close()
         
         return sale_data['id']
     
@@ -241,6 +258,7 @@ class Database:
             order_data.get('payment_status', 'pending'),
             order_data.get('fulfillment_method', 'delivery')
         ))
+        bump_sqlite_version(cursor, 'orders')
         
         conn.commit()
         conn.close()
@@ -309,26 +327,17 @@ class Database:
         
         return products
     
-    def update_inventory_from_sale(self, items):
-        """Update inventory after a sale"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+    def update_inventory_from_sale(self, cursor, items):
+        """Update inventory for a sale inside the caller's transaction"""
         for item in items:
             cursor.execute('''
                 UPDATE inventory 
                 SET stock = stock - ?, updated_at = CURRENT_TIMESTAMP
                 WHERE id = ?
             ''', (item['quantity'], item['id']))
-        
-        conn.commit()
-        conn.close()
     
-    def create_accounting_entries(self, sale_data):
-        """Create accounting entries for a sale"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
+    def create_accounting_entries(self, cursor, sale_data):
+        """Create accounting entries for a sale inside the caller's transaction"""
         transaction_id = sale_data['id']
         total = sale_data['total']
         tax = sale_data['tax']
@@ -366,9 +375,6 @@ class Database:
             INSERT INTO accounting_entries (transaction_id, account_name, account_type, credit_amount, description)
             VALUES (?, ?, ?, ?, ?)
         ''', (transaction_id, 'Inventory', 'Asset', cogs, f'Inventory reduction for {transaction_id}'))
-        
-        conn.commit()
-        conn.close()
     
     def get_accounting_entries(self, transaction_id=None):
         """Get accounting entries"""
@@ -1,7 +1,7 @@
 import os
 import psycopg2
-from psycopg2.extras import RealDictCursor
 from urllib.parse import urlparse
+from src.services.db_instrumentation import TimedCursor
 
 class DatabaseConfig:
     def __init__(self):
@@ -24,7 +24,7 @@ class DatabaseConfig:
             database=url.path[1:],  # Remove leading slash
             user=url.username,
             password=url.password,
-            cursor_factory=RealDictCursor
+            cursor_factory=TimedCursor
         )
         return conn
     
@@ -176,6 +176,198 @@ class DatabaseConfig:
                 last_seen TIMESTAMPTZ DEFAULT NOW()
             )
         ''')
+        
+        # Idempotency keys table (replayable responses for retried writes)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                scope VARCHAR(100) NOT NULL,
+                idempotency_key VARCHAR(255) NOT NULL,
+                request_hash VARCHAR(64) NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'processing',
+                response_status INTEGER,
+                response_body TEXT,
+                response_mimetype VARCHAR(100),
+                locked_at TIMESTAMPTZ DEFAULT NOW(),
+                created_at TIMESTAMPTZ DEFAULT NOW(),
+                expires_at TIMESTAMPTZ NOT NULL,
+                PRIMARY KEY (scope, idempotency_key)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at
+            ON idempotency_keys (expires_at)
+        ''')
+
+        # Order line items table (normalized copy of the orders/pos_transactions items JSON)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS order_items (
+                id SERIAL PRIMARY KEY,
+                order_id VARCHAR(255) NOT NULL,
+                source VARCHAR(20) NOT NULL DEFAULT 'order',
+                line_number INTEGER NOT NULL,
+                sku VARCHAR(255) NOT NULL,
+                name VARCHAR(255),
+                quantity INTEGER NOT NULL,
+                unit_price DECIMAL(10,2) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (order_id, line_number)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_order_items_sku_created_at
+            ON order_items (sku, created_at)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_order_items_created_at
+            ON order_items (created_at)
+        ''')
+
+        # Per-SKU daily sales rollups (kept up to date on every sale)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sku_daily_sales (
+                sale_date DATE NOT NULL,
+                sku VARCHAR(255) NOT NULL,
+                name VARCHAR(255),
+                quantity_sold INTEGER NOT NULL DEFAULT 0,
+                revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+                order_count INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (sale_date, sku)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sku_daily_sales_sku
+            ON sku_daily_sales (sku, sale_date)
+        ''')
+
+        # Daily sales totals per source ('order' / 'pos') for POS and dashboard stats
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_sales_rollup (
+                sale_date DATE NOT NULL,
+                source VARCHAR(20) NOT NULL,
+                transaction_count INTEGER NOT NULL DEFAULT 0,
+                subtotal DECIMAL(12,2) NOT NULL DEFAULT 0,
+                tax DECIMAL(12,2) NOT NULL DEFAULT 0,
+                total DECIMAL(12,2) NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (sale_date, source)
+            )
+        ''')
+
+        # POS integration sales (full sale document, keyed by sale_id) and products
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pos_integration_sales (
+                sale_id VARCHAR(50) PRIMARY KEY,
+                sale JSONB NOT NULL,
+                total DECIMAL(12,2) NOT NULL DEFAULT 0,
+                created_at TIMESTAMPTZ DEFAULT NOW()
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_pos_integration_sales_created_at
+            ON pos_integration_sales (created_at DESC)
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pos_integration_products (
+                id VARCHAR(50) PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                category VARCHAR(100),
+                price DECIMAL(10,2) NOT NULL DEFAULT 0,
+                stock INTEGER NOT NULL DEFAULT 0,
+                barcode VARCHAR(50),
+                thc DECIMAL(5,2),
+                strain VARCHAR(50),
+                weight VARCHAR(50),
+                updated_at TIMESTAMPTZ DEFAULT NOW()
+            )
+        ''')
+
+        # Integration events (append-only, written in batches by services/event_log.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS integration_logs (
+                id BIGSERIAL PRIMARY KEY,
+                created_at TIMESTAMPTZ NOT NULL,
+                event_type VARCHAR(100) NOT NULL,
+                details TEXT,
+                status VARCHAR(20) NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            ALTER TABLE integration_logs
+                ADD COLUMN IF NOT EXISTS source VARCHAR(50) NOT NULL DEFAULT 'voice_ai',
+                ADD COLUMN IF NOT EXISTS data JSONB
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_integration_logs_source_id
+            ON integration_logs (source, id DESC)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_integration_logs_source_type_id
+            ON integration_logs (source, event_type, id DESC)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_integration_logs_created_at
+            ON integration_logs (created_at)
+        ''')
+
+        # Login sessions behind refresh tokens (see services/sessions.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS auth_sessions (
+                id VARCHAR(64) PRIMARY KEY,
+                customer_id INTEGER NOT NULL,
+                refresh_token_hash VARCHAR(64) NOT NULL,
+                previous_refresh_token_hash VARCHAR(64),
+                created_at TIMESTAMPTZ DEFAULT NOW(),
+                refreshed_at TIMESTAMPTZ DEFAULT NOW(),
+                expires_at TIMESTAMPTZ NOT NULL,
+                revoked_at TIMESTAMPTZ,
+                revoked_reason VARCHAR(50),
+                user_agent TEXT,
+                ip_address VARCHAR(64)
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_auth_sessions_customer_active
+            ON auth_sessions (customer_id) WHERE revoked_at IS NULL
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_auth_sessions_revoked_at
+            ON auth_sessions (revoked_at) WHERE revoked_at IS NOT NULL
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_auth_sessions_expires_at
+            ON auth_sessions (expires_at)
+        ''')
+
+        # Per-table change counters behind listing ETags (see services/table_versions.py)
+        cursor.execute('CREATE SEQUENCE IF NOT EXISTS table_version_inventory')
+
+        # Customer aggregates, incremented in the same transaction as each order
+        cursor.execute('''
+            ALTER TABLE customers
+                ADD COLUMN IF NOT EXISTS total_orders INTEGER NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS total_spent DECIMAL(12,2) NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS loyalty_points INTEGER NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS last_order_date TIMESTAMP,
+                ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ''')
+        # The unique LOWER(email) index is built by the migrate-customer-emails
+        # admin job (services/customer_stats.py), after merging duplicates
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_orders_customer_email_created_at
+            ON orders (LOWER(customer_email), created_at DESC)
+        ''')
+
+        # Uploaded documents are content-addressed; the ORM creates these tables,
+        # so only the ones that already exist get the column
+        for table in ('customer_documents', 'partner_documents'):
+            cursor.execute('SELECT to_regclass(%s) IS NOT NULL AS present', (table,))
+            if cursor.fetchone()['present']:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)')
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS ix_{table}_content_hash ON {table} (content_hash)')
+
+        # Customer search columns and indexes are added by a one-off migration
+        # (customer_search.migrate_customer_search), not at startup
         conn.commit()
         conn.close()
         print("PostgreSQL tables initialized successfully")
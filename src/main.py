@@ -3,7 +3,9 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, send_from_directory, jsonify
+from werkzeug.middleware.proxy_fix import ProxyFix
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask_cors import CORS
 from src.models.user import db
 from src.models.order import Order, DeliveryPartner, OrderDelivery
@@ -26,28 +28,64 @@ from src.routes.voice_ai_routes import voice_ai_bp
 from src.routes.device_routes import device_bp
 from src.routes.inventory_routes import inventory_bp as inventory_management_bp
 from src.routes.frontend_api_routes import frontend_api_bp
+from src.routes.pos_sync_routes import pos_sync_bp
+from src.routes.admin_jobs_routes import admin_jobs_bp
+from src.routes.export_routes import export_bp
+from src.routes.analytics_routes import analytics_bp
+from src.routes.metrics_routes import metrics_bp
 from src.database_config import db_config
+from src.services.serialization import FastJSONProvider
+from src.services.auth import init_auth
+from src.services.load_shedding import init_load_shedding
+from src.services.metrics import init_metrics
+from src.services.query_tracer import init_query_tracer
+from src.services.structured_logging import configure_logging
+from src.services.document_storage import MAX_REQUEST_BYTES
+
+configure_logging()
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 
+# Werkzeug stops reading a request body past this size (sized for document
+# uploads), Content-Length or not
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    return jsonify({'success': False, 'error': f'Request body exceeds {MAX_REQUEST_BYTES} bytes'}), 413
+
+# Client IPs (rate limits, sessions) come from X-Forwarded-For only when the app
+# runs behind TRUSTED_PROXY_COUNT proxies; otherwise the header is client-controlled
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+if TRUSTED_PROXY_COUNT > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT)
+
+# Metrics first so shed requests are counted; shedding runs before auth so an
+# overloaded worker rejects requests as cheaply as possible
+init_metrics(app)
+init_load_shedding(app)
+init_query_tracer(app)
+init_auth(app)
+
 # Enable CORS for frontend domains
-  CORS(app, origins=[
-      "https://dankdask-frontend4-bxe7ozarw-george-escobars-projects.vercel.app",
-      "https://dankdask-frontend4-production-1762.up.railway.app",
-      "https://dankdask-frontend4-3yvv5zwhy-george-escobars-projects.vercel.app",
-      "https://dankdask-frontend4-git-main-george-escobars-projects.vercel.app",
-      "https://dankdask-frontend4-q621xyq69-george-escobars-projects.vercel.app",
-      "https://web-production-52f4.up.railway.app",
-      "http://localhost:3000",
-      "http://localhost:5173",
-      "http://localhost:5174",
-      "http://localhost:5176",
-      "http://127.0.0.1:3000",
-      "http://127.0.0.1:5173",
-      "http://127.0.0.1:5174",
-      "http://127.0.0.1:5176"
-  ])
+CORS(app, origins=[
+    "https://dankdask-frontend4-bxe7ozarw-george-escobars-projects.vercel.app",
+    "https://dankdask-frontend4-production-1762.up.railway.app",
+    "https://dankdask-frontend4-3yvv5zwhy-george-escobars-projects.vercel.app",
+    "https://dankdask-frontend4-git-main-george-escobars-projects.vercel.app",
+    "https://dankdask-frontend4-q621xyq69-george-escobars-projects.vercel.app",
+    "https://web-production-52f4.up.railway.app",
+    "http://localhost:3000",
+    "http://localhost:5173",
+    "http://localhost:5174",
+    "http://localhost:5176",
+    "http://127.0.0.1:3000",
+    "http://127.0.0.1:5173",
+    "http://127.0.0.1:5174",
+    "http://127.0.0.1:5176"
+])
 
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(twilio_bp)
@@ -67,6 +105,11 @@ app.register_blueprint(voice_ai_bp, url_prefix='/api')
 app.register_blueprint(device_bp, url_prefix='/api')
 app.register_blueprint(inventory_management_bp, url_prefix='/api')
 app.register_blueprint(frontend_api_bp, url_prefix='/api')
+app.register_blueprint(pos_sync_bp, url_prefix='/api')
+app.register_blueprint(admin_jobs_bp, url_prefix='/api/admin')
+app.register_blueprint(export_bp, url_prefix='/api')
+app.register_blueprint(analytics_bp, url_prefix='/api')
+app.register_blueprint(metrics_bp)
 print("✓ Registered inventory_management blueprint at /api")
 print("✓ Registered frontend_api blueprint at /api")
 
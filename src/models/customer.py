@@ -1,7 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 import json
+from src.services.serialization import json_column
+from src.services.passwords import hash_password, verify_password
 
 db = SQLAlchemy()
 
@@ -52,15 +53,17 @@ class Customer(db.Model):
     documents = db.relationship('CustomerDocument', backref='customer', lazy=True)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Verify a password, upgrading the stored hash if it is weaker than the configured method"""
+        matches, upgraded = verify_password(self.password_hash, password)
+        if upgraded:
+            self.password_hash = upgraded
+        return matches
     
     def get_addresses(self):
-        if self.addresses:
-            return json.loads(self.addresses)
-        return []
+        return json_column(self, 'addresses', [])
     
     def add_address(self, address_data):
         addresses = self.get_addresses()
@@ -68,12 +71,6 @@ class Customer(db.Model):
         addresses.append(address_data)
         self.addresses = json.dumps(addresses)
     
-    def update_order_stats(self, order_total):
-        self.total_orders += 1
-        self.total_spent += order_total
-        self.average_order_value = self.total_spent / self.total_orders
-        self.last_order_date = datetime.utcnow()
-    
     def to_dict(self):
         return {
             'id': self.id,
@@ -112,6 +109,7 @@ class CustomerDocument(db.Model):
     file_path = db.Column(db.String(500), nullable=False)
     file_size = db.Column(db.Integer)
     mime_type = db.Column(db.String(100))
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256, file_path is its storage key
     
     # Verification Status
     verification_status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
@@ -135,6 +133,7 @@ class CustomerDocument(db.Model):
             'file_path': self.file_path,
             'file_size': self.file_size,
             'mime_type': self.mime_type,
+            'content_hash': self.content_hash,
             'verification_status': self.verification_status,
             'verified_by': self.verified_by,
             'verification_date': self.verification_date.isoformat() if self.verification_date else None,
@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-import json
+from src.services.serialization import json_column
 
 db = SQLAlchemy()
 
@@ -59,7 +59,8 @@ class Order(db.Model):
     # Relationship
     customer = db.relationship('User', backref='orders', foreign_keys=[customer_id])
     
-    def to_dict(self):
+    def to_dict(self, line_items=None):
+        """Serialize the order; line_items (from order_items) take precedence over the items JSON"""
         return {
             'id': self.id,
             'order_number': self.order_number,
@@ -67,13 +68,13 @@ class Order(db.Model):
             'customer_name': self.customer_name,
             'customer_email': self.customer_email,
             'customer_phone': self.customer_phone,
-            'items': json.loads(self.items) if self.items else [],
+            'items': line_items if line_items is not None else json_column(self, 'items', []),
             'subtotal': float(self.subtotal),
             'shipping_cost': float(self.shipping_cost),
             'tax_amount': float(self.tax_amount),
             'total': float(self.total),
-            'shipping_address': json.loads(self.shipping_address) if self.shipping_address else {},
-            'billing_address': json.loads(self.billing_address) if self.billing_address else {},
+            'shipping_address': json_column(self, 'shipping_address', {}),
+            'billing_address': json_column(self, 'billing_address', {}),
             'shipping_method': self.shipping_method,
             'delivery_type': self.delivery_type,
             'payment_method': self.payment_method,
@@ -0,0 +1,334 @@
+from flask import Blueprint, request, jsonify
+from src.database_config import db_config
+from src.routes.enhanced_pos_routes import get_db_connection as get_sqlite_connection
+from src.services.order_items import backfill_table
+from src.services.cache import cache_stats, response_cache
+from src.services.auth import auth_cache_stats, require_admin
+from src.services.sessions import purge_sessions
+from src.services.rate_limit import rate_limit_stats
+from src.services.load_shedding import load_stats
+from src.services.structured_logging import logging_stats
+from src.services.analytics import rebuild_sku_rollups, rebuild_daily_rollups, reconcile_daily_rollups
+from src.services.customer_stats import CustomerEmailsNotMigrated, migrate_customer_emails, recompute_customer_stats
+from src.services.customer_search import migrate_customer_search
+from src.services.sales_snapshot import available as snapshots_available, nightly_range, snapshot_days
+from datetime import date, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Maintenance jobs (backfills, rebuilds) triggered on demand, plus cache controls.
+# Every job is safe to re-run and commits in batches, so it can be retried after
+# a failure. Every endpoint requires the operator's X-Admin-Token.
+admin_jobs_bp = Blueprint('admin_jobs', __name__)
+admin_jobs_bp.before_request(require_admin)
+
+@admin_jobs_bp.route('/jobs/backfill-order-items', methods=['POST'])
+def backfill_order_items():
+    """Copy legacy items JSON from orders and POS transactions into order_items"""
+    try:
+        data = request.get_json(silent=True) or {}
+        batch_size = min(int(data.get('batch_size', 500)), 5000)
+
+        # {'scanned': n, 'skipped': malformed legacy carts} per table
+        results = {}
+
+        conn = db_config.get_connection()
+        try:
+            results['postgres_orders'] = backfill_table(conn, 'orders', 'id', 'order', batch_size=batch_size)
+            results['postgres_pos_transactions'] = backfill_table(conn, 'pos_transactions', 'sale_id', 'pos', batch_size=batch_size)
+        finally:
+            conn.close()
+
+        # Local SQLite store used by the enhanced POS and order management screens
+        conn = get_sqlite_connection()
+        try:
+            results['sqlite_orders'] = backfill_table(conn, 'orders', 'id', 'order', batch_size=batch_size)
+            results['sqlite_pos_transactions'] = backfill_table(
+                conn, 'pos_transactions', 'sale_id', 'pos',
+                created_at_column='timestamp', batch_size=batch_size
+            )
+        finally:
+            conn.close()
+
+        return jsonify({
+            'success': True,
+            'tables': results,
+            'message': 'Order line items backfilled'
+        }), 200
+
+    except Exception as e:
+        logger.exception('Order items backfill failed: %s', e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_jobs_bp.route('/jobs/rebuild-sku-rollups', methods=['POST'])
+def rebuild_sku_daily_sales():
+    """Recompute per-SKU daily sales rollups from order_items for a date range"""
+    try:
+        data = request.get_json(silent=True) or {}
+
+        conn = db_config.get_connection()
+        try:
+            written = rebuild_sku_rollups(conn, data.get('date_from'), data.get('date_to'))
+        finally:
+            conn.close()
+
+        return jsonify({
+            'success': True,
+            'rows_written': written,
+            'message': 'SKU daily rollups rebuilt'
+        }), 200
+
+    except Exception as e:
+        logger.exception('SKU rollup rebuild failed: %s', e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_jobs_bp.route('/jobs/backfill-daily-rollups', methods=['POST'])
+def backfill_daily_sales_rollup():
+    """Rebuild daily sales rollups from orders and POS transactions (all history by default)"""
+    try:
+        data = request.get_json(silent=True) or {}
+
+        days_written = {}
+
+        conn = db_config.get_connection()
+        try:
+            days_written['postgres'] = rebuild_daily_rollups(conn, data.get('date_from'), data.get('date_to'))
+        finally:
+            conn.close()
+
+        conn = get_sqlite_connection()
+        try:
+            days_written['sqlite'] = rebuild_daily_rollups(conn, data.get('date_from'), data.get('date_to'))
+        finally:
+            conn.close()
+
+        return jsonify({
+            'success': True,
+            'rows_written': days_written,
+            'message': 'Daily sales rollups rebuilt'
+        }), 200
+
+    except Exception as e:
+        logger.exception('Daily rollup backfill failed: %s', e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_jobs_bp.route('/jobs/reconcile-daily-rollups', methods=['POST'])
+def reconcile_daily_sales_rollup():
+    """Compare daily rollups with the sales tables (last 31 days by default), optionally fixing them"""
+    try:
+        data = request.get_json(silent=True) or {}
+        date_to = data.get('date_to') or date.today().isoformat()
+        date_from = data.get('date_from') or (date.fromisoformat(date_to) - timedelta(days=30)).isoformat()
+        fix = bool(data.get('fix', False))
+
+        mismatches = {}
+
+        conn = db_config.get_connection()
+        try:
+            mismatches['postgres'] = reconcile_daily_rollups(conn, date_from, date_to, fix)
+        finally:
+            conn.close()
+
+        conn = get_sqlite_connection()
+        try:
+            mismatches['sqlite'] = reconcile_daily_rollups(conn, date_from, date_to, fix)
+        finally:
+            conn.close()
+
+        return jsonify({
+            'success': True,
+            'date_from': date_from,
+            'date_to': date_to,
+            'fixed': fix,
+            'mismatches': mismatches
+        }), 200
+
+    except Exception as e:
+        logger.exception('Daily rollup reconcile failed: %s', e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_jobs_bp.route('/jobs/recompute-customer-stats', methods=['POST'])
+def recompute_customer_aggregates():
+    """Rebuild customer order counts and lifetime value from orders, fixing any drift"""
+    try:
+        data = request.get_json(silent=True) or {}
+        batch_size = min(int(data.get('batch_size', 500)), 5000)
+
+        conn = db_config.get_connection()
+        try:
+            corrected = recompute_customer_stats(conn, batch_size=batch_size)
+        finally:
+            conn.close()
+
+        return jsonify({
+            'success': True,
+            'customers_corrected': corrected,
+            'message': 'Customer stats recomputed'
+        }), 200
+
+    except CustomerEmailsNotMigrated as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 409
+    except Exception as e:
+        logger.exception('Customer stats recompute failed: %s', e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_jobs_bp.route('/jobs/migrate-customer-emails', methods=['POST'])
+def migrate_customer_email_index():
+    """Merge customers whose emails differ only in case, then build the unique LOWER(email) index"""
+    try:
+        conn = db_config.get_connection()
+        try:
+            result = migrate_customer_emails(conn)
+        finally:
+            conn.close()
+
+        return jsonify({
+            'success': True,
+            'customers_merged': result['merged'],
+            'index_built': result['index_built'],
+            'message': 'Customer emails migrated'
+        }), 200
+
+    except Exception as e:
+        logger.exception('Customer email migration failed: %s', e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_jobs_bp.route('/jobs/migrate-customer-search', methods=['POST'])
+def migrate_customer_search_indexes():
+    """Add the customer search columns once, then build their indexes without blocking writes"""
+    try:
+        data = request.get_json(silent=True) or {}
+        lock_timeout = f"{max(int(data.get('lock_timeout_seconds', 5)), 1)}s"
+
+        conn = db_config.get_connection()
+        try:
+            built = migrate_customer_search(conn, lock_timeout=lock_timeout)
+        finally:
+            conn.close()
+
+        return jsonify({
+            'success': True,
+            'indexes_built': built,
+            'message': 'Customer search migrated'
+        }), 200
+
+    except Exception as e:
+        logger.exception('Customer search migration failed: %s', e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_jobs_bp.route('/jobs/snapshot-sales', methods=['POST'])
+def snapshot_sales():
+    """Write Parquet snapshot partitions for a date range (the nightly window by default)"""
+    if not snapshots_available():
+        return jsonify({
+            'success': False,
+            'error': 'Analytics snapshots require pyarrow'
+        }), 503
+
+    try:
+        data = request.get_json(silent=True) or {}
+        date_from, date_to = nightly_range()
+        if data.get('date_from'):
+            date_from = date.fromisoformat(data['date_from'])
+            date_to = date.fromisoformat(data['date_to']) if data.get('date_to') else date_from
+
+        conn = db_config.get_connection()
+        try:
+            written = snapshot_days(conn, date_from, date_to)
+        finally:
+            conn.close()
+
+        return jsonify({
+            'success': True,
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+            'rows_written': written,
+            'message': 'Sales snapshot written'
+        }), 200
+
+    except Exception as e:
+        logger.exception('Sales snapshot failed: %s', e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_jobs_bp.route('/jobs/purge-sessions', methods=['POST'])
+def purge_auth_sessions():
+    """Delete login sessions that expired or were revoked more than retention_days ago"""
+    try:
+        data = request.get_json(silent=True) or {}
+        retention_days = max(int(data.get('retention_days', 7)), 1)
+        deleted = purge_sessions(retention_days)
+
+        return jsonify({
+            'success': True,
+            'sessions_deleted': deleted,
+            'message': 'Old sessions purged'
+        }), 200
+
+    except Exception as e:
+        logger.exception('Session purge failed: %s', e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@admin_jobs_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Response and auth cache hit/miss/eviction counters for this worker"""
+    return jsonify({
+        'success': True,
+        'cache': cache_stats(),
+        'auth': auth_cache_stats()
+    }), 200
+
+@admin_jobs_bp.route('/load/stats', methods=['GET'])
+def get_load_stats():
+    """Rate limiter counters, in-flight requests, p99 latency, shed counts and log queue for this worker"""
+    return jsonify({
+        'success': True,
+        'rate_limits': rate_limit_stats(),
+        'load': load_stats(),
+        'logging': logging_stats()
+    }), 200
+
+@admin_jobs_bp.route('/cache/clear', methods=['POST'])
+def clear_cache():
+    """Drop every cached response"""
+    try:
+        response_cache.clear()
+        return jsonify({
+            'success': True,
+            'message': 'Response cache cleared'
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
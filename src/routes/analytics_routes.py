@@ -0,0 +1,75 @@
+from flask import Blueprint, request, jsonify
+from src.services.sales_snapshot import available, list_partitions, query_snapshot
+from datetime import date
+import logging
+
+# Historical sales analytics served from the columnar snapshot, so long-range
+# group-by queries never scan the OLTP tables.
+logger = logging.getLogger(__name__)
+
+analytics_bp = Blueprint('analytics', __name__)
+
+def parse_query_date(value):
+    return date.fromisoformat(value) if value else None
+
+@analytics_bp.route('/analytics/query', methods=['POST'])
+def run_analytics_query():
+    """Aggregate snapshotted sales or line items, e.g.
+    {"dataset": "line_items", "group_by": ["month", "category"], "metrics": {"revenue": "sum"}}"""
+    if not available():
+        return jsonify({
+            'success': False,
+            'error': 'Analytics snapshots require pyarrow'
+        }), 503
+
+    try:
+        data = request.get_json(silent=True) or {}
+        rows = query_snapshot(
+            data.get('dataset', 'sales'),
+            group_by=data.get('group_by'),
+            metrics=data.get('metrics'),
+            date_from=parse_query_date(data.get('date_from')),
+            date_to=parse_query_date(data.get('date_to')),
+            filters=data.get('filters'),
+            order_by=data.get('order_by'),
+            limit=min(int(data.get('limit', 1000)), 10000)
+        )
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid query: {str(e)}'
+        }), 400
+    except Exception as e:
+        logger.exception('Analytics query failed: %s', e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+    return jsonify({
+        'success': True,
+        'rows': rows,
+        'count': len(rows)
+    }), 200
+
+@analytics_bp.route('/analytics/snapshots', methods=['GET'])
+def get_snapshot_partitions():
+    """Days available in the sales snapshot"""
+    if not available():
+        return jsonify({
+            'success': False,
+            'error': 'Analytics snapshots require pyarrow'
+        }), 503
+
+    partitions = list_partitions()
+    return jsonify({
+        'success': True,
+        'datasets': {
+            dataset: {
+                'days': len(days),
+                'first_day': days[0] if days else None,
+                'last_day': days[-1] if days else None
+            }
+            for dataset, days in partitions.items()
+        }
+    }), 200
@@ -1,37 +1,29 @@
-from flask import Blueprint, request, jsonify, current_app
-from datetime import datetime, timedelta
-import jwt
+from flask import Blueprint, request, jsonify, g
+from datetime import datetime
 import secrets
 import re
 from src.models.customer import db, Customer
 from src.routes.email_routes import send_email
+from src.services.auth import require_auth, invalidate_principal
+from src.services.customer_profiles import get_customer_profile, invalidate_customer_profile
+from src.services.passwords import PasswordHashingBusy
+from src.services.rate_limit import rate_limit, json_field_identity
+from src.services.sessions import InvalidRefreshToken, create_session, refresh_session, revoke_session, revoke_customer_sessions, list_sessions
 
 auth_bp = Blueprint('auth', __name__)
 
-def generate_jwt_token(customer_id):
-    """Generate JWT token for customer authentication"""
-    payload = {
-        'customer_id': customer_id,
-        'exp': datetime.utcnow() + timedelta(days=7),  # Token expires in 7 days
-        'iat': datetime.utcnow()
-    }
-    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
-
-def verify_jwt_token(token):
-    """Verify JWT token and return customer ID"""
-    try:
-        payload = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
-        return payload['customer_id']
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
-        return None
-
 def validate_email(email):
     """Validate email format"""
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
 
+def busy_response(e):
+    """503 for a sign-in that couldn't be queued for password hashing"""
+    response = jsonify({'error': e.description})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
 def validate_password(password):
     """Validate password strength"""
     if len(password) < 8:
@@ -45,6 +37,7 @@ def validate_password(password):
     return True, "Password is valid"
 
 @auth_bp.route('/register', methods=['POST'])
+@rate_limit('register', 5, 3600)
 def register():
     """Customer registration endpoint"""
     try:
@@ -102,21 +95,27 @@ def register():
         verification_link = f"{request.host_url}verify-email?token={customer.verification_token}"
         send_verification_email(customer.email, customer.first_name, verification_link)
         
-        # Generate JWT token
-        token = generate_jwt_token(customer.id)
+        # Start a session (access + refresh token)
+        tokens = create_session(customer.id)
         
         return jsonify({
             'success': True,
             'message': 'Registration successful. Please check your email to verify your account.',
             'customer': customer.to_dict(),
-            'token': token
+            **tokens
         }), 201
         
+    except PasswordHashingBusy as e:
+        db.session.rollback()
+        return busy_response(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login', 10, 60)
+@rate_limit('login_account', 10, 900, identity=json_field_identity('email'))
+@rate_limit('login_account_any_client', 100, 900, identity=json_field_identity('email', per_client=False))
 def login():
     """Customer login endpoint"""
     try:
@@ -139,18 +138,94 @@ def login():
         if customer.status != 'active':
             return jsonify({'error': 'Account is suspended. Please contact support.'}), 401
         
-        # Update last login
+        # Update last login (and the password hash, if check_password upgraded it)
         customer.last_login = datetime.utcnow()
         db.session.commit()
         
-        # Generate JWT token
-        token = generate_jwt_token(customer.id)
+        # Start a session (access + refresh token)
+        tokens = create_session(customer.id)
         
         return jsonify({
             'success': True,
             'message': 'Login successful',
             'customer': customer.to_dict(),
-            'token': token
+            **tokens
+        })
+        
+    except PasswordHashingBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/refresh', methods=['POST'])
+@rate_limit('refresh', 30, 60)
+def refresh():
+    """Exchange a refresh token for a new access token and refresh token"""
+    try:
+        data = request.get_json(silent=True) or {}
+        if not data.get('refresh_token'):
+            return jsonify({'error': 'Refresh token is required'}), 400
+        
+        customer_id, tokens = refresh_session(data['refresh_token'])
+        
+        # Suspended or deleted accounts can't keep a session alive
+        customer = Customer.query.get(customer_id)
+        if not customer or customer.status != 'active':
+            revoke_customer_sessions(customer_id, 'account_inactive')
+            return jsonify({'error': 'Account is suspended. Please contact support.'}), 401
+        
+        return jsonify({
+            'success': True,
+            **tokens
+        })
+        
+    except InvalidRefreshToken as e:
+        return jsonify({'error': str(e)}), 401
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/logout', methods=['POST'])
+@require_auth
+def logout():
+    """End the current session"""
+    try:
+        revoke_session(g.auth_claims['sid'])
+        return jsonify({
+            'success': True,
+            'message': 'Logged out'
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/logout-all', methods=['POST'])
+@require_auth
+def logout_all():
+    """End every session of the current customer, optionally keeping this one"""
+    try:
+        data = request.get_json(silent=True) or {}
+        keep = g.auth_claims['sid'] if data.get('keep_current') else None
+        revoked = revoke_customer_sessions(g.customer_id, except_session_id=keep)
+        return jsonify({
+            'success': True,
+            'message': f'Ended {revoked} session(s)',
+            'revoked': revoked
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/sessions', methods=['GET'])
+@require_auth
+def get_sessions():
+    """Active sessions of the current customer"""
+    try:
+        sessions = list_sessions(g.customer_id)
+        for session in sessions:
+            session['current'] = session['id'] == g.auth_claims['sid']
+        return jsonify({
+            'success': True,
+            'sessions': sessions
         })
         
     except Exception as e:
@@ -186,6 +261,9 @@ def verify_email():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/forgot-password', methods=['POST'])
+@rate_limit('forgot_password', 3, 900)
+@rate_limit('forgot_password_account', 3, 3600, identity=json_field_identity('email'))
+@rate_limit('forgot_password_account_any_client', 10, 3600, identity=json_field_identity('email', per_client=False))
 def forgot_password():
     """Forgot password endpoint"""
     try:
@@ -222,6 +300,7 @@ def forgot_password():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/reset-password', methods=['POST'])
+@rate_limit('reset_password', 10, 900)
 def reset_password():
     """Reset password endpoint"""
     try:
@@ -247,60 +326,44 @@ def reset_password():
         customer.verification_token = None
         db.session.commit()
         
+        # Whoever knew the old password is logged out everywhere
+        revoke_customer_sessions(customer.id, 'password_reset')
+        
         return jsonify({
             'success': True,
             'message': 'Password reset successfully'
         })
         
+    except PasswordHashingBusy as e:
+        db.session.rollback()
+        return busy_response(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/profile', methods=['GET'])
+@require_auth
 def get_profile():
     """Get customer profile (requires authentication)"""
     try:
-        # Get token from Authorization header
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'Authentication required'}), 401
-        
-        token = auth_header.split(' ')[1]
-        customer_id = verify_jwt_token(token)
-        
-        if not customer_id:
-            return jsonify({'error': 'Invalid or expired token'}), 401
-        
-        # Get customer
-        customer = Customer.query.get(customer_id)
-        if not customer:
+        profile, _ = get_customer_profile(g.customer_id)
+        if not profile:
             return jsonify({'error': 'Customer not found'}), 404
         
         return jsonify({
             'success': True,
-            'customer': customer.to_dict()
+            'customer': profile
         })
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/profile', methods=['PUT'])
+@require_auth
 def update_profile():
     """Update customer profile (requires authentication)"""
     try:
-        # Get token from Authorization header
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'Authentication required'}), 401
-        
-        token = auth_header.split(' ')[1]
-        customer_id = verify_jwt_token(token)
-        
-        if not customer_id:
-            return jsonify({'error': 'Invalid or expired token'}), 401
-        
-        # Get customer
-        customer = Customer.query.get(customer_id)
+        customer = Customer.query.get(g.customer_id)
         if not customer:
             return jsonify({'error': 'Customer not found'}), 404
         
@@ -324,6 +387,8 @@ def update_profile():
         
         customer.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_customer_profile(customer.id)
+        invalidate_principal(customer.id)
         
         return jsonify({
             'success': True,
@@ -1,71 +1,137 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-import os
-from werkzeug.utils import secure_filename
 from src.models.customer import db, Customer, CustomerDocument, AccountingEntry
+from src.database_config import db_config
+from src.services.customer_stats import customer_summary
+from src.services.customer_search import AUTOCOMPLETE_LIMIT, FILTER_COLUMNS, RESULT_COLUMNS, SearchNotMigrated, autocomplete_customers, filter_clause, filter_columns, search_customers
+from src.services.document_storage import upload_document, send_document
+from src.services.customer_profiles import get_customer_profile, find_customer_profile, invalidate_customer_profile
+from src.services.auth import invalidate_principal, owner_or_admin_error
+from src.services.sessions import revoke_customer_sessions
+from src.services.order_items import load_line_items, items_for
+from src.services.serialization import json_response
 
 customer_bp = Blueprint('customers', __name__)
 
-ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx'}
-UPLOAD_FOLDER = 'uploads/documents'
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
 @customer_bp.route('/customers', methods=['GET'])
 def get_customers():
-    """Get all customers with filtering and pagination"""
+    """Get a page of customers, newest first, or ranked matches for ?search="""
     try:
-        # Get query parameters
-        search = request.args.get('search', '')
-        status = request.args.get('status')
-        customer_type = request.args.get('customer_type')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
-        
-        # Build query
-        query = Customer.query
-        
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers'}), 400
+
+    search = request.args.get('search', '').strip()
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        # ?status= and ?customer_type= filter where the table has those columns
+        # (tables created by the ORM); elsewhere every customer qualifies
+        available = filter_columns(cursor)
+        filters = {
+            column: request.args[column] for column in FILTER_COLUMNS
+            if request.args.get(column) and column in available
+        }
+
         if search:
-            query = query.filter(
-                db.or_(
-                    Customer.first_name.ilike(f'%{search}%'),
-                    Customer.last_name.ilike(f'%{search}%'),
-                    Customer.email.ilike(f'%{search}%'),
-                    Customer.phone.ilike(f'%{search}%')
-                )
-            )
-        
-        if status:
-            query = query.filter(Customer.status == status)
-        
-        if customer_type:
-            query = query.filter(Customer.customer_type == customer_type)
-        
-        # Paginate results
-        customers = query.order_by(Customer.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
-        
+            # Resolved through the search indexes instead of ILIKE scans
+            rows, total = search_customers(cursor, search, per_page, (page - 1) * per_page, filters)
+        else:
+            filter_sql, filter_params = filter_clause(filters)
+            cursor.execute(f"SELECT COUNT(*) AS count FROM customers WHERE TRUE{filter_sql}", filter_params)
+            total = cursor.fetchone()['count']
+            cursor.execute(f"""
+                SELECT {RESULT_COLUMNS} FROM customers
+                WHERE TRUE{filter_sql}
+                ORDER BY created_at DESC, id DESC
+                LIMIT %s OFFSET %s
+            """, filter_params + [per_page, (page - 1) * per_page])
+            rows = cursor.fetchall()
+
+        customers = [{
+            'id': row['id'],
+            'name': row['name'],
+            'email': row['email'],
+            'phone': row['phone'],
+            'address': row['address'],
+            'created_at': row['created_at'].isoformat() if row['created_at'] else None,
+            **customer_summary(row)
+        } for row in rows]
+
         return jsonify({
-            'customers': [customer.to_dict() for customer in customers.items],
-            'total': customers.total,
-            'pages': customers.pages,
+            'customers': customers,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page,
             'current_page': page
         })
-        
+
+    except SearchNotMigrated as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
+
+@customer_bp.route('/customers/autocomplete', methods=['GET'])
+def autocomplete_customers_lookup():
+    """Top matches for a partial name, email or phone (?q=...&limit=10)"""
+    try:
+        limit = int(request.args.get('limit', AUTOCOMPLETE_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    conn = db_config.get_connection()
+    try:
+        customers = autocomplete_customers(conn.cursor(), request.args.get('q', ''), max(limit, 1))
+        return jsonify({
+            'success': True,
+            'customers': customers,
+            'count': len(customers)
+        })
+    except SearchNotMigrated as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
 
 @customer_bp.route('/customers/<int:customer_id>', methods=['GET'])
 def get_customer(customer_id):
-    """Get a specific customer by ID"""
+    """Get a specific customer by ID, with ID-verification status (cached)"""
     try:
-        customer = Customer.query.get_or_404(customer_id)
-        return jsonify({
+        profile, cached = get_customer_profile(customer_id)
+        if profile is None:
+            return jsonify({'error': 'Customer not found'}), 404
+
+        response = jsonify({
             'success': True,
-            'customer': customer.to_dict()
+            'customer': profile
+        })
+        response.headers['X-Cache'] = 'HIT' if cached else 'MISS'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@customer_bp.route('/customers/lookup', methods=['GET'])
+def lookup_customer():
+    """Find a customer by email or phone for POS ID checks (?email=... or ?phone=...)"""
+    email = request.args.get('email')
+    phone = request.args.get('phone')
+    if not email and not phone:
+        return jsonify({'error': 'email or phone is required'}), 400
+
+    try:
+        profile, cached = find_customer_profile(email=email, phone=phone)
+        if profile is None:
+            return jsonify({'error': 'Customer not found'}), 404
+
+        response = jsonify({
+            'success': True,
+            'customer': profile
         })
+        response.headers['X-Cache'] = 'HIT' if cached else 'MISS'
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -165,6 +231,8 @@ def update_customer(customer_id):
         
         customer.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_customer_profile(customer_id)
+        invalidate_principal(customer_id)
         
         return jsonify({
             'success': True,
@@ -184,6 +252,9 @@ def delete_customer(customer_id):
         customer.status = 'inactive'
         customer.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_customer_profile(customer_id)
+        invalidate_principal(customer_id)
+        revoke_customer_sessions(customer_id, 'account_inactive')
         
         return jsonify({
             'success': True,
@@ -196,18 +267,61 @@ def delete_customer(customer_id):
 
 @customer_bp.route('/customers/<int:customer_id>/orders', methods=['GET'])
 def get_customer_orders(customer_id):
-    """Get all orders for a specific customer"""
+    """Get a page of a customer's orders, newest first, with their stored aggregates"""
     try:
-        customer = Customer.query.get_or_404(customer_id)
-        orders = customer.orders
-        
-        return jsonify({
+        page = max(int(request.args.get('page', 1)), 1)
+        per_page = min(max(int(request.args.get('per_page', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers'}), 400
+
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, email, total_orders, total_spent, loyalty_points, last_order_date
+            FROM customers WHERE id = %s
+        """, (customer_id,))
+        customer = cursor.fetchone()
+        if not customer:
+            return jsonify({'error': 'Customer not found'}), 404
+
+        # Both served by idx_orders_customer_email_created_at; only one page is read
+        cursor.execute("""
+            SELECT COUNT(*) AS count FROM orders WHERE LOWER(customer_email) = LOWER(%s)
+        """, (customer['email'],))
+        total = cursor.fetchone()['count']
+        cursor.execute("""
+            SELECT id, customer_name, customer_email, customer_phone, items, subtotal, tax, total,
+                   payment_method, status, source, fulfillment_method, created_at, updated_at
+            FROM orders
+            WHERE LOWER(customer_email) = LOWER(%s)
+            ORDER BY LOWER(customer_email), created_at DESC
+            LIMIT %s OFFSET %s
+        """, (customer['email'], per_page, (page - 1) * per_page))
+        rows = cursor.fetchall()
+        line_items = load_line_items(cursor, [row['id'] for row in rows])
+
+        orders = []
+        for row in rows:
+            order = dict(row)
+            order['items'] = items_for(line_items, row['id'], row['items'])
+            orders.append(order)
+
+        return json_response({
             'success': True,
-            'orders': [order.to_dict() for order in orders]
+            'customer_id': customer_id,
+            'stats': customer_summary(customer),
+            'orders': orders,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page,
+            'current_page': page,
+            'per_page': per_page
         })
-        
+
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    finally:
+        conn.close()
 
 @customer_bp.route('/customers/<int:customer_id>/documents', methods=['GET'])
 def get_customer_documents(customer_id):
@@ -225,60 +339,27 @@ def get_customer_documents(customer_id):
         return jsonify({'error': str(e)}), 500
 
 @customer_bp.route('/customers/<int:customer_id>/documents', methods=['POST'])
-def upload_customer_document():
+def upload_customer_document(customer_id):
     """Upload a document for a customer"""
+    return upload_document(
+        CustomerDocument, 'customer_documents', Customer, 'customer_id', customer_id,
+        on_created=lambda customer: invalidate_customer_profile(customer.id)
+    )
+
+@customer_bp.route('/documents/<int:document_id>/file', methods=['GET'])
+def download_customer_document(document_id):
+    """Download a customer document (its customer or an admin only)"""
     try:
-        customer_id = request.form.get('customer_id')
-        document_type = request.form.get('document_type')
-        
-        if not customer_id or not document_type:
-            return jsonify({'error': 'Customer ID and document type are required'}), 400
-        
-        customer = Customer.query.get_or_404(customer_id)
-        
-        # Check if file was uploaded
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file uploaded'}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'File type not allowed'}), 400
-        
-        # Create upload directory if it doesn't exist
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-        
-        # Save file
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{customer_id}_{document_type}_{timestamp}_{filename}"
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(file_path)
-        
-        # Create document record
-        document = CustomerDocument(
-            customer_id=customer_id,
-            document_type=document_type,
-            document_name=file.filename,
-            file_path=file_path,
-            file_size=os.path.getsize(file_path),
-            mime_type=file.mimetype
-        )
-        
-        db.session.add(document)
-        db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Document uploaded successfully',
-            'document': document.to_dict()
-        }), 201
-        
+        document = CustomerDocument.query.get(document_id)
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
+    if document is None:
+        return jsonify({'error': 'Not found'}), 404
+
+    denied = owner_or_admin_error(lambda principal: principal['id'] == document.customer_id)
+    if denied:
+        return denied
+    return send_document(document)
 
 @customer_bp.route('/documents/<int:document_id>/verify', methods=['PUT'])
 def verify_document(document_id):
@@ -294,6 +375,7 @@ def verify_document(document_id):
         document.updated_at = datetime.utcnow()
         
         db.session.commit()
+        invalidate_customer_profile(document.customer_id)
         
         return jsonify({
             'success': True,
@@ -325,6 +407,7 @@ def add_customer_address(customer_id):
         customer.add_address(address_data)
         customer.updated_at = datetime.utcnow()
         db.session.commit()
+        invalidate_customer_profile(customer_id)
         
         return jsonify({
             'success': True,
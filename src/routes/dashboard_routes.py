@@ -1,15 +1,14 @@
 from flask import Blueprint, jsonify, request
 from datetime import datetime, timedelta
-import sqlite3
-import os
+from src.database_config import db_config
+from src.services.db_instrumentation import SQLITE_DB_PATH, connect_sqlite
+from src.services.analytics import top_skus
+from src.services.table_versions import conditional_get
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
 def get_db_connection():
-    db_path = os.path.join(os.path.dirname(__file__), '..', 'dankdash.db')
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return connect_sqlite(SQLITE_DB_PATH)
 
 @dashboard_bp.route('/stats', methods=['GET'])
 def get_dashboard_stats():
@@ -27,20 +26,31 @@ def get_dashboard_stats():
         result = cursor.fetchone()
         total_sales = result['total'] if result['total'] else 0
         
-        # Get total customers (mock data for now)
-        total_customers = 150
+        # Get total customers
+        cursor.execute("SELECT COUNT(*) as count FROM customers")
+        total_customers = cursor.fetchone()['count']
         
-        # Get total products (mock data for now)
-        total_products = 25
+        # Get total products
+        cursor.execute("SELECT COUNT(*) as count FROM inventory")
+        total_products = cursor.fetchone()['count']
         
         conn.close()
         
+        # Top products for the last 30 days, from the PostgreSQL rollups /pos/stats also reads
+        today = datetime.now().date()
+        conn = db_config.get_connection()
+        try:
+            top_products = top_skus(conn.cursor(), date_from=today - timedelta(days=30), date_to=today, limit=5)
+        finally:
+            conn.close()
+        
         return jsonify({
             'success': True,
             'totalOrders': total_orders,
             'totalSales': float(total_sales),
             'totalCustomers': total_customers,
-            'totalProducts': total_products
+            'totalProducts': total_products,
+            'topProducts': top_products
         })
         
     except Exception as e:
@@ -50,10 +60,12 @@ def get_dashboard_stats():
             'totalOrders': 0,
             'totalSales': 0,
             'totalCustomers': 0,
-            'totalProducts': 0
+            'totalProducts': 0,
+            'topProducts': []
         })
 
 @dashboard_bp.route('/ecommerce/stats', methods=['GET'])
+@conditional_get('orders', connect=get_db_connection)
 def get_ecommerce_stats():
     """Get eCommerce specific statistics"""
     try:
@@ -95,6 +107,7 @@ def get_ecommerce_stats():
         })
 
 @dashboard_bp.route('/recent-activity', methods=['GET'])
+@conditional_get('orders', connect=get_db_connection)
 def get_recent_activity():
     """Get recent system activity"""
     try:
@@ -5,6 +5,9 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from database import db
+from src.services.cache import cached_response, invalidates
+from src.services.idempotency import idempotent
+from src.services.order_items import cart_errors
 
 database_order_bp = Blueprint('database_order', __name__)
 
@@ -84,6 +87,7 @@ def get_orders():
         }), 500
 
 @database_order_bp.route('/api/pos/products', methods=['GET'])
+@cached_response('catalog')
 def get_pos_products():
     try:
         products = db.get_products()
@@ -97,11 +101,23 @@ def get_pos_products():
             'error': str(e)
         }), 500
 
+# Registered before enhanced_pos and pos_integration, so this is the handler
+# terminals actually reach for POST /api/pos/sale
 @database_order_bp.route('/api/pos/sale', methods=['POST'])
+@idempotent('pos_sale')
+@invalidates('catalog')
 def create_pos_sale():
     try:
         data = request.get_json()
         
+        errors = cart_errors(data.get('items'))
+        if errors:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid items',
+                'errors': errors
+            }), 400
+        
         # Generate unique sale ID
         sale_id = f"SALE-{datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:8].upper()}"
         
@@ -3,6 +3,7 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+from src.services.metrics import track_outbound
 
 email_bp = Blueprint('email', __name__)
 
@@ -48,10 +49,11 @@ def test_email_connection():
                 }), 400
             
             # Test Gmail SMTP connection
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
-            server.login(email_config['gmail_user'], email_config['gmail_password'])
-            server.quit()
+            with track_outbound('smtp', 'test_connection'):
+                server = smtplib.SMTP('smtp.gmail.com', 587)
+                server.starttls()
+                server.login(email_config['gmail_user'], email_config['gmail_password'])
+                server.quit()
             
             return jsonify({
                 'success': True,
@@ -131,12 +133,13 @@ def send_gmail(to_email, subject, body):
         
         msg.attach(MIMEText(body, 'html'))
         
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(email_config['gmail_user'], email_config['gmail_password'])
-        text = msg.as_string()
-        server.sendmail(email_config['gmail_user'], to_email, text)
-        server.quit()
+        with track_outbound('smtp', 'send_email'):
+            server = smtplib.SMTP('smtp.gmail.com', 587)
+            server.starttls()
+            server.login(email_config['gmail_user'], email_config['gmail_password'])
+            text = msg.as_string()
+            server.sendmail(email_config['gmail_user'], to_email, text)
+            server.quit()
         
         return jsonify({
             'success': True,
@@ -1,16 +1,17 @@
 from flask import Blueprint, jsonify, request
 from datetime import datetime
-import sqlite3
-import os
 import json
+from src.services.db_instrumentation import SQLITE_DB_PATH, connect_sqlite
+from src.services.idempotency import idempotent
+from src.services.cache import cached_response, invalidates
+from src.services.table_versions import init_sqlite_versions_table, bump_sqlite_version
+from src.services.order_items import init_sqlite_order_items_table, cart_errors, write_line_items, load_line_items, items_for
+from src.services.analytics import init_sqlite_analytics_tables, record_daily_totals, sales_windows
 
 enhanced_pos_bp = Blueprint('enhanced_pos', __name__)
 
 def get_db_connection():
-    db_path = os.path.join(os.path.dirname(__file__), '..', 'dankdash.db')
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return connect_sqlite(SQLITE_DB_PATH)
 
 def init_pos_tables():
     """Initialize POS-specific tables"""
@@ -54,6 +55,11 @@ def init_pos_tables():
         )
     ''')
     
+    # Normalized line items for POS sales and orders
+    init_sqlite_order_items_table(cursor)
+    init_sqlite_analytics_tables(cursor)
+    init_sqlite_versions_table(cursor)
+    
     # Insert sample products if inventory is empty
     cursor.execute("SELECT COUNT(*) FROM inventory")
     if cursor.fetchone()[0] == 0:
@@ -77,6 +83,7 @@ def init_pos_tables():
 init_pos_tables()
 
 @enhanced_pos_bp.route('/products', methods=['GET'])
+@cached_response('catalog')
 def get_pos_products():
     """Get all products for POS system"""
     try:
@@ -117,6 +124,8 @@ def get_pos_products():
         }), 500
 
 @enhanced_pos_bp.route('/sale', methods=['POST'])
+@idempotent('pos_sale')
+@invalidates('catalog')
 def create_pos_sale():
     """Create a new POS sale with full integration"""
     try:
@@ -130,6 +139,14 @@ def create_pos_sale():
         customer = data.get('customer', {})
         payment = data.get('payment', {})
         
+        errors = cart_errors(items)
+        if errors:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid items',
+                'errors': errors
+            }), 400
+        
         # Calculate totals
         subtotal = sum(item['price'] * item['quantity'] for item in items)
         tax_rate = 0.0875  # 8.75% tax
@@ -163,6 +180,10 @@ def create_pos_sale():
             data.get('notes', '')
         ))
         
+        # Normalized line items (the ORD-POS mirror below gets none, so the sale is counted once)
+        write_line_items(cursor, sale_id, items, source='pos')
+        record_daily_totals(cursor, 'pos', subtotal, tax, total)
+        
         # Update inventory for each item
         for item in items:
             cursor.execute('''
@@ -231,6 +252,7 @@ def create_pos_sale():
                 datetime.now().isoformat()
             ))
         
+        bump_sqlite_version(cursor, 'orders', 'inventory')
         conn.commit()
         conn.close()
         
@@ -277,15 +299,18 @@ def get_pos_transactions():
             ORDER BY timestamp DESC
         ''')
         
+        rows = cursor.fetchall()
+        line_items = load_line_items(cursor, [row['sale_id'] for row in rows])
+        
         transactions = []
-        for row in cursor.fetchall():
+        for row in rows:
             transactions.append({
                 'id': row['sale_id'],
                 'customer': {
                     'name': row['customer_name'],
                     'email': row['customer_email']
                 },
-                'items': json.loads(row['items']) if row['items'] else [],
+                'items': items_for(line_items, row['sale_id'], row['items']),
                 'subtotal': float(row['subtotal']),
                 'tax': float(row['tax']),
                 'total': float(row['total']),
@@ -310,6 +335,7 @@ def get_pos_transactions():
         }), 500
 
 @enhanced_pos_bp.route('/inventory', methods=['GET'])
+@cached_response('catalog')
 def get_inventory():
     """Get current inventory levels"""
     try:
@@ -355,18 +381,14 @@ def get_pos_stats():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Get today's sales
-        cursor.execute('''
-            SELECT COUNT(*) as count, SUM(total) as total
-            FROM pos_transactions
-            WHERE DATE(timestamp) = DATE('now')
-        ''')
-        today = cursor.fetchone()
+        # Get today's sales from the daily rollups
+        windows = sales_windows(cursor, source='pos')
         
-        # Get total sales
+        # Get total sales (all rollup days)
         cursor.execute('''
-            SELECT COUNT(*) as count, SUM(total) as total
-            FROM pos_transactions
+            SELECT SUM(transaction_count) as count, SUM(total) as total
+            FROM daily_sales_rollup
+            WHERE source = 'pos'
         ''')
         total = cursor.fetchone()
         
@@ -375,10 +397,10 @@ def get_pos_stats():
         return jsonify({
             'success': True,
             'stats': {
-                'today_sales': float(today['total']) if today['total'] else 0,
-                'today_transactions': today['count'],
+                'today_sales': windows['daily_sales'],
+                'today_transactions': windows['daily_transactions'],
                 'total_sales': float(total['total']) if total['total'] else 0,
-                'total_transactions': total['count']
+                'total_transactions': total['count'] or 0
             }
         })
         
@@ -0,0 +1,144 @@
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from src.database_config import db_config
+from src.services.serialization import dumps, loads
+from datetime import datetime, timedelta
+import csv
+import io
+import logging
+
+logger = logging.getLogger(__name__)
+
+export_bp = Blueprint('export', __name__)
+
+# Rows pulled from the server-side cursor per round trip
+EXPORT_BATCH_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+ORDER_EXPORT_COLUMNS = [
+    'id', 'customer_name', 'customer_email', 'customer_phone', 'items',
+    'subtotal', 'tax', 'total', 'payment_method', 'status', 'source',
+    'fulfillment_method', 'created_at', 'updated_at'
+]
+
+POS_EXPORT_COLUMNS = [
+    'sale_id', 'customer_name', 'customer_email', 'customer_phone', 'items',
+    'subtotal', 'tax', 'total', 'payment_method', 'amount_paid', 'change_given',
+    'status', 'created_at'
+]
+
+def parse_export_filters():
+    """Read format, date range and status filters from the query string"""
+    export_format = request.args.get('format', 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    date_from = request.args.get('date_from')
+    date_to = request.args.get('date_to')
+    date_from = datetime.fromisoformat(date_from) if date_from else None
+    # A bare date as date_to includes that whole day
+    if date_to:
+        date_to = datetime.fromisoformat(date_to) + (timedelta(days=1) if len(date_to) == 10 else timedelta())
+
+    return export_format, {
+        'date_from': date_from,
+        'date_to': date_to,
+        'status': request.args.get('status'),
+        'source': request.args.get('source')
+    }
+
+def build_export_query(table, columns, filters, allow_source=False):
+    """SELECT for an export with the requested filters, oldest first"""
+    query = f"SELECT {', '.join(columns)} FROM {table} WHERE 1 = 1"
+    params = []
+
+    if filters['date_from']:
+        query += " AND created_at >= %s"
+        params.append(filters['date_from'])
+    if filters['date_to']:
+        query += " AND created_at < %s"
+        params.append(filters['date_to'])
+    if filters['status']:
+        query += " AND status = %s"
+        params.append(filters['status'])
+    if allow_source and filters['source']:
+        query += " AND source = %s"
+        params.append(filters['source'])
+
+    query += " ORDER BY created_at, " + columns[0]
+    return query, params
+
+def ndjson_chunk(rows):
+    """One NDJSON line per row, with the items JSON column inlined"""
+    lines = []
+    for row in rows:
+        if row.get('items'):
+            try:
+                row['items'] = loads(row['items'])
+            except ValueError:
+                pass
+        lines.append(dumps(row))
+    return b'\n'.join(lines) + b'\n'
+
+def csv_chunk(rows, columns):
+    """CSV lines for a batch of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in (row[column] for column in columns)
+        ])
+    return buffer.getvalue().encode()
+
+def stream_export(name, table, columns, allow_source=False):
+    """Stream a table export from a named (server-side) cursor in constant memory"""
+    try:
+        export_format, filters = parse_export_filters()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': f'Invalid parameter: {str(e)}'}), 400
+
+    query, params = build_export_query(table, columns, filters, allow_source)
+
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor(name=f'{name}_export')
+        cursor.execute(query, params)
+    except Exception as e:
+        conn.close()
+        logger.exception('Export failed: %s', e)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    def generate():
+        try:
+            if export_format == 'csv':
+                yield csv_chunk([dict(zip(columns, columns))], columns)
+
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows:
+                    break
+                yield ndjson_chunk(rows) if export_format == 'ndjson' else csv_chunk(rows, columns)
+        finally:
+            cursor.close()
+            conn.close()
+
+    filename = f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    return Response(
+        stream_with_context(generate()),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@export_bp.route('/export/orders', methods=['GET'])
+def export_orders():
+    """Stream orders as NDJSON or CSV, filtered by date_from, date_to, status and source"""
+    return stream_export('orders', 'orders', ORDER_EXPORT_COLUMNS, allow_source=True)
+
+@export_bp.route('/export/pos-transactions', methods=['GET'])
+def export_pos_transactions():
+    """Stream POS transactions as NDJSON or CSV, filtered by date_from, date_to and status"""
+    return stream_export('pos_transactions', 'pos_transactions', POS_EXPORT_COLUMNS)
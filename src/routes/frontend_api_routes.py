@@ -1,5 +1,13 @@
 from flask import Blueprint, request, jsonify
 from src.database_config import db_config
+from src.services.idempotency import idempotent
+from src.services.order_items import cart_errors, item_quantity, write_line_items
+from src.services.analytics import record_sale, record_daily_totals
+from src.services.customer_stats import record_customer_order
+from src.services.cache import cached_response
+from src.services.table_versions import conditional_get
+from src.services.serialization import json_response
+from src.services.rate_limit import rate_limit
 import json
 from datetime import datetime
 import uuid
@@ -8,37 +16,31 @@ import uuid
 frontend_api_bp = Blueprint('frontend_api', __name__)
 
 @frontend_api_bp.route('/products', methods=['GET'])
+@conditional_get('inventory')
+@cached_response('catalog')
 def get_products():
     """Get products for frontend - maps to POS products"""
     try:
         conn = db_config.get_connection()
         cursor = conn.cursor()
         
-        # Get products from POS system and inventory
+        # Get products from POS system and inventory. Defaults are applied in SQL so
+        # rows come back already shaped as products and are encoded as-is.
         cursor.execute("""
-            SELECT sku as id, name, category, price, stock_quantity as stock, 
-                   thc_percentage as thc, cbd_percentage as cbd, description
+            SELECT sku as id, name, category,
+                   COALESCE(price, 0) as price,
+                   COALESCE(stock_quantity, 0) as stock,
+                   COALESCE(thc_percentage, 0) as thc,
+                   COALESCE(cbd_percentage, 0) as cbd,
+                   COALESCE(NULLIF(description, ''), 'Premium ' || category) as description
             FROM inventory 
             WHERE status = 'active'
             ORDER BY created_at DESC
         """)
         
-        items = cursor.fetchall()
+        products = cursor.fetchall()
         conn.close()
         
-        products = []
-        for item in items:
-            products.append({
-                'id': item['id'] or item['sku'],
-                'name': item['name'],
-                'category': item['category'],
-                'price': float(item['price']) if item['price'] else 0.0,
-                'stock': item['stock'] or 0,
-                'thc': float(item['thc']) if item['thc'] else 0.0,
-                'cbd': float(item['cbd']) if item['cbd'] else 0.0,
-                'description': item['description'] or f"Premium {item['category']}"
-            })
-        
         # If no inventory items, return demo products
         if not products:
             products = [
@@ -48,11 +50,11 @@ def get_products():
                 {'id': 'demo-004', 'name': 'THC Gummies', 'category': 'Edibles', 'price': 25.0, 'stock': 50, 'thc': 10.0, 'cbd': 0.5, 'description': '10mg THC gummies'}
             ]
         
-        return jsonify({
+        return json_response({
             'success': True,
             'products': products,
             'count': len(products)
-        }), 200
+        })
         
     except Exception as e:
         return jsonify({
@@ -61,6 +63,8 @@ def get_products():
         }), 500
 
 @frontend_api_bp.route('/checkout', methods=['POST'])
+@rate_limit('checkout', 10, 60)
+@idempotent('checkout')
 def process_checkout():
     """Process checkout - creates order"""
     try:
@@ -76,8 +80,16 @@ def process_checkout():
                 'error': 'Customer info and items are required'
             }), 400
         
+        errors = cart_errors(items)
+        if errors:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid items',
+                'errors': errors
+            }), 400
+        
         # Calculate totals
-        subtotal = sum(item.get('price', 0) * item.get('quantity', 1) for item in items)
+        subtotal = sum(float(item.get('price', 0)) * item_quantity(item) for item in items)
         tax_rate = 0.0875  # 8.75% tax
         tax = subtotal * tax_rate
         total = subtotal + tax
@@ -111,6 +123,11 @@ def process_checkout():
             datetime.now()
         ))
         
+        write_line_items(cursor, order_id, items, source='order')
+        record_sale(cursor, items)
+        record_daily_totals(cursor, 'order', subtotal, tax, total)
+        record_customer_order(cursor, customer_info.get('email'), total, name=customer_info.get('name'), phone=customer_info.get('phone'))
+        
         conn.commit()
         conn.close()
         
@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from src.database_config import db_config
+from src.services.cache import cached_response, invalidates
+from src.services.table_versions import bump_version, conditional_get
+from src.services.serialization import json_response, stream_json_list
 import psycopg2
 from datetime import datetime
 
@@ -15,6 +18,7 @@ def test_inventory_route():
     }), 200
 
 @inventory_bp.route('/inventory/fix-schema', methods=['POST'])
+@invalidates('catalog')
 def fix_inventory_schema():
     """Force recreate inventory table with correct schema"""
     try:
@@ -58,6 +62,7 @@ def fix_inventory_schema():
         ''')
         
         conn.commit()
+        bump_version(conn, 'inventory')
         conn.close()
         
         return jsonify({
@@ -72,6 +77,8 @@ def fix_inventory_schema():
         }), 500
 
 @inventory_bp.route('/inventory', methods=['GET'])
+@conditional_get('inventory')
+@cached_response('catalog')
 def get_inventory():
     """Get all inventory items with optional filtering"""
     try:
@@ -104,51 +111,34 @@ def get_inventory():
             
         query += " ORDER BY created_at DESC"
         
+        filters_applied = {
+            'category': category,
+            'status': status,
+            'low_stock_only': low_stock
+        }
+        
+        # Large catalogs: stream rows from a server-side cursor instead of loading them all
+        if request.args.get('stream', 'false').lower() == 'true':
+            cursor.close()
+            stream_cursor = conn.cursor(name='inventory_stream')
+            stream_cursor.execute(query, params)
+            return stream_json_list(
+                'inventory', stream_cursor,
+                envelope={'success': True, 'filters_applied': filters_applied},
+                on_close=conn.close
+            )
+        
+        # Column names are already the response keys; Decimal and dates are encoded natively
         cursor.execute(query, params)
-        items = cursor.fetchall()
+        inventory_items = cursor.fetchall()
         conn.close()
         
-        inventory_items = []
-        for item in items:
-            inventory_items.append({
-                'id': item['id'],
-                'sku': item['sku'],
-                'name': item['name'],
-                'category': item['category'],
-                'subcategory': item['subcategory'],
-                'description': item['description'],
-                'price': float(item['price']) if item['price'] else None,
-                'cost': float(item['cost']) if item['cost'] else None,
-                'stock_quantity': item['stock_quantity'],
-                'reserved_quantity': item['reserved_quantity'],
-                'min_stock_level': item['min_stock_level'],
-                'max_stock_level': item['max_stock_level'],
-                'unit': item['unit'],
-                'weight_grams': float(item['weight_grams']) if item['weight_grams'] else None,
-                'thc_percentage': float(item['thc_percentage']) if item['thc_percentage'] else None,
-                'cbd_percentage': float(item['cbd_percentage']) if item['cbd_percentage'] else None,
-                'strain_type': item['strain_type'],
-                'brand': item['brand'],
-                'supplier': item['supplier'],
-                'batch_number': item['batch_number'],
-                'expiry_date': item['expiry_date'].isoformat() if item['expiry_date'] else None,
-                'lab_tested': item['lab_tested'],
-                'lab_results': item['lab_results'],
-                'status': item['status'],
-                'created_at': item['created_at'].isoformat(),
-                'updated_at': item['updated_at'].isoformat()
-            })
-        
-        return jsonify({
+        return json_response({
             'success': True,
             'inventory': inventory_items,
             'count': len(inventory_items),
-            'filters_applied': {
-                'category': category,
-                'status': status,
-                'low_stock_only': low_stock
-            }
-        }), 200
+            'filters_applied': filters_applied
+        })
         
     except Exception as e:
         return jsonify({
@@ -157,6 +147,7 @@ def get_inventory():
         }), 500
 
 @inventory_bp.route('/inventory', methods=['POST'])
+@invalidates('catalog')
 def create_inventory_item():
     """Create a new inventory item"""
     try:
@@ -221,6 +212,7 @@ def create_inventory_item():
         
         item = cursor.fetchone()
         conn.commit()
+        bump_version(conn, 'inventory')
         conn.close()
         
         return jsonify({
@@ -243,6 +235,7 @@ def create_inventory_item():
         }), 500
 
 @inventory_bp.route('/inventory/<int:item_id>/adjust', methods=['POST'])
+@invalidates('catalog')
 def adjust_inventory(item_id):
     """Adjust inventory stock levels (add/remove stock)"""
     try:
@@ -306,6 +299,7 @@ def adjust_inventory(item_id):
         
         adjustment = cursor.fetchone()
         conn.commit()
+        bump_version(conn, 'inventory')
         conn.close()
         
         return jsonify({
@@ -329,6 +323,8 @@ def adjust_inventory(item_id):
         }), 500
 
 @inventory_bp.route('/inventory/low-stock', methods=['GET'])
+@conditional_get('inventory')
+@cached_response('catalog')
 def get_low_stock_items():
     """Get items with low stock levels"""
     try:
@@ -372,6 +368,7 @@ def get_low_stock_items():
         }), 500
 
 @inventory_bp.route('/inventory/<int:item_id>', methods=['GET'])
+@cached_response('catalog')
 def get_inventory_item(item_id):
     """Get a single inventory item by ID"""
     try:
@@ -398,39 +395,10 @@ def get_inventory_item(item_id):
                 'error': 'Inventory item not found'
             }), 404
         
-        inventory_item = {
-            'id': item['id'],
-            'sku': item['sku'],
-            'name': item['name'],
-            'category': item['category'],
-            'subcategory': item['subcategory'],
-            'description': item['description'],
-            'price': float(item['price']) if item['price'] else None,
-            'cost': float(item['cost']) if item['cost'] else None,
-            'stock_quantity': item['stock_quantity'],
-            'reserved_quantity': item['reserved_quantity'],
-            'min_stock_level': item['min_stock_level'],
-            'max_stock_level': item['max_stock_level'],
-            'unit': item['unit'],
-            'weight_grams': float(item['weight_grams']) if item['weight_grams'] else None,
-            'thc_percentage': float(item['thc_percentage']) if item['thc_percentage'] else None,
-            'cbd_percentage': float(item['cbd_percentage']) if item['cbd_percentage'] else None,
-            'strain_type': item['strain_type'],
-            'brand': item['brand'],
-            'supplier': item['supplier'],
-            'batch_number': item['batch_number'],
-            'expiry_date': item['expiry_date'].isoformat() if item['expiry_date'] else None,
-            'lab_tested': item['lab_tested'],
-            'lab_results': item['lab_results'],
-            'status': item['status'],
-            'created_at': item['created_at'].isoformat(),
-            'updated_at': item['updated_at'].isoformat()
-        }
-        
-        return jsonify({
+        return json_response({
             'success': True,
-            'item': inventory_item
-        }), 200
+            'item': item
+        })
         
     except Exception as e:
         return jsonify({
@@ -439,6 +407,7 @@ def get_inventory_item(item_id):
         }), 500
 
 @inventory_bp.route('/inventory/<int:item_id>', methods=['PUT'])
+@invalidates('catalog')
 def update_inventory_item(item_id):
     """Update an existing inventory item"""
     try:
@@ -504,6 +473,7 @@ def update_inventory_item(item_id):
         cursor.execute(query, update_values)
         updated_item = cursor.fetchone()
         conn.commit()
+        bump_version(conn, 'inventory')
         conn.close()
         
         return jsonify({
@@ -526,6 +496,7 @@ def update_inventory_item(item_id):
         }), 500
 
 @inventory_bp.route('/inventory/<int:item_id>', methods=['DELETE'])
+@invalidates('catalog')
 def delete_inventory_item(item_id):
     """Delete an inventory item"""
     try:
@@ -545,6 +516,7 @@ def delete_inventory_item(item_id):
         # Delete the item
         cursor.execute("DELETE FROM inventory WHERE id = %s", (item_id,))
         conn.commit()
+        bump_version(conn, 'inventory')
         conn.close()
         
         return jsonify({
@@ -559,6 +531,7 @@ def delete_inventory_item(item_id):
         }), 500
 
 @inventory_bp.route('/inventory/<int:item_id>/stock', methods=['POST'])
+@invalidates('catalog')
 def update_stock(item_id):
     """Update stock levels for an inventory item"""
     try:
@@ -664,6 +637,7 @@ def update_stock(item_id):
         
         adjustment = cursor.fetchone()
         conn.commit()
+        bump_version(conn, 'inventory')
         conn.close()
         
         return jsonify({
@@ -688,6 +662,7 @@ def update_stock(item_id):
         }), 500
 
 @inventory_bp.route('/inventory/<int:item_id>/transfer', methods=['POST'])
+@invalidates('catalog')
 def transfer_inventory(item_id):
     """Transfer inventory between locations"""
     try:
@@ -754,6 +729,7 @@ def transfer_inventory(item_id):
         
         transfer_record = cursor.fetchone()
         conn.commit()
+        bump_version(conn, 'inventory')
         conn.close()
         
         return jsonify({
@@ -0,0 +1,15 @@
+from flask import Blueprint, Response, jsonify
+from src.services.metrics import metrics_available, render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint, covering every gunicorn worker"""
+    if not metrics_available():
+        return jsonify({
+            'success': False,
+            'error': 'Metrics are disabled (METRICS_ENABLED=false or prometheus_client not installed)'
+        }), 503
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
@@ -1,18 +1,17 @@
 from flask import Blueprint, jsonify, request
 from datetime import datetime
-import sqlite3
-import os
 import json
+from src.services.db_instrumentation import SQLITE_DB_PATH, connect_sqlite
+from src.services.order_items import load_line_items, items_for
+from src.services.table_versions import bump_sqlite_version, conditional_get
 
 order_management_bp = Blueprint('order_management', __name__)
 
 def get_db_connection():
-    db_path = os.path.join(os.path.dirname(__file__), '..', 'dankdash.db')
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return connect_sqlite(SQLITE_DB_PATH)
 
 @order_management_bp.route('/orders', methods=['GET'])
+@conditional_get('orders', connect=get_db_connection)
 def get_all_orders():
     """Get all orders from both online checkout and POS"""
     try:
@@ -28,19 +27,17 @@ def get_all_orders():
             ORDER BY created_at DESC
         ''')
         
+        rows = cursor.fetchall()
+        line_items = load_line_items(cursor, [row['id'] for row in rows])
+        
         orders = []
-        for row in cursor.fetchall():
-            try:
-                items = json.loads(row['items']) if row['items'] else []
-            except:
-                items = []
-                
+        for row in rows:
             orders.append({
                 'id': row['id'],
                 'customer_name': row['customer_name'],
                 'customer_email': row['customer_email'],
                 'customer_phone': row['customer_phone'],
-                'items': items,
+                'items': items_for(line_items, row['id'], row['items']),
                 'subtotal': float(row['subtotal']) if row['subtotal'] else 0,
                 'tax': float(row['tax']) if row['tax'] else 0,
                 'total': float(row['total']) if row['total'] else 0,
@@ -85,10 +82,7 @@ def get_order_details(order_id):
                 'error': 'Order not found'
             }), 404
         
-        try:
-            items = json.loads(row['items']) if row['items'] else []
-        except:
-            items = []
+        items = items_for(load_line_items(cursor, [order_id]), order_id, row['items'])
         
         order = {
             'id': row['id'],
@@ -148,6 +142,7 @@ def update_order_status(order_id):
                 'error': 'Order not found'
             }), 404
         
+        bump_sqlite_version(cursor, 'orders')
         conn.commit()
         conn.close()
         
@@ -5,6 +5,10 @@ import random
 import string
 from src.models.order import db, Order, DeliveryPartner, OrderDelivery
 from src.models.user import User
+from src.database_config import db_config
+from src.services.order_items import cart_errors, write_line_items, load_line_items
+from src.services.analytics import record_sale, record_daily_totals
+from src.services.customer_stats import record_customer_order
 
 order_bp = Blueprint('orders', __name__)
 
@@ -14,12 +18,24 @@ def generate_order_number():
     random_suffix = ''.join(random.choices(string.digits, k=4))
     return f"ORD-{timestamp}-{random_suffix}"
 
+def order_line_items(order_numbers):
+    """Load normalized line items for a page of orders in one query"""
+    conn = db_config.get_connection()
+    try:
+        return load_line_items(conn.cursor(), order_numbers)
+    finally:
+        conn.close()
+
 @order_bp.route('/orders', methods=['POST'])
 def create_order():
     """Create a new order from checkout"""
     try:
         data = request.get_json()
         
+        errors = cart_errors(data.get('items', []))
+        if errors:
+            return jsonify({'error': 'Invalid items', 'errors': errors}), 400
+        
         # Generate unique order number
         order_number = generate_order_number()
         
@@ -55,6 +71,13 @@ def create_order():
         )
         
         db.session.add(order)
+        
+        # Normalized line items and rollups, written on the session's connection so they commit with the order
+        cursor = db.session.connection().connection.cursor()
+        write_line_items(cursor, order_number, data.get('items', []), source='order')
+        record_sale(cursor, data.get('items', []))
+        record_daily_totals(cursor, 'order', data.get('subtotal', 0), data.get('taxAmount', 0), data.get('total', 0))
+        record_customer_order(cursor, order.customer_email, data.get('total', 0), name=order.customer_name, phone=order.customer_phone)
         db.session.commit()
         
         # Handle delivery assignment for local delivery
@@ -118,8 +141,10 @@ def get_orders():
             page=page, per_page=per_page, error_out=False
         )
         
+        line_items = order_line_items([order.order_number for order in orders.items])
+        
         return jsonify({
-            'orders': [order.to_dict() for order in orders.items],
+            'orders': [order.to_dict(line_items.get(order.order_number)) for order in orders.items],
             'total': orders.total,
             'pages': orders.pages,
             'current_page': page
@@ -133,7 +158,8 @@ def get_order(order_id):
     """Get a specific order by ID"""
     try:
         order = Order.query.get_or_404(order_id)
-        return jsonify(order.to_dict())
+        line_items = order_line_items([order.order_number])
+        return jsonify(order.to_dict(line_items.get(order.order_number)))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
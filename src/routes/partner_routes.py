@@ -1,19 +1,14 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-import os
-from werkzeug.utils import secure_filename
 from src.models.order import db, DeliveryPartner
 from src.models.customer import CustomerDocument
 from src.routes.email_routes import send_email
+from src.services.document_storage import upload_document, send_document
+from src.services.auth import owner_or_admin_error
+from src.services.rate_limit import rate_limit
 
 partner_bp = Blueprint('partners', __name__)
 
-ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx'}
-UPLOAD_FOLDER = 'uploads/partner_documents'
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
 class PartnerApplication(db.Model):
     __tablename__ = 'partner_applications'
     
@@ -115,6 +110,7 @@ class PartnerDocument(db.Model):
     file_path = db.Column(db.String(500), nullable=False)
     file_size = db.Column(db.Integer)
     mime_type = db.Column(db.String(100))
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256, file_path is its storage key
     
     # Verification Status
     verification_status = db.Column(db.String(20), default='pending')  # pending, approved, rejected
@@ -134,6 +130,7 @@ class PartnerDocument(db.Model):
             'file_path': self.file_path,
             'file_size': self.file_size,
             'mime_type': self.mime_type,
+            'content_hash': self.content_hash,
             'verification_status': self.verification_status,
             'verified_by': self.verified_by,
             'verification_date': self.verification_date.isoformat() if self.verification_date else None,
@@ -142,6 +139,7 @@ class PartnerDocument(db.Model):
         }
 
 @partner_bp.route('/partner-applications', methods=['POST'])
+@rate_limit('partner_applications', 3, 3600)
 def submit_partner_application():
     """Submit a new partner application"""
     try:
@@ -300,64 +298,35 @@ def review_partner_application(application_id):
         return jsonify({'error': str(e)}), 500
 
 @partner_bp.route('/partner-applications/<int:application_id>/documents', methods=['POST'])
-def upload_partner_document():
+def upload_partner_document(application_id):
     """Upload documents for a partner application"""
-    try:
-        application_id = request.form.get('application_id')
-        document_type = request.form.get('document_type')
-        
-        if not application_id or not document_type:
-            return jsonify({'error': 'Application ID and document type are required'}), 400
-        
-        application = PartnerApplication.query.get_or_404(application_id)
-        
-        # Check if file was uploaded
-        if 'file' not in request.files:
-            return jsonify({'error': 'No file uploaded'}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({'error': 'No file selected'}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'File type not allowed'}), 400
-        
-        # Create upload directory if it doesn't exist
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-        
-        # Save file
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{application_id}_{document_type}_{timestamp}_{filename}"
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(file_path)
-        
-        # Create document record
-        document = PartnerDocument(
-            application_id=application_id,
-            document_type=document_type,
-            document_name=file.filename,
-            file_path=file_path,
-            file_size=os.path.getsize(file_path),
-            mime_type=file.mimetype
-        )
-        
-        db.session.add(document)
-        
-        # Update application documents status
+    return upload_document(
+        PartnerDocument, 'partner_documents', PartnerApplication, 'application_id', application_id,
+        on_created=mark_documents_uploaded
+    )
+
+def mark_documents_uploaded(application):
+    if not application.documents_uploaded:
         application.documents_uploaded = True
-        
         db.session.commit()
-        
-        return jsonify({
-            'success': True,
-            'message': 'Document uploaded successfully',
-            'document': document.to_dict()
-        }), 201
-        
+
+@partner_bp.route('/partner-documents/<int:document_id>/file', methods=['GET'])
+def download_partner_document(document_id):
+    """Download a partner document (the applicant, signed in with the application's email, or an admin)"""
+    try:
+        document = PartnerDocument.query.get(document_id)
+        application = PartnerApplication.query.get(document.application_id) if document else None
     except Exception as e:
-        db.session.rollback()
         return jsonify({'error': str(e)}), 500
+    if document is None or application is None:
+        return jsonify({'error': 'Not found'}), 404
+
+    denied = owner_or_admin_error(
+        lambda principal: (principal['email'] or '').lower() == (application.email or '').lower()
+    )
+    if denied:
+        return denied
+    return send_document(document)
 
 @partner_bp.route('/partner-documents/<int:document_id>/verify', methods=['PUT'])
 def verify_partner_document(document_id):
@@ -1,14 +1,18 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-import json
+from psycopg2.extras import Json
+import logging
 import random
 import string
+from src.database_config import db_config
 
 pos_integration_bp = Blueprint('pos_integration', __name__)
 
-# In-memory storage for demonstration (in production, use database)
-pos_sales = []
-pos_products = [
+logger = logging.getLogger(__name__)
+
+# Sales and products live in Postgres so every gunicorn worker sees the same
+# data; sales are keyed by sale_id. The catalog below seeds an empty products table.
+DEFAULT_POS_PRODUCTS = [
     {
         'id': 'SKU-001',
         'name': 'Premium OG Kush',
@@ -66,6 +70,77 @@ pos_products = [
     }
 ]
 
+# Retries when a generated sale ID collides with an existing one
+SALE_ID_ATTEMPTS = 5
+
+MAX_SALES_PAGE_SIZE = 500
+
+products_seeded = False
+
+def ensure_products_seeded(conn):
+    """Seed the demo catalog into an empty products table (once per process)"""
+    global products_seeded
+    if products_seeded:
+        return
+    cursor = conn.cursor()
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM pos_integration_products) AS seeded')
+    if not cursor.fetchone()['seeded']:
+        cursor.executemany('''
+            INSERT INTO pos_integration_products (id, name, category, price, stock, barcode, thc, strain, weight)
+            VALUES (%(id)s, %(name)s, %(category)s, %(price)s, %(stock)s, %(barcode)s, %(thc)s, %(strain)s, %(weight)s)
+            ON CONFLICT (id) DO NOTHING
+        ''', DEFAULT_POS_PRODUCTS)
+    conn.commit()
+    products_seeded = True
+
+def product_dict(row):
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'category': row['category'],
+        'price': float(row['price']),
+        'stock': row['stock'],
+        'barcode': row['barcode'],
+        'thc': float(row['thc']) if row['thc'] is not None else None,
+        'strain': row['strain'],
+        'weight': row['weight']
+    }
+
+def insert_sale(cursor, pos_sale):
+    """Store a sale under a fresh sale ID, regenerating the ID on a collision"""
+    for _ in range(SALE_ID_ATTEMPTS):
+        cursor.execute('''
+            INSERT INTO pos_integration_sales (sale_id, sale, total)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (sale_id) DO NOTHING
+            RETURNING sale_id
+        ''', (pos_sale['sale_id'], Json(pos_sale), pos_sale['total']))
+        if cursor.fetchone():
+            return pos_sale['sale_id']
+        pos_sale['sale_id'] = generate_sale_id()
+    raise RuntimeError('Could not allocate a unique sale ID')
+
+def decrement_stock(cursor, items):
+    """Take sold quantities off product stock. Returns the updated products"""
+    quantities = {}
+    for item in items:
+        if item.get('id') is not None:
+            quantities[item['id']] = quantities.get(item['id'], 0) + item.get('quantity', 1)
+
+    updated = []
+    # Fixed lock order, so concurrent sales of the same products can't deadlock
+    for product_id in sorted(quantities, key=str):
+        cursor.execute('''
+            UPDATE pos_integration_products
+            SET stock = GREATEST(0, stock - %s), updated_at = NOW()
+            WHERE id = %s
+            RETURNING id, name, stock
+        ''', (quantities[product_id], str(product_id)))
+        row = cursor.fetchone()
+        if row:
+            updated.append((row, quantities[product_id]))
+    return updated
+
 def generate_sale_id():
     """Generate a unique sale ID"""
     timestamp = datetime.now().strftime('%Y%m%d')
@@ -76,10 +151,19 @@ def generate_sale_id():
 def get_pos_products():
     """Get all POS products"""
     try:
+        conn = db_config.get_connection()
+        try:
+            ensure_products_seeded(conn)
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM pos_integration_products ORDER BY id')
+            products = [product_dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+        
         return jsonify({
             'success': True,
-            'products': pos_products,
-            'count': len(pos_products)
+            'products': products,
+            'count': len(products)
         }), 200
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -135,22 +219,27 @@ def create_pos_sale():
             'status': 'completed'
         }
         
-        # Add to sales records
-        pos_sales.append(pos_sale)
-        
-        print(f"🛒 POS SALE CREATED: {sale_id} - ${total:.2f} - {customer_info.get('name', 'Walk-in')}")
-        
-        # 1. UPDATE INVENTORY
-        for item in items:
-            product_id = item.get('id')
-            quantity_sold = item.get('quantity', 1)
+        # Save the sale and update inventory in one transaction
+        conn = db_config.get_connection()
+        try:
+            ensure_products_seeded(conn)
+            cursor = conn.cursor()
+            sale_id = insert_sale(cursor, pos_sale)
             
-            # Find and update product stock
-            for product in pos_products:
-                if product['id'] == product_id:
-                    product['stock'] = max(0, product['stock'] - quantity_sold)
-                    print(f"📦 INVENTORY UPDATED: {product['name']} - Stock reduced by {quantity_sold} (New stock: {product['stock']})")
-                    break
+            # 1. UPDATE INVENTORY
+            updated_products = decrement_stock(cursor, items)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        logger.info('POS sale created', extra={'sale_id': sale_id, 'total': round(total, 2), 'items': len(items)})
+        logger.debug('Inventory updated', extra={
+            'sale_id': sale_id,
+            'stock': [(product['id'], quantity_sold, product['stock']) for product, quantity_sold in updated_products]
+        })
         
         # 2. CREATE ACCOUNTING ENTRIES
         accounting_entries = []
@@ -229,9 +318,10 @@ def create_pos_sale():
                 'type': 'asset'
             })
         
-        print(f"💰 ACCOUNTING ENTRIES CREATED: {len(accounting_entries)} entries for Sale {sale_id}")
-        for entry in accounting_entries:
-            print(f"   - {entry['account']}: Debit ${entry['debit']:.2f}, Credit ${entry['credit']:.2f}")
+        logger.debug('Accounting entries created', extra={
+            'sale_id': sale_id,
+            'entries': [(entry['account_code'], round(entry['debit'], 2), round(entry['credit'], 2)) for entry in accounting_entries]
+        })
         
         # 3. CREATE ORDER MANAGEMENT ENTRY
         order_entry = {
@@ -247,11 +337,11 @@ def create_pos_sale():
             'sale_id': sale_id
         }
         
-        print(f"📋 ORDER MANAGEMENT ENTRY: {order_entry['order_number']} created from POS sale")
+        logger.debug('Order management entry created', extra={'sale_id': sale_id, 'order_number': order_entry['order_number']})
         
         # 4. SEND RECEIPT EMAIL (if email provided)
         if customer_info.get('email'):
-            print(f"📧 RECEIPT EMAIL SENT: Receipt sent to {customer_info.get('email')}")
+            logger.debug('Receipt email queued', extra={'sale_id': sale_id})
         
         return jsonify({
             'success': True,
@@ -279,7 +369,7 @@ def create_pos_sale():
         }), 201
         
     except Exception as e:
-        print(f"POS sale creation error: {str(e)}")
+        logger.exception('POS sale creation failed')
         return jsonify({
             'success': False,
             'error': str(e),
@@ -288,13 +378,35 @@ def create_pos_sale():
 
 @pos_integration_bp.route('/pos/sales', methods=['GET'])
 def get_pos_sales():
-    """Get all POS sales"""
+    """Get POS sales, newest first (paginated with limit/offset)"""
     try:
+        limit = min(request.args.get('limit', 100, type=int), MAX_SALES_PAGE_SIZE)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        
+        conn = db_config.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT sale FROM pos_integration_sales
+                ORDER BY created_at DESC, sale_id DESC
+                LIMIT %s OFFSET %s
+            ''', (limit, offset))
+            sales = [row['sale'] for row in cursor.fetchall()]
+            cursor.execute('''
+                SELECT COUNT(*) AS count, COALESCE(SUM(total), 0) AS total_revenue
+                FROM pos_integration_sales
+            ''')
+            totals = cursor.fetchone()
+        finally:
+            conn.close()
+        
         return jsonify({
             'success': True,
-            'sales': pos_sales,
-            'count': len(pos_sales),
-            'total_revenue': sum(sale['total'] for sale in pos_sales)
+            'sales': sales,
+            'count': totals['count'],
+            'total_revenue': float(totals['total_revenue']),
+            'limit': limit,
+            'offset': offset
         }), 200
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -303,7 +415,15 @@ def get_pos_sales():
 def get_pos_sale(sale_id):
     """Get a specific POS sale"""
     try:
-        sale = next((s for s in pos_sales if s['sale_id'] == sale_id), None)
+        conn = db_config.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT sale FROM pos_integration_sales WHERE sale_id = %s', (sale_id,))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        
+        sale = row['sale'] if row else None
         if not sale:
             return jsonify({'success': False, 'error': 'Sale not found'}), 404
         
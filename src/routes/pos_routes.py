@@ -4,6 +4,11 @@ import json
 from src.models.order import db, Order
 from src.models.customer import Customer, AccountingEntry
 from src.routes.email_routes import send_email
+from src.services.idempotency import idempotent
+from src.services.cache import cached_response, invalidates
+from src.database_config import db_config
+from src.services.order_items import sku_revenue
+from src.services.analytics import top_skus, sales_windows
 
 pos_bp = Blueprint('pos', __name__)
 
@@ -141,6 +146,7 @@ class POSSystem:
         return receipt
 
 @pos_bp.route('/pos/sales', methods=['POST'])
+@idempotent('pos_sales')
 def create_pos_sale():
     """Create a new POS sale"""
     try:
@@ -268,49 +274,35 @@ def get_pos_stats():
     """Get POS statistics"""
     try:
         today = datetime.now().date()
-        week_ago = today - timedelta(days=7)
         month_ago = today - timedelta(days=30)
         
-        # Daily sales
-        daily_sales = db.session.query(db.func.sum(Order.total)).filter(
-            Order.created_at >= today
-        ).scalar() or 0
-        
-        # Weekly sales
-        weekly_sales = db.session.query(db.func.sum(Order.total)).filter(
-            Order.created_at >= week_ago
-        ).scalar() or 0
-        
-        # Monthly sales
-        monthly_sales = db.session.query(db.func.sum(Order.total)).filter(
-            Order.created_at >= month_ago
-        ).scalar() or 0
-        
-        # Transaction counts
-        daily_transactions = Order.query.filter(Order.created_at >= today).count()
-        weekly_transactions = Order.query.filter(Order.created_at >= week_ago).count()
-        monthly_transactions = Order.query.filter(Order.created_at >= month_ago).count()
+        conn = db_config.get_connection()
+        try:
+            cursor = conn.cursor()
+            
+            # Day, week and month totals from the last 31 daily rollup rows
+            windows = sales_windows(cursor, today)
+            
+            # Top selling items over the last 30 days, from the daily rollups
+            top_items = top_skus(cursor, date_from=month_ago, date_to=today, limit=3)
+        finally:
+            conn.close()
         
         # Average order value
+        monthly_sales = windows['monthly_sales']
+        monthly_transactions = windows['monthly_transactions']
         avg_order_value = monthly_sales / monthly_transactions if monthly_transactions > 0 else 0
         
-        # Top selling items (mock data for now)
-        top_items = [
-            {'name': 'Blue Dream - Premium Flower', 'quantity_sold': 45, 'revenue': 2025.00},
-            {'name': 'Mixed Berry Gummies - 10mg', 'quantity_sold': 38, 'revenue': 836.00},
-            {'name': 'OG Kush - Premium Flower', 'quantity_sold': 32, 'revenue': 1440.00}
-        ]
-        
         return jsonify({
             'success': True,
             'stats': {
-                'daily_sales': float(daily_sales),
-                'weekly_sales': float(weekly_sales),
-                'monthly_sales': float(monthly_sales),
-                'daily_transactions': daily_transactions,
-                'weekly_transactions': weekly_transactions,
+                'daily_sales': windows['daily_sales'],
+                'weekly_sales': windows['weekly_sales'],
+                'monthly_sales': monthly_sales,
+                'daily_transactions': windows['daily_transactions'],
+                'weekly_transactions': windows['weekly_transactions'],
                 'monthly_transactions': monthly_transactions,
-                'average_order_value': float(avg_order_value),
+                'average_order_value': round(avg_order_value, 2),
                 'top_items': top_items
             }
         })
@@ -318,7 +310,70 @@ def get_pos_stats():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def parse_date_range():
+    """Read optional date_from / date_to query parameters"""
+    date_from = request.args.get('date_from')
+    date_to = request.args.get('date_to')
+    return (
+        datetime.fromisoformat(date_from) if date_from else None,
+        datetime.fromisoformat(date_to) if date_to else None
+    )
+
+@pos_bp.route('/pos/top-items', methods=['GET'])
+def get_top_items():
+    """Best-selling SKUs by revenue over an inclusive date range, from the daily rollups.
+
+    PostgreSQL sales only (checkout, orders and offline POS sync); sales
+    recorded in the SQLite store are not included.
+    """
+    try:
+        date_from, date_to = parse_date_range()
+        limit = min(int(request.args.get('limit', 10)), 100)
+        
+        conn = db_config.get_connection()
+        try:
+            top_items = top_skus(conn.cursor(), date_from=date_from, date_to=date_to, limit=limit)
+        finally:
+            conn.close()
+        
+        return jsonify({
+            'success': True,
+            'top_items': top_items
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@pos_bp.route('/pos/sku-revenue/<sku>', methods=['GET'])
+def get_sku_revenue(sku):
+    """Units sold and revenue for one SKU, optionally within a date range.
+
+    Read from the PostgreSQL order_items, so sales recorded in the SQLite store
+    are not included.
+    """
+    try:
+        since, until = parse_date_range()
+        
+        conn = db_config.get_connection()
+        try:
+            revenue = sku_revenue(conn.cursor(), sku, since=since, until=until)
+        finally:
+            conn.close()
+        
+        return jsonify({
+            'success': True,
+            'sku_revenue': revenue
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {str(e)}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @pos_bp.route('/pos/inventory', methods=['GET'])
+@cached_response('catalog')
 def get_inventory():
     """Get inventory levels"""
     try:
@@ -370,6 +425,7 @@ def get_inventory():
         return jsonify({'error': str(e)}), 500
 
 @pos_bp.route('/pos/inventory/<int:item_id>/adjust', methods=['POST'])
+@invalidates('catalog')
 def adjust_inventory(item_id):
     """Adjust inventory levels"""
     try:
@@ -0,0 +1,331 @@
+from flask import Blueprint, request, jsonify
+from src.database_config import db_config
+from src.services.order_items import cart_errors, item_quantity, write_line_items
+from src.services.analytics import add_sku_totals, write_sku_totals, add_daily_totals, write_daily_totals
+from src.services.customer_stats import add_customer_order, write_customer_totals
+from src.services.cache import invalidates
+from src.services.table_versions import bump_version
+from datetime import datetime, timedelta, timezone
+import json
+import logging
+import math
+
+logger = logging.getLogger(__name__)
+
+pos_sync_bp = Blueprint('pos_sync', __name__)
+
+MAX_SYNC_BATCH = 500
+MAX_CLOCK_SKEW = timedelta(minutes=10)
+DEFAULT_TAX_RATE = 8.75  # percent, same default as live POS sales
+
+def parse_client_timestamp(value):
+    """Parse an ISO-8601 timestamp from the terminal, treating naive values as UTC"""
+    timestamp = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+def finite_number(value):
+    """float(value), rejecting NaN and infinities as well as non-numbers"""
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f'{value!r} is not a finite number')
+    return number
+
+def validate_sale(sale, now):
+    """Validate one queued sale. Returns (normalized_sale, errors)"""
+    errors = []
+
+    client_sale_id = str(sale.get('client_sale_id') or '').strip()
+    if not client_sale_id:
+        errors.append('client_sale_id is required')
+    elif len(client_sale_id) > 100:
+        errors.append('client_sale_id must be at most 100 characters')
+
+    timestamp = None
+    if not sale.get('timestamp'):
+        errors.append('timestamp is required')
+    else:
+        try:
+            timestamp = parse_client_timestamp(sale['timestamp'])
+            if timestamp > now + MAX_CLOCK_SKEW:
+                errors.append('timestamp is in the future')
+        except (TypeError, ValueError):
+            errors.append('timestamp must be ISO-8601')
+
+    items = []
+    raw_items = sale.get('items') or []
+    # Whole positive quantities and finite, non-negative prices, as for online carts
+    item_errors = cart_errors(raw_items)
+    errors.extend(item_errors)
+    if not item_errors and not raw_items:
+        errors.append('items are required')
+
+    for index, item in enumerate(raw_items if not item_errors else []):
+        sku = str(item.get('sku') or item.get('id') or '').strip()
+        if not sku:
+            errors.append(f'items[{index}].sku is required')
+
+        items.append({
+            'sku': sku,
+            'name': item.get('name', ''),
+            'price': float(item.get('price', 0)),
+            'quantity': item_quantity(item)
+        })
+
+    customer = sale.get('customer') or {}
+    payment = sale.get('payment') or {}
+    if not isinstance(customer, dict):
+        errors.append('customer must be an object')
+    if not isinstance(payment, dict):
+        errors.append('payment must be an object')
+        payment = {}
+
+    try:
+        tax_rate = finite_number(sale.get('taxRate', DEFAULT_TAX_RATE))
+    except (TypeError, ValueError):
+        errors.append('taxRate must be a number')
+    try:
+        discount = round(finite_number(sale.get('discountAmount', 0)), 2)
+    except (TypeError, ValueError):
+        errors.append('discountAmount must be a number')
+    try:
+        amount_received = payment.get('amountReceived')
+        amount_received = finite_number(amount_received) if amount_received is not None else None
+    except (TypeError, ValueError):
+        errors.append('payment.amountReceived must be a number')
+
+    if errors:
+        return None, errors
+
+    subtotal = round(sum(item['price'] * item['quantity'] for item in items), 2)
+    tax = round(subtotal * tax_rate / 100, 2)
+    total = round(subtotal + tax - discount, 2)
+    amount_paid = amount_received if amount_received is not None else total
+
+    return {
+        'sale_id': client_sale_id,
+        'timestamp': timestamp,
+        'customer_name': customer.get('name', 'Walk-in Customer'),
+        'customer_email': customer.get('email', ''),
+        'customer_phone': customer.get('phone', ''),
+        'items': items,
+        'subtotal': subtotal,
+        'tax': tax,
+        'total': total,
+        'payment_method': payment.get('method', 'cash'),
+        'amount_paid': amount_paid,
+        'change_given': max(0, round(amount_paid - total, 2))
+    }, []
+
+@pos_sync_bp.route('/pos/sync', methods=['POST'])
+@invalidates('catalog')
+def sync_pos_sales():
+    """Apply a batch of sales a terminal queued while offline.
+
+    Every sale carries a client-generated ID, used as the sale_id, so resending a
+    batch never double-counts. Valid sales are written in one transaction. The
+    shared rows a batch updates (SKU and daily rollups, customers, inventory) are
+    totalled across the batch first, then written table by table in key order -
+    the same order single orders use - so concurrent writers cannot deadlock.
+    """
+    try:
+        data = request.get_json()
+
+        if not data or not isinstance(data.get('sales'), list):
+            return jsonify({'success': False, 'error': 'sales list is required'}), 400
+
+        sales = data['sales']
+        terminal_id = data.get('terminal_id', 'unknown')
+
+        if len(sales) > MAX_SYNC_BATCH:
+            return jsonify({
+                'success': False,
+                'error': f'Batch too large, send at most {MAX_SYNC_BATCH} sales per request'
+            }), 413
+
+        # 1. Validate the whole batch up front
+        now = datetime.now(timezone.utc)
+        results = []
+        valid_sales = {}
+
+        for sale in sales:
+            normalized, errors = validate_sale(sale if isinstance(sale, dict) else {}, now)
+            client_sale_id = sale.get('client_sale_id') if isinstance(sale, dict) else None
+
+            if errors:
+                results.append({'client_sale_id': client_sale_id, 'status': 'rejected', 'errors': errors})
+            elif normalized['sale_id'] in valid_sales:
+                results.append({'client_sale_id': client_sale_id, 'status': 'duplicate'})
+            else:
+                valid_sales[normalized['sale_id']] = normalized
+                results.append({'client_sale_id': client_sale_id, 'status': 'pending'})
+
+        conn = db_config.get_connection()
+        try:
+            cursor = conn.cursor()
+
+            # 2. Record the sales in sale_id order. ON CONFLICT skips sales already
+            # synced by an earlier (possibly concurrent) attempt. Only rows owned
+            # by the sale are written here; shared rollup rows are totalled.
+            created = set()
+            sku_totals, daily_totals, customer_totals = {}, {}, {}
+            for sale_id in sorted(valid_sales):
+                sale = valid_sales[sale_id]
+                cursor.execute("""
+                    INSERT INTO pos_transactions (
+                        sale_id, customer_name, customer_email, customer_phone,
+                        items, subtotal, tax, total, payment_method,
+                        amount_paid, change_given, status, created_at
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (sale_id) DO NOTHING
+                    RETURNING sale_id
+                """, (
+                    sale_id,
+                    sale['customer_name'],
+                    sale['customer_email'],
+                    sale['customer_phone'],
+                    json.dumps(sale['items']),
+                    sale['subtotal'],
+                    sale['tax'],
+                    sale['total'],
+                    sale['payment_method'],
+                    sale['amount_paid'],
+                    sale['change_given'],
+                    'completed',
+                    sale['timestamp']
+                ))
+
+                if not cursor.fetchone():
+                    continue
+
+                created.add(sale_id)
+                write_line_items(cursor, sale_id, sale['items'], source='pos', created_at=sale['timestamp'])
+                add_sku_totals(sku_totals, sale['items'], sale['timestamp'])
+                add_daily_totals(daily_totals, 'pos', sale['subtotal'], sale['tax'], sale['total'], sale['timestamp'])
+                add_customer_order(
+                    customer_totals, sale['customer_email'], sale['total'], sale['timestamp'],
+                    name=sale['customer_name'], phone=sale['customer_phone']
+                )
+
+                # Mirror into orders for order management, as live POS sales do.
+                # Line items stay on the sale_id only so the sale is counted once.
+                cursor.execute("""
+                    INSERT INTO orders (
+                        id, customer_name, customer_email, customer_phone,
+                        items, subtotal, tax, total, payment_method,
+                        status, source, created_at, updated_at
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+                    ON CONFLICT (id) DO NOTHING
+                """, (
+                    f"ORD-POS-{sale_id}",
+                    sale['customer_name'],
+                    sale['customer_email'],
+                    sale['customer_phone'],
+                    json.dumps(sale['items']),
+                    sale['subtotal'],
+                    sale['tax'],
+                    sale['total'],
+                    sale['payment_method'],
+                    'completed',
+                    'pos',
+                    sale['timestamp']
+                ))
+
+            # 3. Apply the batch's rollup and customer totals, each table in key order
+            write_sku_totals(cursor, sku_totals)
+            write_daily_totals(cursor, daily_totals)
+            write_customer_totals(cursor, customer_totals)
+
+            # 4. Total the stock movement per SKU across the batch
+            demand = {}
+            for sale_id in created:
+                for item in valid_sales[sale_id]['items']:
+                    demand[item['sku']] = demand.get(item['sku'], 0) + item['quantity']
+
+            # 5. Lock inventory rows in SKU order, then decrement in the same order
+            stock = {}
+            if demand:
+                skus = sorted(demand)
+                cursor.execute("""
+                    SELECT id, sku, stock_quantity FROM inventory
+                    WHERE sku = ANY(%s)
+                    ORDER BY sku
+                    FOR UPDATE
+                """, (skus,))
+                stock = {row['sku']: row for row in cursor.fetchall()}
+
+                for sku in skus:
+                    row = stock.get(sku)
+                    if not row:
+                        continue
+
+                    cursor.execute("""
+                        UPDATE inventory
+                        SET stock_quantity = GREATEST(stock_quantity - %s, 0), updated_at = NOW()
+                        WHERE id = %s
+                    """, (demand[sku], row['id']))
+
+                    cursor.execute("""
+                        INSERT INTO inventory_adjustments
+                        (inventory_id, adjustment_type, quantity_change, reason, reference_id)
+                        VALUES (%s, %s, %s, %s, %s)
+                    """, (row['id'], 'sale', -demand[sku], f'POS offline sync from terminal {terminal_id}', f'SYNC-{terminal_id}'))
+
+            conn.commit()
+            if demand:
+                bump_version(conn, 'inventory')
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+        # 6. Per-sale results, in the order the terminal sent them
+        for result in results:
+            if result['status'] != 'pending':
+                continue
+
+            sale_id = str(result['client_sale_id']).strip()
+            if sale_id not in created:
+                result['status'] = 'duplicate'
+                continue
+
+            sale = valid_sales[sale_id]
+            warnings = []
+            for item in sale['items']:
+                row = stock.get(item['sku'])
+                if not row:
+                    warnings.append(f"Unknown SKU {item['sku']}, inventory not updated")
+                elif row['stock_quantity'] < demand[item['sku']]:
+                    warnings.append(f"Stock for {item['sku']} went below zero and was clamped")
+
+            result.update({
+                'status': 'created',
+                'sale_id': sale_id,
+                'total': sale['total']
+            })
+            if warnings:
+                result['warnings'] = warnings
+
+        summary = {
+            'received': len(sales),
+            'created': sum(1 for r in results if r['status'] == 'created'),
+            'duplicates': sum(1 for r in results if r['status'] == 'duplicate'),
+            'rejected': sum(1 for r in results if r['status'] == 'rejected')
+        }
+
+        return jsonify({
+            'success': True,
+            'terminal_id': terminal_id,
+            'summary': summary,
+            'results': results
+        }), 200
+
+    except Exception as e:
+        logger.exception('POS sync failed: %s', e)
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'POS sync failed, no sales from this batch were recorded'
+        }), 500
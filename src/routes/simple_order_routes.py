@@ -1,11 +1,14 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
 import json
+import logging
 import random
 import string
 
 simple_order_bp = Blueprint('simple_orders', __name__)
 
+logger = logging.getLogger(__name__)
+
 def generate_order_number():
     """Generate a unique order number"""
     timestamp = datetime.now().strftime('%Y%m%d')
@@ -69,7 +72,7 @@ def create_simple_order():
             'cashier': 'System',
             'location': 'Online'
         }
-        print(f"🛒 POS SALE CREATED: {pos_sale['sale_id']} - ${total} - {customer_name}")
+        logger.info('POS sale created', extra={'sale_id': pos_sale['sale_id'], 'order_number': order_number, 'total': total})
         
         # 2. ACCOUNTING INTEGRATION
         # Create accounting entries for the sale
@@ -146,20 +149,23 @@ def create_simple_order():
                 'type': 'asset'
             })
         
-        print(f"💰 ACCOUNTING ENTRIES CREATED: {len(accounting_entries)} entries for Order {order_number}")
-        for entry in accounting_entries:
-            print(f"   - {entry['account']}: Debit ${entry['debit']}, Credit ${entry['credit']}")
+        logger.debug('Accounting entries created', extra={
+            'order_number': order_number,
+            'entries': [(entry['account'], entry['debit'], entry['credit']) for entry in accounting_entries]
+        })
         
         # 3. INVENTORY UPDATE
-        for item in items:
-            print(f"📦 INVENTORY UPDATED: {item.get('name')} - Reduced by {item.get('quantity')} units")
+        logger.debug('Inventory updated', extra={
+            'order_number': order_number,
+            'items': [(item.get('name'), item.get('quantity')) for item in items]
+        })
         
         # 4. EMAIL NOTIFICATION
-        print(f"📧 EMAIL SENT: Order confirmation to {customer_email}")
+        logger.debug('Order confirmation email queued', extra={'order_number': order_number})
         
         # 5. DRIVER DISPATCH for local delivery
         if shipping_method in ['same-day', 'next-day']:
-            print(f"🚚 DRIVER DISPATCHED: Local delivery assigned for {order_number}")
+            logger.info('Local delivery assigned', extra={'order_number': order_number})
         
         return jsonify({
             'success': True,
@@ -188,7 +194,7 @@ def create_simple_order():
         }), 201
         
     except Exception as e:
-        print(f"Order creation error: {str(e)}")
+        logger.exception('Order creation failed')
         return jsonify({
             'success': False,
             'error': str(e),
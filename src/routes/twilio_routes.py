@@ -1,10 +1,14 @@
 from flask import Blueprint, request, jsonify
 from twilio.rest import Client
 from twilio.twiml.voice_response import VoiceResponse
+import logging
 import os
+from src.services.metrics import track_outbound
 
 twilio_bp = Blueprint('twilio', __name__)
 
+logger = logging.getLogger(__name__)
+
 # Twilio configuration (will be set via API)
 twilio_config = {
     'account_sid': None,
@@ -44,7 +48,8 @@ def test_connection():
         client = Client(twilio_config['account_sid'], twilio_config['auth_token'])
         
         # Test by fetching account info
-        account = client.api.accounts(twilio_config['account_sid']).fetch()
+        with track_outbound('twilio', 'test_connection'):
+            account = client.api.accounts(twilio_config['account_sid']).fetch()
         
         return jsonify({
             'success': True,
@@ -61,9 +66,6 @@ def test_connection():
 def send_sms():
     """Send SMS message"""
     try:
-        print(f"SMS Request received")
-        print(f"Twilio config: SID={twilio_config.get('account_sid', 'None')[:10]}..., Token={'Set' if twilio_config.get('auth_token') else 'None'}, Phone={twilio_config.get('phone_number', 'None')}")
-        
         if not all([twilio_config['account_sid'], twilio_config['auth_token'], twilio_config['phone_number']]):
             return jsonify({
                 'success': False,
@@ -74,8 +76,6 @@ def send_sms():
         to_number = data.get('to')
         message_body = data.get('message')
         
-        print(f"SMS Details: to={to_number}, message='{message_body}'")
-        
         if not to_number or not message_body:
             return jsonify({
                 'success': False,
@@ -83,15 +83,14 @@ def send_sms():
             }), 400
         
         client = Client(twilio_config['account_sid'], twilio_config['auth_token'])
-        print(f"Twilio client created successfully")
-        
-        message = client.messages.create(
-            body=message_body,
-            from_=twilio_config['phone_number'],
-            to=to_number
-        )
+        with track_outbound('twilio', 'send_sms'):
+            message = client.messages.create(
+                body=message_body,
+                from_=twilio_config['phone_number'],
+                to=to_number
+            )
         
-        print(f"SMS sent successfully: SID={message.sid}, Status={message.status}")
+        logger.info('SMS sent', extra={'message_sid': message.sid, 'sms_status': message.status})
         
         return jsonify({
             'success': True,
@@ -99,8 +98,7 @@ def send_sms():
             'status': message.status
         })
     except Exception as e:
-        print(f"SMS Error: {str(e)}")
-        print(f"Error type: {type(e).__name__}")
+        logger.warning('SMS send failed: %s', e, extra={'error_type': type(e).__name__})
         return jsonify({
             'success': False,
             'error': str(e),
@@ -139,12 +137,13 @@ def make_call():
         # Create TwiML URL for the call
         twiml_url = f"{request.url_root}api/twilio/twiml/{call_type}"
         
-        call = client.calls.create(
-            to=to_number,
-            from_=twilio_config['phone_number'],
-            url=twiml_url,
-            method='POST'
-        )
+        with track_outbound('twilio', 'make_call'):
+            call = client.calls.create(
+                to=to_number,
+                from_=twilio_config['phone_number'],
+                url=twiml_url,
+                method='POST'
+            )
         
         return jsonify({
             'success': True,
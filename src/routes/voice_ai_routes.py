@@ -5,10 +5,15 @@ import requests
 import smtplib
 import email.mime.text
 import email.mime.multipart
+import logging
 import os
+from src.services.event_log import EVENT_LOG_PERSIST, integration_events
+from src.services.metrics import track_outbound
 
 voice_ai_bp = Blueprint('voice_ai', __name__)
 
+logger = logging.getLogger(__name__)
+
 # Global configuration storage
 voice_ai_config = {
     'twilio': {
@@ -37,19 +42,11 @@ voice_ai_config = {
     }
 }
 
-# Integration logs
-integration_logs = []
-
 def log_integration_event(event_type, details, status='success'):
-    """Log integration events for tracking"""
-    log_entry = {
-        'timestamp': datetime.now().isoformat(),
-        'event_type': event_type,
-        'details': details,
-        'status': status
-    }
-    integration_logs.append(log_entry)
-    print(f"🤖 VOICE AI: {event_type} - {details} - {status}")
+    """Log integration events for tracking (written to the event log in the background)"""
+    integration_events.append(event_type, details, status)
+    if status == 'error':
+        logger.warning('Integration event failed: %s', details, extra={'event_type': event_type})
 
 @voice_ai_bp.route('/voice-ai/config', methods=['GET'])
 def get_voice_ai_config():
@@ -140,10 +137,11 @@ def test_gmail_connection():
             return jsonify({'success': False, 'error': 'Missing Gmail credentials'}), 400
         
         # Test Gmail SMTP connection
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(config['username'], config['app_password'])
-        server.quit()
+        with track_outbound('smtp', 'test_connection'):
+            server = smtplib.SMTP('smtp.gmail.com', 587)
+            server.starttls()
+            server.login(config['username'], config['app_password'])
+            server.quit()
         
         log_integration_event('test_connection', 'Gmail connection test successful')
         voice_ai_config['gmail']['enabled'] = True
@@ -172,7 +170,8 @@ def test_sendgrid_connection():
         }
         
         # Test with SendGrid API endpoint
-        response = requests.get('https://api.sendgrid.com/v3/user/account', headers=headers)
+        with track_outbound('sendgrid', 'test_connection'):
+            response = requests.get('https://api.sendgrid.com/v3/user/account', headers=headers)
         
         if response.status_code == 200:
             log_integration_event('test_connection', 'SendGrid connection test successful')
@@ -242,8 +241,9 @@ def send_email_sendgrid(to_email, subject, message, template_type):
             'Content-Type': 'application/json'
         }
         
-        response = requests.post('https://api.sendgrid.com/v3/mail/send', 
-                               json=email_data, headers=headers)
+        with track_outbound('sendgrid', 'send_email'):
+            response = requests.post('https://api.sendgrid.com/v3/mail/send',
+                                     json=email_data, headers=headers)
         
         if response.status_code == 202:
             log_integration_event('send_email', f'SendGrid email sent to {to_email} - {template_type}')
@@ -272,11 +272,12 @@ def send_email_gmail(to_email, subject, message, template_type):
         
         msg.attach(email.mime.text.MimeText(message, 'html'))
         
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(config['username'], config['app_password'])
-        server.send_message(msg)
-        server.quit()
+        with track_outbound('smtp', 'send_email'):
+            server = smtplib.SMTP('smtp.gmail.com', 587)
+            server.starttls()
+            server.login(config['username'], config['app_password'])
+            server.send_message(msg)
+            server.quit()
         
         log_integration_event('send_email', f'Gmail email sent to {to_email} - {template_type}')
         return jsonify({
@@ -522,10 +523,46 @@ def customer_signup_integration():
 def get_integration_logs():
     """Get integration logs"""
     try:
+        # Latest 50 events: this worker's in-memory tail, which includes events not yet written
+        return jsonify({
+            'success': True,
+            'logs': integration_events.recent(50),
+            'total_logs': integration_events.info()['appended'],
+            'event_log': integration_events.info()
+        }), 200
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@voice_ai_bp.route('/voice-ai/events', methods=['GET'])
+def query_integration_events():
+    """Query persisted integration events, newest first.
+
+    Filters: event_type, status, since/until (ISO-8601). Paginate by passing the
+    returned next_before_id as before_id.
+    """
+    if not EVENT_LOG_PERSIST:
+        return jsonify({'success': False, 'error': 'Event persistence is disabled (EVENT_LOG_PERSIST=false)'}), 503
+
+    try:
+        try:
+            since = datetime.fromisoformat(request.args['since']) if request.args.get('since') else None
+            until = datetime.fromisoformat(request.args['until']) if request.args.get('until') else None
+        except ValueError:
+            return jsonify({'success': False, 'error': 'since/until must be ISO-8601 timestamps'}), 400
+
+        events, next_before_id = integration_events.query(
+            event_type=request.args.get('event_type'),
+            status=request.args.get('status'),
+            since=since,
+            until=until,
+            before_id=request.args.get('before_id', type=int),
+            limit=request.args.get('limit', 50, type=int)
+        )
         return jsonify({
             'success': True,
-            'logs': integration_logs[-50:],  # Return last 50 logs
-            'total_logs': len(integration_logs)
+            'events': events,
+            'count': len(events),
+            'next_before_id': next_before_id
         }), 200
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -555,7 +592,7 @@ def get_integration_status():
         return jsonify({
             'success': True,
             'status': status,
-            'total_logs': len(integration_logs)
+            'total_logs': integration_events.info()['appended']
         }), 200
         
     except Exception as e:
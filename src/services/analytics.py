@@ -0,0 +1,298 @@
+from datetime import date, datetime, timedelta
+from src.services.sql_compat import is_sqlite, execute, executemany
+from src.services.order_items import item_sku, item_quantity
+
+# Per-SKU, per-day sales rollups. Every sale adds its units and revenue to the
+# (sale_date, sku) row in the same transaction that records the sale, so top-N
+# over any window reads at most days x SKUs rows instead of scanning orders.
+# rebuild_sku_rollups() recomputes days from order_items if they ever drift.
+# sku_daily_sales exists in PostgreSQL only, the one source of top-SKU figures
+# for the dashboard, /pos/stats and /pos/top-items.
+#
+# daily_sales_rollup does the same for whole-sale totals per day and source
+# ('order' for online orders, 'pos' for POS sales), so day/week/month stats
+# sum at most ~31 rows per source.
+
+SQLITE_DDL = [
+    '''
+        CREATE TABLE IF NOT EXISTS daily_sales_rollup (
+            sale_date DATE NOT NULL,
+            source TEXT NOT NULL,
+            transaction_count INTEGER NOT NULL DEFAULT 0,
+            subtotal REAL NOT NULL DEFAULT 0,
+            tax REAL NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (sale_date, source)
+        )
+    '''
+]
+
+# Tables each rollup source is rebuilt from: (table, timestamp column, source).
+# ORD-POS-* orders mirror POS sales and are skipped so POS sales count once.
+POSTGRES_SALE_TABLES = [
+    ('orders', 'created_at', 'order'),
+    ('pos_transactions', 'created_at', 'pos')
+]
+SQLITE_SALE_TABLES = [
+    ('orders', 'created_at', 'order'),
+    ('pos_transactions', 'timestamp', 'pos')
+]
+POS_MIRROR_PATTERN = 'ORD-POS-%'
+
+def init_sqlite_analytics_tables(cursor):
+    """Create the daily totals rollup table in a SQLite database"""
+    for statement in SQLITE_DDL:
+        cursor.execute(statement)
+
+def to_date(value):
+    """Normalize a date, datetime or ISO string to a date"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.fromisoformat(str(value)).date()
+
+def add_sku_totals(totals, items, sold_at=None):
+    """Accumulate one sale's cart into {(sale_date, sku): totals} for write_sku_totals()"""
+    sale_date = to_date(sold_at) or date.today()
+    skus = set()
+    for item in items or []:
+        sku = item_sku(item)
+        quantity = item_quantity(item)
+        entry = totals.setdefault((sale_date, sku), {'name': item.get('name', ''), 'quantity': 0, 'revenue': 0.0, 'order_count': 0})
+        entry['quantity'] += quantity
+        entry['revenue'] += quantity * float(item.get('price', 0))
+        if sku not in skus:
+            skus.add(sku)
+            entry['order_count'] += 1
+    return totals
+
+def write_sku_totals(cursor, totals):
+    """Add accumulated per-SKU totals to the daily rollups inside the caller's transaction"""
+    if not totals:
+        return 0
+
+    # Upsert in (date, SKU) order so concurrent writers lock rollup rows in the same order
+    executemany(cursor, '''
+        INSERT INTO sku_daily_sales (sale_date, sku, name, quantity_sold, revenue, order_count, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (sale_date, sku) DO UPDATE SET
+            name = excluded.name,
+            quantity_sold = sku_daily_sales.quantity_sold + excluded.quantity_sold,
+            revenue = sku_daily_sales.revenue + excluded.revenue,
+            order_count = sku_daily_sales.order_count + excluded.order_count,
+            updated_at = CURRENT_TIMESTAMP
+    ''', [
+        (sale_date.isoformat() if is_sqlite(cursor) else sale_date, sku, entry['name'], entry['quantity'],
+         round(entry['revenue'], 2), entry['order_count'])
+        for (sale_date, sku), entry in sorted(totals.items())
+    ])
+    return len(totals)
+
+def record_sale(cursor, items, sold_at=None):
+    """Add one sale's cart to the per-SKU daily rollups inside the caller's transaction"""
+    return write_sku_totals(cursor, add_sku_totals({}, items, sold_at))
+
+def top_skus(cursor, date_from=None, date_to=None, limit=10):
+    """Best sellers by revenue for an inclusive date window, answered from the rollups"""
+    query = '''
+        SELECT sku, MAX(name) AS name, SUM(quantity_sold) AS quantity_sold,
+               SUM(revenue) AS revenue, SUM(order_count) AS order_count
+        FROM sku_daily_sales
+        WHERE 1 = 1
+    '''
+    params = []
+
+    date_from = to_date(date_from)
+    date_to = to_date(date_to)
+    if date_from:
+        query += ' AND sale_date >= %s'
+        params.append(date_from.isoformat() if is_sqlite(cursor) else date_from)
+    if date_to:
+        query += ' AND sale_date <= %s'
+        params.append(date_to.isoformat() if is_sqlite(cursor) else date_to)
+
+    query += ' GROUP BY sku ORDER BY revenue DESC LIMIT %s'
+    params.append(limit)
+
+    execute(cursor, query, tuple(params))
+    return [{
+        'sku': row['sku'],
+        'name': row['name'],
+        'quantity_sold': int(row['quantity_sold'] or 0),
+        'revenue': round(float(row['revenue'] or 0), 2),
+        'order_count': int(row['order_count'] or 0)
+    } for row in cursor.fetchall()]
+
+def rebuild_sku_rollups(conn, date_from=None, date_to=None):
+    """Recompute rollup days from order_items. Returns the number of rows written"""
+    cursor = conn.cursor()
+    date_from = to_date(date_from) or date(1970, 1, 1)
+    date_to = to_date(date_to) or date.today()
+
+    # order_items.created_at is a timestamp; compare against [date_from, date_to + 1 day)
+    start = datetime.combine(date_from, datetime.min.time())
+    end = datetime.combine(date_to + timedelta(days=1), datetime.min.time())
+    if is_sqlite(cursor):
+        params = (date_from.isoformat(), date_to.isoformat())
+        window = (start.isoformat(sep=' '), end.isoformat(sep=' '))
+    else:
+        params = (date_from, date_to)
+        window = (start, end)
+
+    execute(cursor, 'DELETE FROM sku_daily_sales WHERE sale_date >= %s AND sale_date <= %s', params)
+    execute(cursor, '''
+        INSERT INTO sku_daily_sales (sale_date, sku, name, quantity_sold, revenue, order_count, updated_at)
+        SELECT DATE(created_at), sku, MAX(name), SUM(quantity), SUM(quantity * unit_price),
+               COUNT(DISTINCT order_id), CURRENT_TIMESTAMP
+        FROM order_items
+        WHERE created_at >= %s AND created_at < %s
+        GROUP BY DATE(created_at), sku
+    ''', window)
+    written = cursor.rowcount
+    conn.commit()
+    return written
+
+def add_daily_totals(totals, source, subtotal, tax, total, sold_at=None):
+    """Accumulate one sale into {(sale_date, source): totals} for write_daily_totals()"""
+    sale_date = to_date(sold_at) or date.today()
+    entry = totals.setdefault((sale_date, source), {'count': 0, 'subtotal': 0.0, 'tax': 0.0, 'total': 0.0})
+    entry['count'] += 1
+    entry['subtotal'] += float(subtotal or 0)
+    entry['tax'] += float(tax or 0)
+    entry['total'] += float(total or 0)
+    return totals
+
+def write_daily_totals(cursor, totals):
+    """Add accumulated sale totals to their days inside the caller's transaction, in (date, source) order"""
+    for (sale_date, source), entry in sorted(totals.items()):
+        execute(cursor, '''
+            INSERT INTO daily_sales_rollup (sale_date, source, transaction_count, subtotal, tax, total, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (sale_date, source) DO UPDATE SET
+                transaction_count = daily_sales_rollup.transaction_count + excluded.transaction_count,
+                subtotal = daily_sales_rollup.subtotal + excluded.subtotal,
+                tax = daily_sales_rollup.tax + excluded.tax,
+                total = daily_sales_rollup.total + excluded.total,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (sale_date.isoformat() if is_sqlite(cursor) else sale_date, source, entry['count'],
+              round(entry['subtotal'], 2), round(entry['tax'], 2), round(entry['total'], 2)))
+
+def record_daily_totals(cursor, source, subtotal, tax, total, sold_at=None):
+    """Add one sale to its day's totals inside the caller's transaction"""
+    write_daily_totals(cursor, add_daily_totals({}, source, subtotal, tax, total, sold_at))
+
+def load_daily_totals(cursor, date_from, date_to, source=None):
+    """Read rollup rows for an inclusive date window. Returns {(date, source): totals}"""
+    query = '''
+        SELECT sale_date, source, transaction_count, subtotal, tax, total
+        FROM daily_sales_rollup
+        WHERE sale_date >= %s AND sale_date <= %s
+    '''
+    params = [to_date(date_from), to_date(date_to)]
+    if is_sqlite(cursor):
+        params = [value.isoformat() for value in params]
+    if source:
+        query += ' AND source = %s'
+        params.append(source)
+
+    execute(cursor, query, tuple(params))
+    return {
+        (to_date(row['sale_date']), row['source']): {
+            'transaction_count': int(row['transaction_count']),
+            'subtotal': round(float(row['subtotal']), 2),
+            'tax': round(float(row['tax']), 2),
+            'total': round(float(row['total']), 2)
+        }
+        for row in cursor.fetchall()
+    }
+
+def sales_windows(cursor, today=None, source=None):
+    """Day, week and month sales and transaction counts from the last 31 rollup days"""
+    today = to_date(today) or date.today()
+    rows = load_daily_totals(cursor, today - timedelta(days=30), today, source)
+
+    windows = {'daily': 0, 'weekly': 7, 'monthly': 30}
+    stats = {}
+    for name, days in windows.items():
+        start = today - timedelta(days=days)
+        selected = [totals for (sale_date, _), totals in rows.items() if sale_date >= start]
+        stats[f'{name}_sales'] = round(sum(totals['total'] for totals in selected), 2)
+        stats[f'{name}_transactions'] = sum(totals['transaction_count'] for totals in selected)
+    return stats
+
+def compute_daily_totals(cursor, date_from, date_to):
+    """Aggregate day totals straight from the sales tables. Returns {(date, source): totals}"""
+    sqlite = is_sqlite(cursor)
+    start = datetime.combine(to_date(date_from), datetime.min.time())
+    end = datetime.combine(to_date(date_to) + timedelta(days=1), datetime.min.time())
+    window = (start.isoformat(sep=' '), end.isoformat(sep=' ')) if sqlite else (start, end)
+
+    computed = {}
+    for table, timestamp_column, source in (SQLITE_SALE_TABLES if sqlite else POSTGRES_SALE_TABLES):
+        query = f'''
+            SELECT DATE({timestamp_column}) AS sale_date, COUNT(*) AS transaction_count,
+                   SUM(subtotal) AS subtotal, SUM(tax) AS tax, SUM(total) AS total
+            FROM {table}
+            WHERE {timestamp_column} >= %s AND {timestamp_column} < %s
+        '''
+        params = window
+        if table == 'orders':
+            query += ' AND id NOT LIKE %s'
+            params = window + (POS_MIRROR_PATTERN,)
+        query += f' GROUP BY DATE({timestamp_column})'
+
+        execute(cursor, query, params)
+        for row in cursor.fetchall():
+            computed[(to_date(row['sale_date']), source)] = {
+                'transaction_count': int(row['transaction_count']),
+                'subtotal': round(float(row['subtotal'] or 0), 2),
+                'tax': round(float(row['tax'] or 0), 2),
+                'total': round(float(row['total'] or 0), 2)
+            }
+    return computed
+
+def rebuild_daily_rollups(conn, date_from=None, date_to=None):
+    """Replace rollup rows for a date range with totals recomputed from the sales tables"""
+    cursor = conn.cursor()
+    date_from = to_date(date_from) or date(1970, 1, 1)
+    date_to = to_date(date_to) or date.today()
+
+    computed = compute_daily_totals(cursor, date_from, date_to)
+    sqlite = is_sqlite(cursor)
+    bounds = (date_from.isoformat(), date_to.isoformat()) if sqlite else (date_from, date_to)
+
+    execute(cursor, 'DELETE FROM daily_sales_rollup WHERE sale_date >= %s AND sale_date <= %s', bounds)
+    executemany(cursor, '''
+        INSERT INTO daily_sales_rollup (sale_date, source, transaction_count, subtotal, tax, total, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+    ''', [
+        (sale_date.isoformat() if sqlite else sale_date, source,
+         totals['transaction_count'], totals['subtotal'], totals['tax'], totals['total'])
+        for (sale_date, source), totals in sorted(computed.items())
+    ])
+    conn.commit()
+    return len(computed)
+
+def reconcile_daily_rollups(conn, date_from, date_to, fix=False):
+    """Compare rollups with the sales tables and list the days that disagree"""
+    cursor = conn.cursor()
+    stored = load_daily_totals(cursor, date_from, date_to)
+    computed = compute_daily_totals(cursor, date_from, date_to)
+
+    mismatches = []
+    for key in sorted(set(stored) | set(computed)):
+        if stored.get(key) != computed.get(key):
+            mismatches.append({
+                'sale_date': key[0].isoformat(),
+                'source': key[1],
+                'rollup': stored.get(key),
+                'actual': computed.get(key)
+            })
+
+    if fix and mismatches:
+        rebuild_daily_rollups(conn, date_from, date_to)
+    return mismatches
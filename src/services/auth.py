@@ -0,0 +1,171 @@
+from flask import current_app, g, jsonify, request
+from functools import wraps
+import hashlib
+import hmac
+import os
+import time
+import jwt
+from src.models.customer import Customer
+from src.services.cache import LRUCache
+from src.services.revocation import revocation_list
+from src.services.sessions import JWT_ALGORITHM, is_revoked
+
+# Bearer-token authentication shared by every protected route.
+#
+# init_auth(app) installs a before_request hook that verifies the request's
+# token once and leaves its claims in g; routes opt in with @require_auth.
+# Verified tokens are remembered in a per-process LRU (keyed by a hash of the
+# whole token, valid until the token's exp), so repeat requests skip the HS256
+# verification. Principals (id, email, status) are cached for a short TTL so
+# @require_auth doesn't load the customer row on every request; writes that
+# change a customer's status or identity call invalidate_principal().
+#
+# Only access tokens issued for a session (see sessions.py) are accepted, and
+# a token whose session was revoked is rejected through the in-memory
+# revocation filter, so neither check costs a database query per request.
+#
+# Customers have no admin role, so maintenance endpoints authenticate with a
+# shared operator token instead: require_admin() checks the X-Admin-Token
+# header against ADMIN_API_TOKEN, and refuses everything when it is unset.
+
+TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get('TOKEN_CACHE_MAX_ENTRIES', 10000))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.environ.get('PRINCIPAL_CACHE_MAX_ENTRIES', 10000))
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', 60))
+ADMIN_API_TOKEN = os.environ.get('ADMIN_API_TOKEN', '')
+
+token_cache = LRUCache(max_entries=TOKEN_CACHE_MAX_ENTRIES, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+principal_cache = LRUCache(max_entries=PRINCIPAL_CACHE_MAX_ENTRIES, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
+
+def token_cache_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def decode_token(token):
+    """Claims of a valid token, or None. Verified tokens are served from the LRU until they expire"""
+    if not token:
+        return None
+
+    key = token_cache_key(token)
+    claims = token_cache.get(key)
+    if claims is not None:
+        # The cache TTL ends at exp, but re-check in case the clock crossed it mid-lookup
+        if claims.get('exp', 0) > time.time():
+            return claims
+        token_cache.delete(key)
+        return None
+
+    try:
+        claims = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=[JWT_ALGORITHM])
+    except jwt.InvalidTokenError:
+        return None
+
+    remaining = int(claims.get('exp', 0) - time.time())
+    if remaining > 0:
+        token_cache.set(key, claims, remaining)
+    return claims
+
+def bearer_token():
+    """Token from an 'Authorization: Bearer <token>' header, or None"""
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
+
+def authenticate_request():
+    """before_request hook: verify the bearer token (if any) into g"""
+    g.auth_token = bearer_token()
+    claims = decode_token(g.auth_token) if g.auth_token else None
+    if claims and (claims.get('type') != 'access' or not claims.get('sid') or is_revoked(claims['sid'])):
+        claims = None
+    g.auth_claims = claims
+    g.customer_id = claims.get('customer_id') if claims else None
+
+def init_auth(app):
+    """Install the authentication hook on the app"""
+    app.before_request(authenticate_request)
+
+def load_principal(customer_id):
+    customer = Customer.query.get(customer_id)
+    if customer is None:
+        return None
+    return {
+        'id': customer.id,
+        'email': customer.email,
+        'status': customer.status,
+        'customer_type': customer.customer_type,
+        'is_verified': customer.is_verified
+    }
+
+def current_principal():
+    """The authenticated customer's principal, from the principal cache when possible"""
+    if getattr(g, 'principal', None) is not None:
+        return g.principal
+    customer_id = getattr(g, 'customer_id', None)
+    if customer_id is None:
+        return None
+
+    principal = principal_cache.get(customer_id)
+    if principal is None:
+        principal = load_principal(customer_id)
+        if principal is not None:
+            principal_cache.set(customer_id, principal)
+
+    g.principal = principal
+    return principal
+
+def invalidate_principal(customer_id):
+    """Forget a cached principal after its customer's status or identity changes"""
+    if customer_id is not None:
+        principal_cache.delete(int(customer_id))
+
+def require_auth(view):
+    """Reject the request unless it carries a valid token for an active customer"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if getattr(g, 'auth_token', None) is None:
+            return jsonify({'error': 'Authentication required'}), 401
+        if getattr(g, 'customer_id', None) is None:
+            return jsonify({'error': 'Invalid or expired token'}), 401
+
+        principal = current_principal()
+        if principal is None:
+            return jsonify({'error': 'Customer not found'}), 404
+        if principal['status'] != 'active':
+            return jsonify({'error': 'Account is suspended. Please contact support.'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def is_admin_request():
+    """True if the request carries the operator's X-Admin-Token"""
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_API_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_API_TOKEN.encode())
+
+def require_admin():
+    """before_request hook for admin blueprints: None if the request carries the admin token"""
+    if not ADMIN_API_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled; set ADMIN_API_TOKEN'}), 403
+    if not is_admin_request():
+        return jsonify({'error': 'Admin token required'}), 401
+    return None
+
+def owner_or_admin_error(is_owner):
+    """None if an admin or the active customer is_owner(principal) accepts made the request, else an error response.
+
+    Resources owned by someone else answer 404, so their IDs can't be probed.
+    """
+    if is_admin_request():
+        return None
+    if getattr(g, 'customer_id', None) is None:
+        return jsonify({'error': 'Authentication required'}), 401
+
+    principal = current_principal()
+    if principal is None or principal['status'] != 'active' or not is_owner(principal):
+        return jsonify({'error': 'Not found'}), 404
+    return None
+
+def auth_cache_stats():
+    return {
+        'tokens': token_cache.info(),
+        'principals': principal_cache.info(),
+        'revocations': revocation_list.info()
+    }
@@ -0,0 +1,250 @@
+from flask import g, request, make_response, Response
+from collections import OrderedDict
+from functools import wraps
+import logging
+import os
+import threading
+import time
+from src.services.serialization import dumps, loads
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Response cache for read-heavy GET endpoints.
+#
+# Entries live in a per-process LRU with a TTL. When REDIS_URL is set (and the
+# redis package is installed) entries are shared across workers through Redis
+# instead, stored as JSON so nothing read back from Redis is ever executed.
+# Cached values are therefore JSON-compatible: responses are cached as their
+# text body, status and mimetype.
+#
+# Every key includes its namespace's generation number; a write that changes
+# the underlying data bumps the generation, which orphans all older entries at
+# once without having to find and delete them. With the in-process LRU the
+# generations are per worker too, so a write only invalidates the worker that
+# handled it and the other gunicorn workers keep serving their copies until
+# RESPONSE_CACHE_TTL_SECONDS runs out. Configure REDIS_URL when every worker
+# must see writes immediately.
+#
+# Views that are also wrapped in conditional_get() (table_versions.py) read
+# their table versions first; those versions are part of the key too, so a
+# worker never serves a body cached before a write under the write's new ETag.
+
+RESPONSE_CACHE_TTL_SECONDS = int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', 30))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+REDIS_URL = os.environ.get('REDIS_URL')
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'sets': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self.entries[key]
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self.entries.move_to_end(key)
+            self.stats['sets'] += 1
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def generation(self, namespace):
+        with self.lock:
+            return self.generations.get(namespace, 0)
+
+    def bump_generation(self, namespace):
+        with self.lock:
+            self.generations[namespace] = self.generations.get(namespace, 0) + 1
+            self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generations.clear()
+
+    def info(self):
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                'backend': 'memory',
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hit_ratio': round(self.stats['hits'] / lookups, 4) if lookups else 0,
+                **self.stats
+            }
+
+class RedisCache:
+    """Shared cache in Redis. Eviction is left to Redis (maxmemory-policy allkeys-lru)"""
+
+    def __init__(self, url, ttl=RESPONSE_CACHE_TTL_SECONDS, prefix='dankdash:cache:'):
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'sets': 0, 'errors': 0, 'invalidations': 0}
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def get(self, key):
+        try:
+            raw = self.client.get(self.prefix + key)
+        except redis.RedisError:
+            self.count('errors')
+            return None
+
+        if raw is None:
+            self.count('misses')
+            return None
+        self.count('hits')
+        return loads(raw)
+
+    def set(self, key, value, ttl=None):
+        try:
+            self.client.set(self.prefix + key, dumps(value), ex=ttl or self.ttl)
+            self.count('sets')
+        except redis.RedisError:
+            self.count('errors')
+
+    def delete(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except redis.RedisError:
+            self.count('errors')
+
+    def generation(self, namespace):
+        try:
+            return int(self.client.get(f'{self.prefix}gen:{namespace}') or 0)
+        except redis.RedisError:
+            self.count('errors')
+            return 0
+
+    def bump_generation(self, namespace):
+        try:
+            self.client.incr(f'{self.prefix}gen:{namespace}')
+            self.count('invalidations')
+        except redis.RedisError:
+            self.count('errors')
+
+    def clear(self):
+        try:
+            keys = list(self.client.scan_iter(match=self.prefix + '*', count=500))
+            if keys:
+                self.client.delete(*keys)
+        except redis.RedisError:
+            self.count('errors')
+
+    def info(self):
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                'backend': 'redis',
+                'ttl_seconds': self.ttl,
+                'hit_ratio': round(self.stats['hits'] / lookups, 4) if lookups else 0,
+                **self.stats
+            }
+
+def create_cache(**kwargs):
+    """Use Redis when REDIS_URL is configured and the client is installed, else the local LRU"""
+    if REDIS_URL and redis is not None:
+        return RedisCache(REDIS_URL, **kwargs)
+    if REDIS_URL:
+        logger.warning("REDIS_URL is set but the redis package is not installed, using in-process cache")
+    return LRUCache(**kwargs)
+
+response_cache = create_cache()
+
+def request_cache_key(namespace):
+    """Cache key from route and normalized query args, so ?a=1&b=2 and ?b=2&a=1 share an entry"""
+    args = '&'.join(f'{name}={value}' for name, value in sorted(request.args.items(multi=True)))
+    versions = getattr(g, 'table_versions', None) or {}
+    tag = ','.join(f'{table}.{version}' for table, version in sorted(versions.items()))
+    return f'{namespace}:{response_cache.generation(namespace)}:{tag}:{request.path}?{args}'
+
+def cached_response(namespace, ttl=None):
+    """Cache successful GET responses of a view under a namespace"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            key = request_cache_key(namespace)
+            cached = response_cache.get(key)
+            if cached is not None:
+                body, status, mimetype = cached
+                response = Response(body, status=status, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                try:
+                    body = response.get_data().decode('utf-8')
+                except UnicodeDecodeError:
+                    body = None
+                if body is not None:
+                    response_cache.set(key, [body, response.status_code, response.mimetype], ttl)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+def invalidate(*namespaces):
+    """Drop every cached response in the given namespaces"""
+    for namespace in namespaces:
+        response_cache.bump_generation(namespace)
+
+def invalidates(*namespaces):
+    """Invalidate namespaces after a write view returns a non-error response.
+
+    Only this worker's entries are dropped unless the cache is in Redis (see above).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            response = make_response(view(*args, **kwargs))
+            if response.status_code < 400:
+                invalidate(*namespaces)
+            return response
+        return wrapper
+    return decorator
+
+def cache_stats():
+    """Hit/miss/eviction counters for the response cache"""
+    return response_cache.info()
@@ -0,0 +1,166 @@
+from datetime import date
+import os
+import re
+from src.database_config import db_config
+from src.services.cache import response_cache
+from src.services.customer_stats import customer_summary
+from src.services.customer_search import PHONE_DIGITS_SQL, search_columns_ready
+
+# Read-through cache of customer profiles with ID-verification status, for the
+# repeated lookups of regulars at the POS counter.
+#
+# Profiles are read with plain SQL from the customers table that checkout and
+# the order stats maintain, plus customer_documents where that table exists.
+#
+# Profiles live in the shared response cache backend (in-process LRU, or Redis
+# when configured) under customer_profile:id:<id>. Email and phone lookups
+# resolve to an ID through small alias entries, and the alias is re-checked
+# against the cached profile so a changed email or phone never serves the wrong
+# customer. Writes to a customer or their documents call
+# invalidate_customer_profile(); order stats in the profile may lag by up to
+# CUSTOMER_PROFILE_TTL_SECONDS, and so may every change on the other workers
+# when the cache is the in-process LRU rather than Redis.
+
+CUSTOMER_PROFILE_TTL_SECONDS = int(os.environ.get('CUSTOMER_PROFILE_TTL_SECONDS', 300))
+
+# Document types that prove identity / eligibility at the counter
+ID_DOCUMENT_TYPES = {'id', 'drivers_license', 'license', 'passport', 'medical_card'}
+
+def profile_key(customer_id):
+    return f'customer_profile:id:{customer_id}'
+
+def alias_key(kind, value):
+    return f'customer_profile:{kind}:{value}'
+
+def normalize_lookup(email=None, phone=None):
+    """(kind, normalized value) for an email or phone lookup, or (None, None)"""
+    if email and email.strip():
+        return 'email', email.strip().lower()
+    digits = re.sub(r'[^0-9]', '', phone or '')
+    if digits:
+        return 'phone', digits
+    return None, None
+
+def id_verification(documents, today=None):
+    """Summarize a customer's document rows into the status staff check before a sale"""
+    today = today or date.today()
+    id_documents = [doc for doc in documents if doc['document_type'] in ID_DOCUMENT_TYPES]
+    valid = [
+        doc for doc in id_documents
+        if doc['verification_status'] == 'approved'
+        and (doc['expiration_date'] is None or doc['expiration_date'] >= today)
+    ]
+    expirations = [doc['expiration_date'] for doc in valid if doc['expiration_date']]
+
+    return {
+        'verified': bool(valid),
+        'pending': any(doc['verification_status'] == 'pending' for doc in id_documents),
+        'expires_on': min(expirations).isoformat() if expirations else None,
+        'documents': [{
+            'id': doc['id'],
+            'document_type': doc['document_type'],
+            'verification_status': doc['verification_status'],
+            'expiration_date': doc['expiration_date'].isoformat() if doc['expiration_date'] else None
+        } for doc in id_documents]
+    }
+
+def build_profile(customer_id):
+    """Load a profile from the database, or None if the customer doesn't exist"""
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, name, email, phone, address, total_orders, total_spent, loyalty_points,
+                   last_order_date, created_at, updated_at,
+                   to_regclass('customer_documents') IS NOT NULL AS has_documents
+            FROM customers WHERE id = %s
+        ''', (customer_id,))
+        customer = cursor.fetchone()
+        if customer is None:
+            return None
+
+        # Only the columns the verification summary needs, not whole document rows
+        documents = []
+        if customer['has_documents']:
+            cursor.execute('''
+                SELECT id, document_type, verification_status, expiration_date
+                FROM customer_documents WHERE customer_id = %s
+            ''', (customer_id,))
+            documents = cursor.fetchall()
+    finally:
+        conn.close()
+
+    return {
+        'id': customer['id'],
+        'name': customer['name'],
+        'email': customer['email'],
+        'phone': customer['phone'],
+        'address': customer['address'],
+        **customer_summary(customer),
+        'created_at': customer['created_at'].isoformat() if customer['created_at'] else None,
+        'updated_at': customer['updated_at'].isoformat() if customer['updated_at'] else None,
+        'id_verification': id_verification(documents)
+    }
+
+def get_customer_profile(customer_id):
+    """Profile plus ID-verification status, from the cache when possible.
+
+    Returns (profile, cached) where profile is None for unknown customers.
+    """
+    profile = response_cache.get(profile_key(customer_id))
+    if profile is not None:
+        return profile, True
+
+    profile = build_profile(customer_id)
+    if profile is not None:
+        response_cache.set(profile_key(customer_id), profile, CUSTOMER_PROFILE_TTL_SECONDS)
+    return profile, False
+
+def resolve_customer_id(kind, value):
+    """Customer ID for a normalized email or phone"""
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        # Email through idx_customers_email_lower; phone through the indexed phone_digits
+        # once the search migration has run, by the same expression (a scan) before that
+        if kind == 'email':
+            condition = 'LOWER(email) = %s'
+        elif search_columns_ready(cursor):
+            condition = 'phone_digits = %s'
+        else:
+            condition = f'{PHONE_DIGITS_SQL} = %s'
+        cursor.execute(f'SELECT id FROM customers WHERE {condition} ORDER BY id LIMIT 1', (value,))
+        row = cursor.fetchone()
+        return row['id'] if row else None
+    finally:
+        conn.close()
+
+def profile_matches(profile, kind, value):
+    if kind == 'email':
+        return (profile.get('email') or '').strip().lower() == value
+    return re.sub(r'[^0-9]', '', profile.get('phone') or '') == value
+
+def find_customer_profile(email=None, phone=None):
+    """Look a customer up by email or phone. Returns (profile, cached)"""
+    kind, value = normalize_lookup(email, phone)
+    if kind is None:
+        return None, False
+
+    customer_id = response_cache.get(alias_key(kind, value))
+    if customer_id is not None:
+        profile, cached = get_customer_profile(customer_id)
+        if profile is not None and profile_matches(profile, kind, value):
+            return profile, cached
+        response_cache.delete(alias_key(kind, value))
+
+    customer_id = resolve_customer_id(kind, value)
+    if customer_id is None:
+        return None, False
+
+    response_cache.set(alias_key(kind, value), customer_id, CUSTOMER_PROFILE_TTL_SECONDS)
+    return get_customer_profile(customer_id)
+
+def invalidate_customer_profile(customer_id):
+    """Drop a customer's cached profile after a write to the customer or their documents"""
+    if customer_id is not None:
+        response_cache.delete(profile_key(customer_id))
@@ -0,0 +1,243 @@
+import re
+
+# Indexed customer lookup for the POS and admin customer screens.
+#
+# The search keys are generated columns on customers, so every write path
+# keeps them in sync without extra code:
+#
+#   email_normalized       lower-cased, trimmed email   btree, prefix LIKE
+#   phone_digits           digits only                  btree, prefix LIKE
+#   phone_digits_reversed  digits only, reversed        btree, suffix lookup ("last 4")
+#   search_vector          name + email local part      GIN full-text, prefix query (smi:*)
+#
+# Adding STORED columns rewrites the table, so they are not created at startup:
+# migrate_customer_search() (POST /api/admin/jobs/migrate-customer-search) adds
+# them once, then builds the indexes with CREATE INDEX CONCURRENTLY so writes
+# keep flowing. Until it has run, searches raise SearchNotMigrated.
+#
+# A term is routed to the index that can answer it: '@' means email, mostly
+# digits means phone, anything else is a name. Matches are ranked in SQL and
+# the caller's LIMIT applies to the ranked set. Name prefixes are the one
+# unbounded case ('a:*' matches most of the table), so a name term needs a word
+# of MIN_NAME_PREFIX_LENGTH characters and at most NAME_CANDIDATE_LIMIT index
+# matches are ranked; a term that broad is narrowed by typing more.
+
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+
+# Phone suffix lookups need enough digits to be selective
+MIN_PHONE_SUFFIX_DIGITS = 4
+
+# Name searches need one word this long, and rank at most this many matches
+MIN_NAME_PREFIX_LENGTH = 3
+NAME_CANDIDATE_LIMIT = 500
+
+# Optional filters, applied only where the customers table has the column
+FILTER_COLUMNS = ('status', 'customer_type')
+
+PHONE_DIGITS_SQL = "REGEXP_REPLACE(COALESCE(phone, ''), '[^0-9]', '', 'g')"
+
+SEARCH_COLUMNS_DDL = f'''
+    ALTER TABLE customers
+        ADD COLUMN IF NOT EXISTS email_normalized TEXT
+            GENERATED ALWAYS AS (LOWER(BTRIM(COALESCE(email, '')))) STORED,
+        ADD COLUMN IF NOT EXISTS phone_digits TEXT
+            GENERATED ALWAYS AS ({PHONE_DIGITS_SQL}) STORED,
+        ADD COLUMN IF NOT EXISTS phone_digits_reversed TEXT
+            GENERATED ALWAYS AS (REVERSE({PHONE_DIGITS_SQL})) STORED,
+        ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+            GENERATED ALWAYS AS (
+                TO_TSVECTOR('simple', COALESCE(name, '') || ' ' || SPLIT_PART(COALESCE(email, ''), '@', 1))
+            ) STORED
+'''
+
+SEARCH_COLUMNS = ('email_normalized', 'phone_digits', 'phone_digits_reversed', 'search_vector')
+
+SEARCH_INDEXES = [
+    ('idx_customers_email_normalized', 'customers (email_normalized text_pattern_ops)'),
+    ('idx_customers_phone_digits', 'customers (phone_digits text_pattern_ops)'),
+    ('idx_customers_phone_digits_reversed', 'customers (phone_digits_reversed text_pattern_ops)'),
+    ('idx_customers_search_vector', 'customers USING GIN (search_vector)'),
+]
+
+RESULT_COLUMNS = '''
+    id, name, email, phone, address, created_at, total_orders, total_spent, loyalty_points, last_order_date
+'''
+
+# Columns are never dropped once added, so a positive check is remembered
+_columns_ready = False
+_filter_columns = set()
+
+class SearchNotMigrated(Exception):
+    """The customer search columns have not been added yet"""
+
+def search_columns_ready(cursor):
+    """True once the migration has added the generated search columns"""
+    global _columns_ready
+    if not _columns_ready:
+        cursor.execute('''
+            SELECT COUNT(*) AS count FROM information_schema.columns
+            WHERE table_schema = CURRENT_SCHEMA() AND table_name = 'customers' AND column_name = ANY(%s)
+        ''', (list(SEARCH_COLUMNS),))
+        _columns_ready = cursor.fetchone()['count'] == len(SEARCH_COLUMNS)
+    return _columns_ready
+
+def require_search_columns(cursor):
+    """Raise SearchNotMigrated until migrate_customer_search() has added the search columns"""
+    if not search_columns_ready(cursor):
+        raise SearchNotMigrated('Customer search has not been migrated; run POST /api/admin/jobs/migrate-customer-search')
+
+def filter_columns(cursor):
+    """The FILTER_COLUMNS this customers table has (tables created by the ORM have both)"""
+    global _filter_columns
+    if len(_filter_columns) < len(FILTER_COLUMNS):
+        cursor.execute('''
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = CURRENT_SCHEMA() AND table_name = 'customers' AND column_name = ANY(%s)
+        ''', (list(FILTER_COLUMNS),))
+        _filter_columns = {row['column_name'] for row in cursor.fetchall()}
+    return _filter_columns
+
+def filter_clause(filters):
+    """' AND column = %s ...' and its params for {column: value} filters on FILTER_COLUMNS"""
+    columns = sorted(column for column in filters if column in FILTER_COLUMNS)
+    return ''.join(f' AND {column} = %s' for column in columns), [filters[column] for column in columns]
+
+def migrate_customer_search(conn, lock_timeout='5s'):
+    """Add the generated search columns, then build their indexes concurrently.
+
+    Safe to re-run: existing columns are left alone, valid indexes are kept and
+    indexes left invalid by an interrupted build are dropped and rebuilt. The
+    column step takes an exclusive lock for the table rewrite, so run it off-peak;
+    lock_timeout keeps it from queueing behind long transactions. Returns the
+    names of the indexes built.
+    """
+    conn.autocommit = True
+    cursor = conn.cursor()
+
+    if not search_columns_ready(cursor):
+        cursor.execute('SET lock_timeout = %s', (lock_timeout,))
+        cursor.execute(SEARCH_COLUMNS_DDL)
+        cursor.execute('RESET lock_timeout')
+
+    built = []
+    for name, definition in SEARCH_INDEXES:
+        cursor.execute('SELECT indisvalid FROM pg_index WHERE indexrelid = TO_REGCLASS(%s)', (name,))
+        index = cursor.fetchone()
+        if index and index['indisvalid']:
+            continue
+        if index:
+            cursor.execute(f'DROP INDEX CONCURRENTLY {name}')
+        cursor.execute(f'CREATE INDEX CONCURRENTLY {name} ON {definition}')
+        built.append(name)
+    return built
+
+def escape_like(value):
+    """Escape LIKE wildcards so user input only ever matches literally"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def classify_term(term):
+    """'email', 'phone' or 'name', by what the term looks like"""
+    if '@' in term:
+        return 'email'
+    digits = re.sub(r'[^0-9]', '', term)
+    if len(digits) >= 3 and not re.search(r'[A-Za-z]', term):
+        return 'phone'
+    return 'name'
+
+def prefix_tsquery(term):
+    """'jo smi' -> 'jo:* & smi:*'. Words are reduced to letters and digits so input can't inject tsquery syntax"""
+    words = [re.sub(r'[^\w]', '', word.lower()) for word in term.split()]
+    return ' & '.join(f'{word}:*' for word in words if word)
+
+def search_query(term, filters=None):
+    """SQL and params selecting matching customer rows, best matches first.
+
+    None for a term with nothing to search for, including name terms without a
+    word of MIN_NAME_PREFIX_LENGTH characters. filters narrows the matches by
+    FILTER_COLUMNS.
+    """
+    term = (term or '').strip()
+    if not term:
+        return None
+
+    kind = classify_term(term)
+    filter_sql, filter_params = filter_clause(filters or {})
+
+    if kind == 'email':
+        return f'''
+            SELECT {RESULT_COLUMNS} FROM customers
+            WHERE email_normalized LIKE %s{filter_sql}
+            ORDER BY email_normalized, id
+        ''', [escape_like(term.lower()) + '%'] + filter_params
+
+    if kind == 'phone':
+        digits = re.sub(r'[^0-9]', '', term)
+        # Prefix matches first, then numbers ending in the typed digits
+        query = f'''
+            SELECT {RESULT_COLUMNS}, 0 AS match_rank FROM customers
+            WHERE phone_digits LIKE %s{filter_sql}
+        '''
+        params = [escape_like(digits) + '%'] + filter_params
+        if len(digits) >= MIN_PHONE_SUFFIX_DIGITS:
+            query += f'''
+                UNION ALL
+                SELECT {RESULT_COLUMNS}, 1 AS match_rank FROM customers
+                WHERE phone_digits_reversed LIKE %s AND phone_digits NOT LIKE %s{filter_sql}
+            '''
+            params += [escape_like(digits[::-1]) + '%', escape_like(digits) + '%'] + filter_params
+        query += '''
+            ORDER BY match_rank, total_orders DESC, id
+        '''
+        return query, params
+
+    tsquery = prefix_tsquery(term)
+    if not tsquery or max(len(word) for word in re.findall(r'\w+', term)) < MIN_NAME_PREFIX_LENGTH:
+        return None
+    # Planned on its own, so the page LIMIT can't talk the planner into a
+    # sequential scan when it overestimates how many rows a prefix matches.
+    # The candidate cap bounds the sort and the COUNT for broad prefixes.
+    return f'''
+        WITH candidates AS MATERIALIZED (
+            SELECT {RESULT_COLUMNS} FROM customers
+            WHERE search_vector @@ TO_TSQUERY('simple', %s){filter_sql}
+            LIMIT %s
+        )
+        SELECT * FROM candidates
+        ORDER BY total_orders DESC, name, id
+    ''', [tsquery] + filter_params + [NAME_CANDIDATE_LIMIT]
+
+def search_customers(cursor, term, limit, offset=0, filters=None):
+    """One page of ranked matches for a search term, plus the total match count"""
+    require_search_columns(cursor)
+
+    built = search_query(term, filters)
+    if not built:
+        return [], 0
+
+    query, params = built
+    cursor.execute(f'SELECT COUNT(*) AS count FROM ({query}) matches', params)
+    total = cursor.fetchone()['count']
+    cursor.execute(f'{query} LIMIT %s OFFSET %s', params + [limit, offset])
+    return cursor.fetchall(), total
+
+def autocomplete_customers(cursor, term, limit=AUTOCOMPLETE_LIMIT):
+    """Top matches for a partially typed name, email or phone number"""
+    require_search_columns(cursor)
+
+    built = search_query(term)
+    if not built:
+        return []
+
+    query, params = built
+    cursor.execute(f'{query} LIMIT %s', params + [min(limit, MAX_AUTOCOMPLETE_LIMIT)])
+    return [{
+        'id': row['id'],
+        'name': row['name'],
+        'email': row['email'],
+        'phone': row['phone'],
+        'total_orders': row['total_orders'],
+        'total_spent': float(row['total_spent'] or 0),
+        'loyalty_points': row['loyalty_points'],
+        'last_order_date': row['last_order_date'].isoformat() if row['last_order_date'] else None
+    } for row in cursor.fetchall()]
@@ -0,0 +1,268 @@
+from src.services.sql_compat import chunked
+
+# Customer aggregates (order count, lifetime value, last order, loyalty points).
+#
+# Every order adds itself to its customer's row with one INSERT ... ON CONFLICT
+# DO UPDATE that increments the columns in place, inside the transaction that
+# writes the order. Concurrent orders for the same customer queue on the row
+# lock instead of overwriting each other's read-modify-write. Customers are
+# matched case-insensitively on LOWER(email) and created on their first order.
+#
+# The unique LOWER(email) index can't be built while customers holds emails
+# that differ only in case, so it is not created at startup:
+# migrate_customer_emails() (POST /api/admin/jobs/migrate-customer-emails)
+# merges those duplicates, then builds the index concurrently. Until it has
+# run, orders update the lowest-id customer with a matching email, falling back
+# to the case-sensitive unique email constraint for new customers.
+#
+# Every row in orders counts, including the ORD-POS-* mirrors of POS sales, so
+# the stats agree with the customer's order history. recompute_customer_stats()
+# rebuilds the counts from orders if they ever drift. Loyalty points are a
+# balance (staff can redeem or adjust them), so the recompute leaves them alone.
+
+LOYALTY_POINTS_PER_DOLLAR = 1
+
+EMAIL_INDEX = 'idx_customers_email_lower'
+
+# Tables whose customer_id points at customers.id, re-pointed when duplicates merge
+CUSTOMER_REFERENCES = ('accounting_entries', 'auth_sessions', 'customer_documents')
+
+# The index is never dropped once built, so a positive check is remembered
+_email_index_ready = False
+
+class CustomerEmailsNotMigrated(Exception):
+    """The unique LOWER(email) index on customers has not been built yet"""
+
+def email_index_ready(cursor):
+    """True once the migration has built a valid unique LOWER(email) index"""
+    global _email_index_ready
+    if not _email_index_ready:
+        cursor.execute('SELECT indisvalid FROM pg_index WHERE indexrelid = TO_REGCLASS(%s)', (EMAIL_INDEX,))
+        index = cursor.fetchone()
+        _email_index_ready = bool(index and index['indisvalid'])
+    return _email_index_ready
+
+def loyalty_points_for(total):
+    """Points earned by an order: LOYALTY_POINTS_PER_DOLLAR per whole dollar"""
+    return int(float(total or 0)) * LOYALTY_POINTS_PER_DOLLAR
+
+def add_customer_order(totals, email, total, ordered_at=None, name=None, phone=None):
+    """Accumulate one order into {lower(email): aggregates} for write_customer_totals()"""
+    email = (email or '').strip()
+    if not email:
+        return totals
+
+    total = round(float(total or 0), 2)
+    entry = totals.setdefault(email.lower(), {
+        'email': email, 'name': None, 'phone': None, 'orders': 0,
+        'spent': 0.0, 'points': 0, 'last_order_date': None
+    })
+    entry['orders'] += 1
+    entry['spent'] += total
+    entry['points'] += loyalty_points_for(total)
+    entry['name'] = entry['name'] or name or None
+    entry['phone'] = entry['phone'] or phone or None
+    if ordered_at is not None and (entry['last_order_date'] is None or ordered_at > entry['last_order_date']):
+        entry['last_order_date'] = ordered_at
+    return totals
+
+def write_customer_totals(cursor, totals):
+    """Add accumulated orders to their customers inside the caller's transaction, in email order"""
+    if totals and not email_index_ready(cursor):
+        write_customer_totals_unmigrated(cursor, totals)
+        return
+
+    for key in sorted(totals):
+        entry = totals[key]
+        cursor.execute('''
+            INSERT INTO customers (
+                email, name, phone, total_orders, total_spent, loyalty_points, last_order_date, updated_at
+            ) VALUES (%s, %s, %s, %s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP), CURRENT_TIMESTAMP)
+            ON CONFLICT (LOWER(email)) DO UPDATE SET
+                total_orders = customers.total_orders + excluded.total_orders,
+                total_spent = customers.total_spent + excluded.total_spent,
+                loyalty_points = customers.loyalty_points + excluded.loyalty_points,
+                last_order_date = GREATEST(customers.last_order_date, excluded.last_order_date),
+                name = COALESCE(NULLIF(customers.name, ''), excluded.name),
+                phone = COALESCE(NULLIF(customers.phone, ''), excluded.phone),
+                updated_at = CURRENT_TIMESTAMP
+        ''', (entry['email'], entry['name'], entry['phone'], entry['orders'], round(entry['spent'], 2),
+              entry['points'], entry['last_order_date']))
+
+def write_customer_totals_unmigrated(cursor, totals):
+    """write_customer_totals() for databases without the LOWER(email) index yet"""
+    for key in sorted(totals):
+        entry = totals[key]
+        params = (entry['orders'], round(entry['spent'], 2), entry['points'], entry['last_order_date'],
+                  entry['name'], entry['phone'])
+        cursor.execute('''
+            UPDATE customers SET
+                total_orders = total_orders + %s,
+                total_spent = total_spent + %s,
+                loyalty_points = loyalty_points + %s,
+                last_order_date = GREATEST(last_order_date, COALESCE(%s, CURRENT_TIMESTAMP)),
+                name = COALESCE(NULLIF(name, ''), %s),
+                phone = COALESCE(NULLIF(phone, ''), %s),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = (SELECT MIN(id) FROM customers WHERE LOWER(email) = %s)
+        ''', params + (key,))
+        if cursor.rowcount:
+            continue
+
+        # New customer; the case-sensitive unique constraint catches a concurrent first order
+        cursor.execute('''
+            INSERT INTO customers (
+                email, name, phone, total_orders, total_spent, loyalty_points, last_order_date, updated_at
+            ) VALUES (%s, %s, %s, %s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP), CURRENT_TIMESTAMP)
+            ON CONFLICT (email) DO UPDATE SET
+                total_orders = customers.total_orders + excluded.total_orders,
+                total_spent = customers.total_spent + excluded.total_spent,
+                loyalty_points = customers.loyalty_points + excluded.loyalty_points,
+                last_order_date = GREATEST(customers.last_order_date, excluded.last_order_date),
+                updated_at = CURRENT_TIMESTAMP
+        ''', (entry['email'], entry['name'], entry['phone']) + params[:4])
+
+def record_customer_order(cursor, email, total, ordered_at=None, name=None, phone=None):
+    """Add one order to its customer's aggregates inside the caller's transaction"""
+    write_customer_totals(cursor, add_customer_order({}, email, total, ordered_at, name, phone))
+
+def customer_summary(row):
+    """Aggregate fields of a customers row, with the average derived from the totals"""
+    total_orders = row['total_orders'] or 0
+    total_spent = float(row['total_spent'] or 0)
+    return {
+        'total_orders': total_orders,
+        'lifetime_value': total_spent,
+        'average_order_value': round(total_spent / total_orders, 2) if total_orders else 0,
+        'loyalty_points': row['loyalty_points'] or 0,
+        'last_order_date': row['last_order_date'].isoformat() if row['last_order_date'] else None
+    }
+
+def merge_duplicate_customers(conn):
+    """Fold customers whose emails differ only in case into the lowest id, one committed group at a time.
+
+    Aggregates are summed, blank names and phones are filled from the
+    duplicates, and rows in CUSTOMER_REFERENCES are re-pointed before the
+    duplicates are deleted. Returns the number of customers removed.
+    """
+    cursor = conn.cursor()
+    # Some of these tables are created by the ORM, or by older schemas without the column
+    cursor.execute('''
+        SELECT table_name FROM information_schema.columns
+        WHERE table_schema = CURRENT_SCHEMA() AND column_name = 'customer_id' AND table_name = ANY(%s)
+        ORDER BY table_name
+    ''', (list(CUSTOMER_REFERENCES),))
+    references = [row['table_name'] for row in cursor.fetchall()]
+
+    cursor.execute('''
+        SELECT ARRAY_AGG(id ORDER BY id) AS ids
+        FROM customers
+        WHERE email IS NOT NULL
+        GROUP BY LOWER(email)
+        HAVING COUNT(*) > 1
+    ''')
+    groups = [row['ids'] for row in cursor.fetchall()]
+    conn.commit()
+
+    removed = 0
+    for ids in groups:
+        keeper, duplicates = ids[0], ids[1:]
+        cursor.execute('''
+            UPDATE customers SET
+                total_orders = merged.total_orders,
+                total_spent = merged.total_spent,
+                loyalty_points = merged.loyalty_points,
+                last_order_date = merged.last_order_date,
+                name = COALESCE(NULLIF(customers.name, ''), merged.name),
+                phone = COALESCE(NULLIF(customers.phone, ''), merged.phone),
+                updated_at = CURRENT_TIMESTAMP
+            FROM (
+                SELECT SUM(total_orders) AS total_orders, SUM(total_spent) AS total_spent,
+                       SUM(loyalty_points) AS loyalty_points, MAX(last_order_date) AS last_order_date,
+                       MIN(NULLIF(name, '')) AS name, MIN(NULLIF(phone, '')) AS phone
+                FROM customers WHERE id = ANY(%s)
+            ) merged
+            WHERE customers.id = %s
+        ''', (ids, keeper))
+        for table in references:
+            cursor.execute(f'UPDATE {table} SET customer_id = %s WHERE customer_id = ANY(%s)', (keeper, duplicates))
+        cursor.execute('DELETE FROM customers WHERE id = ANY(%s)', (duplicates,))
+        removed += cursor.rowcount
+        conn.commit()
+
+    return removed
+
+def migrate_customer_emails(conn):
+    """Merge case-duplicate customers, then build the unique LOWER(email) index concurrently.
+
+    Safe to re-run: an index left invalid by an interrupted build (or by a
+    duplicate created while it was building) is dropped, duplicates are merged
+    again and the index is rebuilt. Returns {'merged': customers removed,
+    'index_built': bool}.
+    """
+    merged = merge_duplicate_customers(conn)
+
+    conn.autocommit = True
+    cursor = conn.cursor()
+    if email_index_ready(cursor):
+        return {'merged': merged, 'index_built': False}
+
+    cursor.execute('SELECT 1 FROM pg_index WHERE indexrelid = TO_REGCLASS(%s)', (EMAIL_INDEX,))
+    if cursor.fetchone():
+        cursor.execute(f'DROP INDEX CONCURRENTLY {EMAIL_INDEX}')
+    cursor.execute(f'CREATE UNIQUE INDEX CONCURRENTLY {EMAIL_INDEX} ON customers (LOWER(email))')
+    return {'merged': merged, 'index_built': True}
+
+def recompute_customer_stats(conn, batch_size=500):
+    """Rebuild order counts, lifetime value and last order from orders, in batches of emails.
+
+    Only rows whose stored values differ are written. Returns the number of
+    customers created or corrected. Requires migrate_customer_emails() to have run.
+    """
+    cursor = conn.cursor()
+    if not email_index_ready(cursor):
+        raise CustomerEmailsNotMigrated('Customer emails have not been migrated; run POST /api/admin/jobs/migrate-customer-emails')
+    cursor.execute('''
+        SELECT DISTINCT LOWER(customer_email) AS email
+        FROM orders
+        WHERE customer_email IS NOT NULL AND customer_email <> ''
+        ORDER BY 1
+    ''')
+    emails = [row['email'] for row in cursor.fetchall()]
+
+    corrected = 0
+    for batch in chunked(emails, batch_size):
+        cursor.execute('''
+            INSERT INTO customers (
+                email, name, phone, total_orders, total_spent, loyalty_points, last_order_date, updated_at
+            )
+            SELECT MIN(customer_email), MAX(customer_name), MAX(customer_phone),
+                   COUNT(*), COALESCE(SUM(total), 0), FLOOR(COALESCE(SUM(total), 0))::int * %s,
+                   MAX(created_at), CURRENT_TIMESTAMP
+            FROM orders
+            WHERE LOWER(customer_email) = ANY(%s)
+            GROUP BY LOWER(customer_email)
+            ON CONFLICT (LOWER(email)) DO UPDATE SET
+                total_orders = excluded.total_orders,
+                total_spent = excluded.total_spent,
+                last_order_date = excluded.last_order_date,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE (customers.total_orders, customers.total_spent, customers.last_order_date)
+                IS DISTINCT FROM (excluded.total_orders, excluded.total_spent, excluded.last_order_date)
+        ''', (LOYALTY_POINTS_PER_DOLLAR, list(batch)))
+        corrected += cursor.rowcount
+        conn.commit()
+
+    # Customers whose orders are all gone (or never existed) but still carry counts
+    cursor.execute('''
+        UPDATE customers
+        SET total_orders = 0, total_spent = 0, last_order_date = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE total_orders <> 0
+          AND NOT EXISTS (
+              SELECT 1 FROM orders WHERE LOWER(orders.customer_email) = LOWER(customers.email)
+          )
+    ''')
+    corrected += cursor.rowcount
+    conn.commit()
+
+    return corrected
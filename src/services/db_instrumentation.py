@@ -0,0 +1,86 @@
+from psycopg2.extras import RealDictCursor
+import os
+import sqlite3
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.services.metrics import record_query
+from src.services.query_tracer import trace_query
+
+# Statement timing for the three ways the app talks to a database: psycopg2
+# connections from db_config, the local SQLite store, and the
+# SQLAlchemy models. Each statement is reported to the metrics and, in
+# development, to the per-request query tracer.
+
+def report_query(driver, sql, seconds):
+    record_query(driver, sql, seconds)
+    trace_query(driver, sql, seconds)
+
+class TimedCursor(RealDictCursor):
+    """db_config's cursor, timing each statement"""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            report_query('psycopg2', query, time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            report_query('psycopg2', query, time.perf_counter() - started)
+
+class TimedSqliteCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            report_query('sqlite3', sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            report_query('sqlite3', sql, time.perf_counter() - started)
+
+class TimedSqliteConnection(sqlite3.Connection):
+    """Hands out timed cursors, including for the conn.execute() shortcuts"""
+
+    def cursor(self, factory=TimedSqliteCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+# The local SQLite store behind the enhanced POS, order management and dashboard
+# screens; point it elsewhere (e.g. a load test's run directory) with SQLITE_DB_PATH
+SQLITE_DB_PATH = os.environ.get('SQLITE_DB_PATH', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'dankdash.db'))
+
+def connect_sqlite(path):
+    """sqlite3.connect with rows as sqlite3.Row and every statement timed"""
+    conn = sqlite3.connect(path, factory=TimedSqliteConnection)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_timer(conn, cursor, statement, parameters, context, executemany):
+    report_query('sqlalchemy', statement, time.perf_counter() - conn.info['query_started_at'].pop())
+
+@event.listens_for(Engine, 'handle_error')
+def drop_timer(context):
+    # A failed statement never reaches after_cursor_execute
+    started = context.connection.info.get('query_started_at') if context.connection is not None else None
+    if started:
+        report_query('sqlalchemy', context.statement or '', time.perf_counter() - started.pop())
@@ -0,0 +1,354 @@
+from flask import Response, jsonify, request, send_file, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
+import hashlib
+import logging
+import os
+import tempfile
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+# Storage for uploaded documents (customer IDs, partner licenses, ...).
+#
+# Uploads are streamed in chunks into a staging file while their SHA-256 is
+# computed, and abort as soon as they pass the size limit. Files are stored
+# content-addressed under <category>/<hash[:2]>/<hash[2:4]>/<hash>, so the same
+# file uploaded twice is stored once. The backend is local disk by default, or
+# any S3-compatible API (AWS, MinIO, ...) when DOCUMENT_STORAGE_BACKEND=s3, so
+# files no longer live on one worker's ephemeral disk. Asking for S3 without
+# boto3 or a bucket stops the app at startup rather than quietly writing to a
+# disk the other workers can't see.
+#
+# upload_document() and send_document() hold the request handling shared by
+# the customer and partner document routes; the routes keep their own lookups
+# and access checks.
+
+DOCUMENT_STORAGE_BACKEND = os.environ.get('DOCUMENT_STORAGE_BACKEND', 'local')
+DOCUMENT_STORAGE_DIR = os.environ.get('DOCUMENT_STORAGE_DIR', 'uploads')
+DOCUMENT_S3_BUCKET = os.environ.get('DOCUMENT_S3_BUCKET')
+DOCUMENT_S3_ENDPOINT_URL = os.environ.get('DOCUMENT_S3_ENDPOINT_URL')
+DOCUMENT_S3_PREFIX = os.environ.get('DOCUMENT_S3_PREFIX', 'documents/')
+
+ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx'}
+
+MAX_DOCUMENT_BYTES = int(os.environ.get('MAX_DOCUMENT_BYTES', 10 * 1024 * 1024))
+
+# Multipart framing and form fields on top of the file itself
+MAX_UPLOAD_OVERHEAD_BYTES = 64 * 1024
+
+# The app's MAX_CONTENT_LENGTH: Werkzeug rejects a larger body with a 413 while
+# reading it, whether or not the client sent a Content-Length (chunked uploads)
+MAX_REQUEST_BYTES = MAX_DOCUMENT_BYTES + MAX_UPLOAD_OVERHEAD_BYTES
+
+CHUNK_SIZE = 64 * 1024
+
+# Uploads smaller than this are staged in memory for the S3 backend
+SPOOL_MAX_BYTES = 1024 * 1024
+
+class DocumentTooLarge(RequestEntityTooLarge):
+    """Upload exceeded MAX_DOCUMENT_BYTES"""
+
+class EmptyDocument(ValueError):
+    """Upload contained no data"""
+
+class LocalStorage:
+    """Content-addressed files on a local (or shared network) disk"""
+
+    name = 'local'
+
+    def __init__(self, root=DOCUMENT_STORAGE_DIR):
+        self.root = root
+        self.staging_dir = os.path.join(root, '.staging')
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def staging_file(self):
+        # Staged on the same filesystem so the final move is an atomic rename
+        os.makedirs(self.staging_dir, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=self.staging_dir, delete=False)
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def put(self, key, staged, content_type=None):
+        """Move a staged file into place. Returns False if the content was already stored"""
+        staged.close()
+        path = self.path(key)
+        if os.path.exists(path):
+            os.unlink(staged.name)
+            return False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(staged.name, path)
+        return True
+
+    def discard(self, staged):
+        staged.close()
+        if os.path.exists(staged.name):
+            os.unlink(staged.name)
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def delete(self, key):
+        if os.path.exists(self.path(key)):
+            os.unlink(self.path(key))
+
+class S3Storage:
+    """Content-addressed objects in an S3-compatible bucket"""
+
+    name = 's3'
+
+    def __init__(self, bucket=DOCUMENT_S3_BUCKET, endpoint_url=DOCUMENT_S3_ENDPOINT_URL, prefix=DOCUMENT_S3_PREFIX):
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def staging_file(self):
+        return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def put(self, key, staged, content_type=None):
+        """Upload a staged file unless the content is already stored"""
+        try:
+            if self.exists(key):
+                return False
+            staged.seek(0)
+            extra = {'ContentType': content_type} if content_type else None
+            self.client.upload_fileobj(staged, self.bucket, self.prefix + key, ExtraArgs=extra)
+            return True
+        finally:
+            staged.close()
+
+    def discard(self, staged):
+        staged.close()
+
+    def open(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body']
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+def create_storage():
+    """S3 when DOCUMENT_STORAGE_BACKEND=s3, else local disk"""
+    if DOCUMENT_STORAGE_BACKEND == 's3':
+        if boto3 is None:
+            raise RuntimeError('DOCUMENT_STORAGE_BACKEND=s3 requires boto3 (pip install boto3)')
+        if not DOCUMENT_S3_BUCKET:
+            raise RuntimeError('DOCUMENT_STORAGE_BACKEND=s3 requires DOCUMENT_S3_BUCKET')
+        return S3Storage()
+    if DOCUMENT_STORAGE_BACKEND != 'local':
+        raise RuntimeError(f'Unknown DOCUMENT_STORAGE_BACKEND {DOCUMENT_STORAGE_BACKEND!r}, expected local or s3')
+    return LocalStorage()
+
+document_storage = create_storage()
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+def content_key(category, content_hash):
+    return f'{category}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}'
+
+def store_upload(file, category, storage=None, max_bytes=MAX_DOCUMENT_BYTES):
+    """Stream an uploaded file into storage, hashing it on the way.
+
+    Returns {'key', 'content_hash', 'size', 'mime_type', 'deduplicated'}.
+    Raises DocumentTooLarge or EmptyDocument without storing anything.
+    """
+    storage = storage or document_storage
+    digest = hashlib.sha256()
+    size = 0
+
+    staged = storage.staging_file()
+    try:
+        while True:
+            chunk = file.stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise DocumentTooLarge(f'Upload exceeds {max_bytes} bytes')
+            digest.update(chunk)
+            staged.write(chunk)
+        if size == 0:
+            raise EmptyDocument('Uploaded file is empty')
+    except Exception:
+        storage.discard(staged)
+        raise
+
+    content_hash = digest.hexdigest()
+    key = content_key(category, content_hash)
+    stored = storage.put(key, staged, file.mimetype)
+
+    return {
+        'key': key,
+        'content_hash': content_hash,
+        'size': size,
+        'mime_type': file.mimetype,
+        'deduplicated': not stored
+    }
+
+def store_bytes(key, data, content_type=None, storage=None):
+    """Store generated content (e.g. an image rendition) under an exact key"""
+    storage = storage or document_storage
+    staged = storage.staging_file()
+    try:
+        staged.write(data)
+    except Exception:
+        storage.discard(staged)
+        raise
+    return storage.put(key, staged, content_type)
+
+def document_response(key, filename, mimetype=None, storage=None):
+    """Stream a stored document back to the client in chunks"""
+    source = (storage or document_storage).open(key)
+
+    def generate():
+        try:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            source.close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype or 'application/octet-stream',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+def upload_document(model, category, owner_model, owner_field, owner_id, on_created=None):
+    """Handle a multipart document upload (file, document_type) for an owner row.
+
+    model is the document model, owner_field its column pointing at owner_model
+    (a form field of the same name overrides owner_id). The file is streamed
+    into storage under category; the same file uploaded again for the same
+    purpose returns the existing record. on_created(owner) runs after a new
+    record commits. Returns a JSON response.
+    """
+    # image_processing imports this module
+    from src.services.image_processing import schedule_renditions
+
+    session = None
+    try:
+        session = model.query.session
+        document_type = request.form.get('document_type')
+        try:
+            owner_id = int(request.form.get(owner_field, owner_id))
+        except (TypeError, ValueError):
+            return jsonify({'error': f'{owner_field} must be an integer'}), 400
+        if not document_type:
+            return jsonify({'error': 'Document type is required'}), 400
+
+        owner = owner_model.query.get(owner_id)
+        if owner is None:
+            return jsonify({'error': f'{owner_model.__name__} not found'}), 404
+
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file uploaded'}), 400
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        if not allowed_file(file.filename):
+            return jsonify({'error': 'File type not allowed'}), 400
+
+        # Stream into document storage, hashing as it goes
+        stored = store_upload(file, category)
+
+        existing = model.query.filter_by(
+            document_type=document_type,
+            content_hash=stored['content_hash'],
+            **{owner_field: owner.id}
+        ).first()
+        if existing:
+            return jsonify({
+                'success': True,
+                'message': 'Document already uploaded',
+                'duplicate': True,
+                'document': existing.to_dict()
+            }), 200
+
+        document = model(
+            document_type=document_type,
+            document_name=secure_filename(file.filename),
+            file_path=stored['key'],
+            file_size=stored['size'],
+            mime_type=stored['mime_type'],
+            content_hash=stored['content_hash'],
+            **{owner_field: owner.id}
+        )
+        session.add(document)
+        session.commit()
+        if on_created:
+            on_created(owner)
+
+        # Thumbnails and review copies are generated in the background
+        schedule_renditions(stored['key'], stored['content_hash'], stored['mime_type'])
+
+        return jsonify({
+            'success': True,
+            'message': 'Document uploaded successfully',
+            'document': document.to_dict()
+        }), 201
+
+    except RequestEntityTooLarge as e:
+        # Over MAX_CONTENT_LENGTH while parsing the form, or DocumentTooLarge while storing the file
+        return jsonify({'error': e.description}), 413
+    except EmptyDocument as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        if session is not None:
+            session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def send_document(document):
+    """Download response for a document record, honouring ?rendition=thumbnail|review|clean"""
+    # image_processing imports this module
+    from src.services.image_processing import rendition_for, rendition_failure, rendition_pending
+
+    try:
+        if not document.content_hash:
+            # Uploaded before document storage, saved straight to local disk
+            return send_file(os.path.abspath(document.file_path), mimetype=document.mime_type, as_attachment=True)
+
+        # A processed copy is served once it is ready
+        rendition = request.args.get('rendition')
+        if rendition:
+            key = rendition_for(document.file_path, document.content_hash, document.mime_type, rendition)
+            if key:
+                response = document_response(key, f'{rendition}-{document.document_name}.jpg', 'image/jpeg')
+                response.headers['X-Rendition'] = rendition
+                return response
+            if rendition == 'clean':
+                # Never fall back to the original here: it still has the EXIF/GPS data
+                if rendition_failure(document.content_hash):
+                    return jsonify({'error': 'A clean copy could not be generated from this document'}), 422
+                if not rendition_pending(document.content_hash, document.mime_type):
+                    return jsonify({'error': 'No clean copy is available for this document'}), 404
+                response = jsonify({'message': 'Clean copy is being generated, retry shortly'})
+                response.status_code = 202
+                response.headers['Retry-After'] = '2'
+                return response
+
+        response = document_response(document.file_path, document.document_name, document.mime_type)
+        response.headers['X-Rendition'] = 'original'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
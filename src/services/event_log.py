@@ -0,0 +1,198 @@
+from collections import deque
+from datetime import datetime, timezone
+from psycopg2.extras import Json
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from src.database_config import db_config
+
+logger = logging.getLogger(__name__)
+
+# Append-only log of integration events (emails, SMS, calls, config changes).
+#
+# append() never blocks the request: the event goes into a fixed-size
+# in-memory tail (the worker's most recent events) and onto a bounded queue. A
+# background thread drains the queue into the integration_logs table in
+# batches. If the queue is full (database down or far behind) the event stays
+# in the tail but isn't persisted, and is counted as dropped.
+#
+# The table is indexed by time and by event type, and query() reads it with
+# filters and keyset pagination (newest first, continue with before_id).
+
+EVENT_LOG_PERSIST = os.environ.get('EVENT_LOG_PERSIST', 'true').lower() != 'false'
+EVENT_LOG_TAIL_SIZE = int(os.environ.get('EVENT_LOG_TAIL_SIZE', 500))
+EVENT_LOG_QUEUE_SIZE = int(os.environ.get('EVENT_LOG_QUEUE_SIZE', 10000))
+EVENT_LOG_BATCH_SIZE = 200
+EVENT_LOG_FLUSH_SECONDS = 1.0
+
+MAX_QUERY_LIMIT = 500
+
+# How long shutdown waits for queued events to be written
+SHUTDOWN_FLUSH_SECONDS = 5
+
+class EventLog:
+    """In-memory tail plus asynchronous, batched writes to integration_logs"""
+
+    def __init__(self, source, persist=EVENT_LOG_PERSIST, tail_size=EVENT_LOG_TAIL_SIZE, queue_size=EVENT_LOG_QUEUE_SIZE):
+        self.source = source
+        self.persist = persist
+        self.tail = deque(maxlen=tail_size)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.lock = threading.Lock()
+        self.writer = None
+        self.writer_pid = None
+        self.stats = {'appended': 0, 'written': 0, 'dropped': 0, 'write_errors': 0}
+
+    def count(self, stat, amount=1):
+        with self.lock:
+            self.stats[stat] += amount
+
+    def append(self, event_type, details, status='success', data=None):
+        """Record an event. Returns immediately; the database write happens in the background"""
+        event = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'source': self.source,
+            'event_type': event_type,
+            'details': details,
+            'status': status,
+            'data': data
+        }
+        with self.lock:
+            self.tail.append(event)
+            self.stats['appended'] += 1
+
+        if self.persist:
+            self.ensure_writer()
+            try:
+                self.queue.put_nowait(event)
+            except queue.Full:
+                self.count('dropped')
+        return event
+
+    def ensure_writer(self):
+        # Started lazily and per process, since threads don't survive gunicorn's fork
+        if self.writer is not None and self.writer_pid == os.getpid() and self.writer.is_alive():
+            return
+        with self.lock:
+            if self.writer is not None and self.writer_pid == os.getpid() and self.writer.is_alive():
+                return
+            self.writer = threading.Thread(target=self.run, name=f'event-log-{self.source}', daemon=True)
+            self.writer_pid = os.getpid()
+            self.writer.start()
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + EVENT_LOG_FLUSH_SECONDS
+            while len(batch) < EVENT_LOG_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+                self.count('written', len(batch))
+            except Exception as e:
+                self.count('write_errors')
+                self.count('dropped', len(batch))
+                logger.warning('Event log write failed, %d events dropped: %s', len(batch), e)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def write(self, batch):
+        conn = db_config.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT INTO integration_logs (created_at, source, event_type, details, status, data)
+                VALUES (%(timestamp)s, %(source)s, %(event_type)s, %(details)s, %(status)s, %(data)s)
+            ''', [{**event, 'data': Json(event['data']) if event['data'] is not None else None} for event in batch])
+            conn.commit()
+        finally:
+            conn.close()
+
+    def flush(self, timeout=None):
+        """Wait until every queued event has been written (or timeout seconds pass)"""
+        if self.writer is None or self.writer_pid != os.getpid():
+            return True
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def recent(self, limit=50):
+        """This worker's latest events, oldest first"""
+        with self.lock:
+            return list(self.tail)[-limit:]
+
+    def query(self, event_type=None, status=None, since=None, until=None, before_id=None, limit=50):
+        """Persisted events of this source, newest first. Returns (events, next_before_id)"""
+        limit = max(1, min(limit, MAX_QUERY_LIMIT))
+        conditions = ['source = %s']
+        params = [self.source]
+        if event_type:
+            conditions.append('event_type = %s')
+            params.append(event_type)
+        if status:
+            conditions.append('status = %s')
+            params.append(status)
+        if since:
+            conditions.append('created_at >= %s')
+            params.append(since)
+        if until:
+            conditions.append('created_at < %s')
+            params.append(until)
+        if before_id:
+            conditions.append('id < %s')
+            params.append(before_id)
+
+        conn = db_config.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, created_at, source, event_type, details, status, data
+                FROM integration_logs
+                WHERE {' AND '.join(conditions)}
+                ORDER BY id DESC
+                LIMIT %s
+            ''', params + [limit + 1])
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        events = [{
+            'id': row['id'],
+            'timestamp': row['created_at'].isoformat(),
+            'source': row['source'],
+            'event_type': row['event_type'],
+            'details': row['details'],
+            'status': row['status'],
+            'data': row['data']
+        } for row in rows[:limit]]
+        next_before_id = events[-1]['id'] if len(rows) > limit else None
+        return events, next_before_id
+
+    def info(self):
+        with self.lock:
+            return {
+                'source': self.source,
+                'persist': self.persist,
+                'tail_entries': len(self.tail),
+                'queued': self.queue.qsize(),
+                **self.stats
+            }
+
+integration_events = EventLog('voice_ai')
+
+@atexit.register
+def flush_on_exit():
+    integration_events.flush(timeout=SHUTDOWN_FLUSH_SECONDS)
@@ -0,0 +1,212 @@
+from flask import request, jsonify, make_response, Response
+from functools import wraps
+import hashlib
+import logging
+import os
+import random
+from src.database_config import db_config
+
+logger = logging.getLogger(__name__)
+
+# Clients send a unique key per logical operation (e.g. a UUID per checkout attempt)
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# How long a completed response can be replayed
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_TTL_HOURS', 24))
+
+# A 'processing' record older than this is treated as abandoned (worker died mid-request)
+IDEMPOTENCY_LOCK_TIMEOUT_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT_SECONDS', 60))
+
+# Fraction of claims that also sweep expired keys from the table
+PURGE_PROBABILITY = 0.01
+
+# Claim retries when the conflicting row is released before it can be read
+CLAIM_ATTEMPTS = 3
+
+def request_fingerprint():
+    """Hash the method, path and raw body so a reused key with a different payload is detected"""
+    digest = hashlib.sha256()
+    digest.update(request.method.encode())
+    digest.update(request.path.encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+def claim_key(scope, key, request_hash):
+    """Try to claim an idempotency key. Returns (claimed, existing_record)
+
+    existing_record is None only if the key kept vanishing between the INSERT
+    and the read (released by a failing request each time).
+    """
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+
+        for _ in range(CLAIM_ATTEMPTS):
+            # Expired keys can be reused
+            cursor.execute("""
+                DELETE FROM idempotency_keys
+                WHERE scope = %s AND idempotency_key = %s AND expires_at < NOW()
+            """, (scope, key))
+
+            cursor.execute("""
+                INSERT INTO idempotency_keys (scope, idempotency_key, request_hash, status, locked_at, expires_at)
+                VALUES (%s, %s, %s, 'processing', NOW(), NOW() + (%s * INTERVAL '1 hour'))
+                ON CONFLICT (scope, idempotency_key) DO NOTHING
+                RETURNING idempotency_key
+            """, (scope, key, request_hash, IDEMPOTENCY_TTL_HOURS))
+
+            if cursor.fetchone():
+                conn.commit()
+                return True, None
+
+            # Take over a lock abandoned by a crashed worker
+            cursor.execute("""
+                UPDATE idempotency_keys
+                SET locked_at = NOW()
+                WHERE scope = %s AND idempotency_key = %s AND request_hash = %s
+                AND status = 'processing'
+                AND locked_at < NOW() - (%s * INTERVAL '1 second')
+                RETURNING idempotency_key
+            """, (scope, key, request_hash, IDEMPOTENCY_LOCK_TIMEOUT_SECONDS))
+
+            if cursor.fetchone():
+                conn.commit()
+                return True, None
+
+            cursor.execute("""
+                SELECT request_hash, status, response_status, response_body, response_mimetype
+                FROM idempotency_keys
+                WHERE scope = %s AND idempotency_key = %s
+            """, (scope, key))
+
+            record = cursor.fetchone()
+            conn.commit()
+            if record is not None:
+                return False, record
+            # release_key() deleted the row after our INSERT saw it; claim again
+
+        return False, None
+    finally:
+        conn.close()
+
+def store_response(scope, key, response):
+    """Save the final response so repeated requests replay it"""
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE idempotency_keys
+            SET status = 'completed', response_status = %s, response_body = %s, response_mimetype = %s
+            WHERE scope = %s AND idempotency_key = %s
+        """, (response.status_code, response.get_data(as_text=True), response.mimetype, scope, key))
+        conn.commit()
+    finally:
+        conn.close()
+
+def release_key(scope, key):
+    """Drop a claimed key so the client can retry after a server error"""
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM idempotency_keys
+            WHERE scope = %s AND idempotency_key = %s AND status = 'processing'
+        """, (scope, key))
+        conn.commit()
+    finally:
+        conn.close()
+
+def purge_expired_keys():
+    """Delete expired idempotency records"""
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM idempotency_keys WHERE expires_at < NOW()")
+        deleted = cursor.rowcount
+        conn.commit()
+        return deleted
+    finally:
+        conn.close()
+
+def replay_response(record):
+    """Rebuild the stored response for a repeated key"""
+    response = Response(
+        record['response_body'],
+        status=record['response_status'],
+        mimetype=record['response_mimetype'] or 'application/json'
+    )
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent(scope):
+    """Make a write endpoint safe to retry with an Idempotency-Key header.
+
+    The first request with a key runs the view and stores its response. Repeats
+    replay the stored response, and a repeat that arrives while the first is still
+    running gets 409 so only one copy of the write ever executes. Requests without
+    the header are processed as before.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view(*args, **kwargs)
+
+            key = key.strip()
+            if not key or len(key) > MAX_KEY_LENGTH:
+                return jsonify({
+                    'success': False,
+                    'error': f'{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters'
+                }), 400
+
+            request_hash = request_fingerprint()
+
+            try:
+                if random.random() < PURGE_PROBABILITY:
+                    purge_expired_keys()
+                claimed, record = claim_key(scope, key, request_hash)
+            except Exception as e:
+                logger.warning('Idempotency store error: %s', e)
+                return jsonify({
+                    'success': False,
+                    'error': 'Idempotency store unavailable, please retry'
+                }), 503
+
+            if not claimed:
+                if record is not None and record['request_hash'] != request_hash:
+                    return jsonify({
+                        'success': False,
+                        'error': f'{IDEMPOTENCY_HEADER} was already used with a different request'
+                    }), 422
+
+                if record is not None and record['status'] == 'completed':
+                    return replay_response(record)
+
+                response = jsonify({
+                    'success': False,
+                    'error': 'A request with this Idempotency-Key is already being processed'
+                })
+                response.status_code = 409
+                response.headers['Retry-After'] = '1'
+                return response
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except Exception:
+                release_key(scope, key)
+                raise
+
+            try:
+                # Server errors are not final - let the client retry them
+                if response.status_code >= 500:
+                    release_key(scope, key)
+                else:
+                    store_response(scope, key, response)
+            except Exception as e:
+                logger.warning('Error saving idempotent response: %s', e)
+
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,166 @@
+from concurrent.futures import ThreadPoolExecutor
+import io
+import logging
+import os
+import threading
+from src.services.cache import LRUCache
+from src.services.document_storage import document_storage, store_bytes
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Background renditions for uploaded document images.
+#
+# ID photos and partner documents arrive as multi-megabyte phone photos. After
+# an upload commits, a small thread pool (Pillow releases the GIL while
+# decoding, resizing and encoding) writes three JPEG renditions next to the
+# original in document storage:
+#
+#   thumbnail  256px  list views
+#   review     1600px document review screens
+#   clean      full size, EXIF/GPS and other metadata stripped
+#
+# Renditions are keyed by the original's content hash, so identical uploads are
+# processed once. The upload request never waits for them; if a thumbnail or
+# review copy is requested before it exists, the original is served and the job
+# is queued again, which also recovers work lost when a worker restarts. A clean
+# copy is never substituted with the original, since the original still carries
+# the metadata it exists to strip.
+#
+# Every failed job is remembered by content hash, so a broken image isn't
+# queued again on each request and a clean copy request gets a definite error
+# instead of "retry shortly" forever. Images over the pixel limit stay failed
+# for a day; other failures (a storage hiccup, a worker restart mid-write) are
+# retried after RENDITION_RETRY_SECONDS.
+
+IMAGE_PROCESSING_WORKERS = int(os.environ.get('IMAGE_PROCESSING_WORKERS', 2))
+
+RENDITIONS = {
+    'thumbnail': {'max_size': 256, 'quality': 75},
+    'review': {'max_size': 1600, 'quality': 82},
+    'clean': {'max_size': None, 'quality': 90}
+}
+
+# Refuse images that would decode to more than this many pixels. Pillow only
+# warns between MAX_IMAGE_PIXELS and twice that, so the size is checked here too
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', 100_000_000))
+
+RENDITION_RETRY_SECONDS = int(os.environ.get('RENDITION_RETRY_SECONDS', 600))
+TOO_LARGE_RETRY_SECONDS = 24 * 60 * 60
+
+PROCESSABLE_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/bmp', 'image/tiff'}
+
+executor = ThreadPoolExecutor(max_workers=IMAGE_PROCESSING_WORKERS, thread_name_prefix='image-processing')
+in_flight = set()
+in_flight_lock = threading.Lock()
+# Content hash -> reason of the last failed job, until it may be retried
+failures = LRUCache(max_entries=10000, ttl=RENDITION_RETRY_SECONDS)
+
+if Image is not None:
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+class ImageTooLarge(Exception):
+    """An image whose decoded size is over MAX_IMAGE_PIXELS"""
+
+def available():
+    return Image is not None
+
+def processable(mime_type):
+    return available() and (mime_type or '').lower() in PROCESSABLE_TYPES
+
+def rendition_key(content_hash, name):
+    return f'renditions/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}/{name}.jpg'
+
+def render(image, max_size, quality):
+    """Encode one JPEG rendition. Nothing from the source's metadata is carried over"""
+    if max_size:
+        image = image.copy()
+        image.thumbnail((max_size, max_size), Image.LANCZOS)
+
+    output = io.BytesIO()
+    image.save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return output.getvalue()
+
+def to_rgb(image):
+    """Flatten transparency onto white so the image can be saved as JPEG"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+def process_document_image(key, content_hash, storage=None):
+    """Write every missing rendition for a stored image. Returns the renditions written"""
+    storage = storage or document_storage
+    missing = [name for name in RENDITIONS if not storage.exists(rendition_key(content_hash, name))]
+    if not missing:
+        return []
+
+    source = storage.open(key)
+    try:
+        image = Image.open(io.BytesIO(source.read()))
+    finally:
+        source.close()
+    # Image.open only reads the header, so this runs before any pixels are decoded
+    if image.width * image.height > MAX_IMAGE_PIXELS:
+        raise ImageTooLarge(f'{image.width}x{image.height} is over {MAX_IMAGE_PIXELS} pixels')
+    # Apply the EXIF orientation before the metadata is dropped
+    image = to_rgb(ImageOps.exif_transpose(image))
+
+    for name in missing:
+        settings = RENDITIONS[name]
+        store_bytes(rendition_key(content_hash, name), render(image, settings['max_size'], settings['quality']), 'image/jpeg', storage)
+    return missing
+
+def run_job(key, content_hash):
+    try:
+        written = process_document_image(key, content_hash)
+        if written:
+            logger.info('Image renditions written', extra={'content_hash': content_hash, 'renditions': written})
+    except ImageTooLarge as e:
+        failures.set(content_hash, str(e), TOO_LARGE_RETRY_SECONDS)
+        logger.warning('Image not processed for %s: %s', key, e)
+    except Exception as e:
+        failures.set(content_hash, f'{type(e).__name__}: {e}')
+        logger.exception('Image processing failed for %s', key)
+    finally:
+        with in_flight_lock:
+            in_flight.discard(content_hash)
+
+def schedule_renditions(key, content_hash, mime_type):
+    """Queue rendition generation for an uploaded image. Returns the Future, or None if skipped"""
+    if not processable(mime_type) or failures.get(content_hash) is not None:
+        return None
+
+    with in_flight_lock:
+        if content_hash in in_flight:
+            return None
+        in_flight.add(content_hash)
+
+    return executor.submit(run_job, key, content_hash)
+
+def rendition_for(key, content_hash, mime_type, name, storage=None):
+    """Storage key of a ready rendition, or None (queuing it) when it isn't available yet"""
+    storage = storage or document_storage
+    if name not in RENDITIONS or not content_hash or not processable(mime_type):
+        return None
+
+    rendition = rendition_key(content_hash, name)
+    if storage.exists(rendition):
+        return rendition
+
+    schedule_renditions(key, content_hash, mime_type)
+    return None
+
+def rendition_failure(content_hash):
+    """Why the last rendition job for this content failed, or None"""
+    return failures.get(content_hash) if content_hash else None
+
+def rendition_pending(content_hash, mime_type):
+    """True if renditions of this document are queued or will be on the next request"""
+    return bool(content_hash) and processable(mime_type) and rendition_failure(content_hash) is None
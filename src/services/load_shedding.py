@@ -0,0 +1,156 @@
+from flask import g, jsonify, request
+from collections import deque
+import os
+import random
+import threading
+import time
+
+# Load shedding for overloaded workers.
+#
+# Each worker tracks how many requests it is handling right now and the p99
+# latency of its recent requests. When the in-flight count passes
+# LOAD_SHED_MAX_IN_FLIGHT, new requests get an immediate 503 with Retry-After
+# instead of queueing behind the others. When LOAD_SHED_P99_MS is set (it is
+# off by default) and p99 latency is above it, a share of new requests
+# proportional to the overshoot is shed, so latency can recover while the rest
+# keep being served and measured. Routes that call out to Twilio, SendGrid or
+# the voice AI service are slow when those are, not when this worker is, so
+# their latency is left out of the p99.
+# Admin endpoints and /metrics are never shed, so the stats stay reachable.
+#
+# The in-flight limit only bites with threaded workers (gunicorn --threads);
+# a sync worker handles one request at a time and relies on the latency signal.
+
+LOAD_SHEDDING_ENABLED = os.environ.get('LOAD_SHEDDING_ENABLED', 'true').lower() != 'false'
+LOAD_SHED_MAX_IN_FLIGHT = int(os.environ.get('LOAD_SHED_MAX_IN_FLIGHT', 64))
+# 0 disables latency-based shedding
+LOAD_SHED_P99_MS = float(os.environ.get('LOAD_SHED_P99_MS', 0))
+
+# p99 is over the last LATENCY_WINDOW requests within LATENCY_WINDOW_SECONDS, so
+# once slow requests stop the signal clears even if most traffic is being shed
+LATENCY_WINDOW = 1000
+LATENCY_WINDOW_SECONDS = 30
+P99_REFRESH_SECONDS = 1.0
+
+# Requests needed before the latency signal is trusted
+MIN_SAMPLES = 50
+
+# Never shed more than this share of requests on latency alone
+MAX_SHED_FRACTION = 0.9
+
+EXEMPT_PREFIXES = ('/api/admin', '/metrics')
+
+# Counted as in flight, but their latency says nothing about this worker's load
+OUTBOUND_PREFIXES = ('/api/twilio', '/api/email', '/api/voice-ai')
+
+class LoadMonitor:
+    """In-flight count and rolling p99 latency for this worker"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.latencies = deque(maxlen=window)
+        self.p99_ms = 0.0
+        self.p99_at = 0
+        self.shed = {'in_flight': 0, 'latency': 0}
+
+    def start(self):
+        with self.lock:
+            self.in_flight += 1
+            return self.in_flight
+
+    def finish(self, elapsed_ms=None):
+        """Count a served request done, recording its latency unless elapsed_ms is None"""
+        with self.lock:
+            self.in_flight -= 1
+            if elapsed_ms is not None:
+                self.latencies.append((time.monotonic(), elapsed_ms))
+
+    def shed_finished(self, reason):
+        # Shed responses are instant; recording them would hide the overload from p99
+        with self.lock:
+            self.in_flight -= 1
+            self.shed[reason] += 1
+
+    def p99(self):
+        now = time.monotonic()
+        if now - self.p99_at >= P99_REFRESH_SECONDS:
+            cutoff = now - LATENCY_WINDOW_SECONDS
+            with self.lock:
+                samples = sorted(elapsed for at, elapsed in self.latencies if at >= cutoff)
+                self.p99_at = now
+            if len(samples) >= MIN_SAMPLES:
+                self.p99_ms = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+            else:
+                self.p99_ms = 0.0
+        return self.p99_ms
+
+    def shed_reason(self, in_flight):
+        """'in_flight', 'latency' or None for a request that just started"""
+        if in_flight > LOAD_SHED_MAX_IN_FLIGHT:
+            return 'in_flight'
+        if LOAD_SHED_P99_MS <= 0:
+            return None
+        p99 = self.p99()
+        if p99 > LOAD_SHED_P99_MS:
+            overshoot = (p99 - LOAD_SHED_P99_MS) / LOAD_SHED_P99_MS
+            if random.random() < min(MAX_SHED_FRACTION, overshoot):
+                return 'latency'
+        return None
+
+    def info(self):
+        with self.lock:
+            in_flight = self.in_flight
+            samples = len(self.latencies)
+            shed = dict(self.shed)
+        return {
+            'in_flight': in_flight,
+            'max_in_flight': LOAD_SHED_MAX_IN_FLIGHT,
+            'p99_ms': round(self.p99(), 1),
+            'p99_threshold_ms': LOAD_SHED_P99_MS,
+            'samples': samples,
+            'shed': shed
+        }
+
+load_monitor = LoadMonitor()
+
+def begin_request():
+    """before_request hook: count the request and shed it if the worker is overloaded"""
+    if not LOAD_SHEDDING_ENABLED or request.path.startswith(EXEMPT_PREFIXES):
+        return None
+
+    g.load_started_at = time.perf_counter()
+    reason = load_monitor.shed_reason(load_monitor.start())
+    if reason is None:
+        return None
+
+    g.load_shed_reason = reason
+    response = jsonify({
+        'success': False,
+        'error': 'Server is busy, please retry shortly'
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+def end_request(exc=None):
+    """teardown_request hook: record the latency of every counted request"""
+    started = g.pop('load_started_at', None)
+    if started is None:
+        return
+    reason = g.pop('load_shed_reason', None)
+    if reason is not None:
+        load_monitor.shed_finished(reason)
+        return
+    if request.path.startswith(OUTBOUND_PREFIXES):
+        load_monitor.finish()
+        return
+    load_monitor.finish((time.perf_counter() - started) * 1000)
+
+def init_load_shedding(app):
+    """Install the hooks. Call before other before_request hooks so shedding runs first"""
+    app.before_request(begin_request)
+    app.teardown_request(end_request)
+
+def load_stats():
+    return load_monitor.info()
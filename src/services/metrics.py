@@ -0,0 +1,128 @@
+from flask import g, has_request_context, request
+from contextlib import contextmanager
+from functools import lru_cache
+import logging
+import os
+import re
+import time
+
+try:
+    from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+                                   REGISTRY, generate_latest, multiprocess)
+except ImportError:
+    Counter = None
+
+logger = logging.getLogger(__name__)
+
+# Request, database and outbound-call metrics in Prometheus format.
+#
+# Every request is timed and counted by route template (/api/orders/<order_id>,
+# not the concrete URL) and status, and the time it spent in the database is
+# summed from the per-query timings reported by db_instrumentation. Calls to
+# SMTP, SendGrid and Twilio are timed with track_outbound().
+#
+# Under gunicorn each worker writes its samples to files in
+# PROMETHEUS_MULTIPROC_DIR (set up by gunicorn.conf.py) and /metrics merges the
+# files of every worker, so a scrape sees the whole server whichever worker
+# answers it. Without that directory the metrics are this process's only.
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() != 'false'
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+DB_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0)
+OUTBOUND_BUCKETS = (.05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+if Counter is not None:
+    REQUESTS = Counter('dankdash_http_requests_total', 'HTTP requests by route and status',
+                       ['method', 'route', 'status'])
+    REQUEST_SECONDS = Histogram('dankdash_http_request_duration_seconds', 'HTTP request latency by route',
+                                ['method', 'route'])
+    IN_FLIGHT = Gauge('dankdash_http_requests_in_flight', 'HTTP requests being handled',
+                      multiprocess_mode='livesum')
+    REQUEST_DB_SECONDS = Histogram('dankdash_http_request_db_seconds', 'Database time per HTTP request by route',
+                                   ['method', 'route'], buckets=DB_BUCKETS)
+    QUERY_SECONDS = Histogram('dankdash_db_query_duration_seconds', 'Database query latency by statement',
+                              ['driver', 'query'], buckets=DB_BUCKETS)
+    OUTBOUND_SECONDS = Histogram('dankdash_outbound_request_duration_seconds', 'Calls to external services',
+                                 ['service', 'operation', 'outcome'], buckets=OUTBOUND_BUCKETS)
+
+STATEMENT_KIND = re.compile(r'\s*(\w+)')
+STATEMENT_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE|ON)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?"?([A-Za-z_][\w.]*)', re.IGNORECASE)
+
+@lru_cache(maxsize=4096)
+def statement_label(sql):
+    """'SELECT orders' style label: the statement kind and its first table, never the values"""
+    kind = STATEMENT_KIND.match(sql)
+    if not kind:
+        return 'OTHER'
+    table = STATEMENT_TABLE.search(sql)
+    return f'{kind.group(1).upper()} {table.group(1).lower()}' if table else kind.group(1).upper()
+
+def record_query(driver, sql, seconds):
+    """Called by db_instrumentation after every statement"""
+    if has_request_context():
+        g.db_seconds = g.get('db_seconds', 0.0) + seconds
+        g.db_queries = g.get('db_queries', 0) + 1
+    if Counter is not None and METRICS_ENABLED:
+        QUERY_SECONDS.labels(driver, statement_label(sql if isinstance(sql, str) else str(sql))).observe(seconds)
+
+@contextmanager
+def track_outbound(service, operation):
+    """Time a call to an external service: with track_outbound('twilio', 'send_sms'): ..."""
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'success'
+    finally:
+        if Counter is not None and METRICS_ENABLED:
+            OUTBOUND_SECONDS.labels(service, operation, outcome).observe(time.perf_counter() - started)
+
+def route_label():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def begin_request():
+    """before_request hook"""
+    g.metrics_started_at = time.perf_counter()
+    g.db_seconds = 0.0
+    g.db_queries = 0
+    IN_FLIGHT.inc()
+
+def record_status(response):
+    """after_request hook: remember the status, which teardown doesn't see"""
+    g.metrics_status = response.status_code
+    return response
+
+def end_request(exc=None):
+    """teardown_request hook: runs for every request, including ones that raised"""
+    started = g.pop('metrics_started_at', None)
+    if started is None:
+        return
+    IN_FLIGHT.dec()
+    method, route = request.method, route_label()
+    REQUESTS.labels(method, route, str(g.pop('metrics_status', 500))).inc()
+    REQUEST_SECONDS.labels(method, route).observe(time.perf_counter() - started)
+    REQUEST_DB_SECONDS.labels(method, route).observe(g.get('db_seconds', 0.0))
+
+def init_metrics(app):
+    """Install the request hooks. Call first, so requests shed under load are counted too"""
+    if not METRICS_ENABLED:
+        return
+    if Counter is None:
+        logger.warning('prometheus_client is not installed, request metrics are disabled')
+        return
+    app.before_request(begin_request)
+    app.after_request(record_status)
+    app.teardown_request(end_request)
+
+def render_metrics():
+    """(body, content type) for a scrape, merged across workers in multiprocess mode"""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def metrics_available():
+    return Counter is not None and METRICS_ENABLED
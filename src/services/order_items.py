@@ -0,0 +1,228 @@
+from datetime import datetime
+import json
+import logging
+import math
+from src.services.sql_compat import is_sqlite, execute, executemany, chunked, in_clause
+
+# Normalized cart lines. The JSON `items` blobs on orders / pos_transactions are
+# still written (dual-write) so older readers keep working, but listings and
+# sales aggregates read from this table.
+#
+# Each physical sale is stored once: online orders under orders.id with
+# source='order', POS sales under pos_transactions.sale_id with source='pos'.
+# The ORD-POS-* rows that mirror POS sales into orders get no line items,
+# otherwise best-seller totals would count POS sales twice.
+#
+# The SQLite store (SQLITE_DB_PATH, src/dankdash.db by default) keeps its own copy of this table for the
+# enhanced POS screens. The best-seller and SKU revenue endpoints read the
+# PostgreSQL table only, so sales recorded in SQLite are not part of them.
+
+logger = logging.getLogger(__name__)
+
+POS_MIRROR_PREFIX = 'ORD-POS-'
+
+SQLITE_DDL = [
+    '''
+        CREATE TABLE IF NOT EXISTS order_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id TEXT NOT NULL,
+            source TEXT NOT NULL DEFAULT 'order',
+            line_number INTEGER NOT NULL,
+            sku TEXT NOT NULL,
+            name TEXT,
+            quantity INTEGER NOT NULL,
+            unit_price REAL NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (order_id, line_number)
+        )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_order_items_sku_created_at ON order_items (sku, created_at)',
+    'CREATE INDEX IF NOT EXISTS idx_order_items_created_at ON order_items (created_at)'
+]
+
+def init_sqlite_order_items_table(cursor):
+    """Create the order_items table in a SQLite database"""
+    for statement in SQLITE_DDL:
+        cursor.execute(statement)
+
+def item_sku(item):
+    """Pick the product identifier from a cart item (carts use sku, id, productId or just name)"""
+    for key in ('sku', 'id', 'productId', 'name'):
+        if item.get(key):
+            return str(item[key])
+    return 'unknown'
+
+def item_quantity(item):
+    """Whole-unit quantity of a cart item; cart_errors() has already accepted it"""
+    return int(float(item.get('quantity', 1)))
+
+def cart_errors(items):
+    """Problems that stop a cart from being stored as line items, [] if there are none.
+
+    Call it before opening the order's transaction so a bad cart is a 400, not a
+    failed write.
+    """
+    if not isinstance(items, list):
+        return ['items must be a list']
+
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append(f'items[{index}] must be an object')
+            continue
+        try:
+            quantity = float(item.get('quantity', 1))
+            price = float(item.get('price', 0))
+        except (TypeError, ValueError):
+            errors.append(f'items[{index}] has an invalid price or quantity')
+            continue
+        if not quantity.is_integer() or quantity <= 0:
+            errors.append(f'items[{index}].quantity must be a positive whole number')
+        if not math.isfinite(price) or price < 0:
+            errors.append(f'items[{index}].price must be a non-negative number')
+    return errors
+
+def line_item_rows(order_id, items, source='order', created_at=None):
+    """Convert a cart into order_items parameter tuples"""
+    created_at = created_at or datetime.now()
+    rows = []
+    for line_number, item in enumerate(items or [], start=1):
+        rows.append((
+            order_id,
+            source,
+            line_number,
+            item_sku(item),
+            item.get('name', ''),
+            item_quantity(item),
+            float(item.get('price', 0)),
+            created_at
+        ))
+    return rows
+
+def write_line_items(cursor, order_id, items, source='order', created_at=None):
+    """Insert the cart lines for an order inside the caller's transaction"""
+    rows = line_item_rows(order_id, items, source, created_at)
+    if not rows:
+        return 0
+
+    if is_sqlite(cursor):
+        # SQLite stores timestamps as text
+        rows = [row[:-1] + (row[-1].isoformat(sep=' '),) for row in rows]
+
+    executemany(cursor, '''
+        INSERT INTO order_items (order_id, source, line_number, sku, name, quantity, unit_price, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (order_id, line_number) DO NOTHING
+    ''', rows)
+    return len(rows)
+
+def load_line_items(cursor, order_ids):
+    """Fetch line items for many orders in batched queries. Returns {order_id: [items]}"""
+    line_items = {}
+    order_ids = list(order_ids)
+
+    for chunk in chunked(order_ids):
+        execute(cursor, f'''
+            SELECT order_id, sku, name, quantity, unit_price
+            FROM order_items
+            WHERE order_id IN ({in_clause(chunk)})
+            ORDER BY order_id, line_number
+        ''', tuple(chunk))
+
+        for row in cursor.fetchall():
+            line_items.setdefault(row['order_id'], []).append({
+                'id': row['sku'],
+                'sku': row['sku'],
+                'name': row['name'],
+                'price': float(row['unit_price']),
+                'quantity': row['quantity']
+            })
+
+    return line_items
+
+def items_for(line_items, order_id, items_json):
+    """Use normalized lines when present, else fall back to the legacy JSON blob"""
+    if order_id in line_items:
+        return line_items[order_id]
+    try:
+        return json.loads(items_json) if items_json else []
+    except (TypeError, ValueError):
+        return []
+
+def sku_revenue(cursor, sku, since=None, until=None):
+    """Units, revenue and order count for one SKU over an optional window"""
+    query = '''
+        SELECT COUNT(DISTINCT order_id) AS order_count, SUM(quantity) AS quantity_sold,
+               SUM(quantity * unit_price) AS revenue
+        FROM order_items
+        WHERE sku = %s
+    '''
+    params = [sku]
+
+    if since:
+        query += ' AND created_at >= %s'
+        params.append(since)
+    if until:
+        query += ' AND created_at < %s'
+        params.append(until)
+
+    execute(cursor, query, tuple(params))
+    row = cursor.fetchone()
+    return {
+        'sku': sku,
+        'order_count': int(row['order_count'] or 0),
+        'quantity_sold': int(row['quantity_sold'] or 0),
+        'revenue': round(float(row['revenue'] or 0), 2)
+    }
+
+def backfill_table(conn, table, id_column, source, created_at_column='created_at', batch_size=500):
+    """Copy JSON carts from `table` into order_items, one committed batch at a time.
+
+    Safe to re-run: existing lines are skipped by the (order_id, line_number)
+    unique key. Legacy carts that cart_errors() rejects (fractional quantities,
+    unparseable prices) are logged and skipped rather than aborting the run.
+    Returns {'scanned': records read, 'skipped': malformed records}.
+    """
+    cursor = conn.cursor()
+    last_id = ''
+    scanned = 0
+    skipped = 0
+
+    while True:
+        execute(cursor, f'''
+            SELECT {id_column} AS record_id, items, {created_at_column} AS created_at
+            FROM {table}
+            WHERE {id_column} > %s AND {id_column} NOT LIKE %s
+            ORDER BY {id_column}
+            LIMIT %s
+        ''', (last_id, POS_MIRROR_PREFIX + '%', batch_size))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        for row in rows:
+            try:
+                items = json.loads(row['items']) if row['items'] else []
+            except (TypeError, ValueError):
+                items = []
+
+            errors = cart_errors(items)
+            if errors:
+                logger.warning('Skipping %s %s in order_items backfill: %s', table, row['record_id'], '; '.join(errors))
+                skipped += 1
+                continue
+
+            created_at = row['created_at']
+            if isinstance(created_at, str):
+                try:
+                    created_at = datetime.fromisoformat(created_at)
+                except ValueError:
+                    created_at = None
+
+            write_line_items(cursor, row['record_id'], items, source, created_at)
+
+        conn.commit()
+        scanned += len(rows)
+        last_id = rows[-1]['record_id']
+
+    return {'scanned': scanned, 'skipped': skipped}
@@ -0,0 +1,127 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import os
+import threading
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+# Password hashing with an optional process pool.
+#
+# Hashes use PASSWORD_HASH_METHOD, Werkzeug's method string. It defaults to
+# scrypt with Werkzeug's own parameters (N=32768, r=8, p=1), so existing hashes
+# already match it; raise N (or switch to e.g. pbkdf2:sha256:1000000) through
+# the environment. A successful login re-hashes the password only when its
+# stored hash uses a weaker algorithm or a lower cost than that, never the other
+# way round.
+#
+# Hashing runs in a small per-worker process pool of PASSWORD_HASH_WORKERS
+# processes (min(2, cores) by default; 0 hashes inline). That caps how many
+# cores a burst of logins can take (and with threaded workers keeps hashing off
+# the GIL), with at most PASSWORD_HASH_MAX_PENDING hashes queued or running;
+# beyond that callers get PasswordHashingBusy (503). A slot is held until its
+# hash actually finishes, so callers that time out don't let more work pile up
+# behind it. The calling request still waits for its result, so with sync
+# gunicorn workers the pool frees no workers and adds no throughput.
+
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+# 0 hashes inline in the calling thread (no pool)
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', min(2, os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))
+PASSWORD_HASH_TIMEOUT_SECONDS = float(os.environ.get('PASSWORD_HASH_TIMEOUT_SECONDS', 10))
+
+class PasswordHashingBusy(ServiceUnavailable):
+    """Too many password hashes already queued on this worker"""
+
+    def __init__(self):
+        super().__init__('Too many sign-in requests, please retry shortly', retry_after=1)
+
+executor = None
+executor_pid = None
+executor_lock = threading.Lock()
+pending = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+def hash_strength(method):
+    """(algorithm rank, work factor) of a Werkzeug method string; higher is stronger"""
+    name, *params = method.split(':')
+    try:
+        if name == 'scrypt':
+            n, r, p = (list(map(int, params)) + [2 ** 15, 8, 1][len(params):])[:3]
+            return 2, n * r * p
+        if name == 'pbkdf2':
+            return 1, int(params[1]) if len(params) > 1 else DEFAULT_PBKDF2_ITERATIONS
+    except ValueError:
+        pass
+    return 0, 0
+
+def needs_rehash(pwhash, method=PASSWORD_HASH_METHOD):
+    """True if a stored hash uses a weaker algorithm or a lower cost than the configured method"""
+    return not pwhash or hash_strength(pwhash.split('$', 1)[0]) < hash_strength(method)
+
+def hash_job(password, method):
+    return generate_password_hash(password, method=method)
+
+def verify_job(pwhash, password, method):
+    """(matches, upgraded hash or None). Runs in a pool process"""
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if needs_rehash(pwhash, method):
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+def get_executor():
+    """The pool for this process, created on first use (after gunicorn forks)"""
+    global executor, executor_pid
+    with executor_lock:
+        if executor is None or executor_pid != os.getpid():
+            executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS)
+            executor_pid = os.getpid()
+        return executor
+
+def reset_executor(broken):
+    global executor
+    with executor_lock:
+        if executor is broken:
+            executor = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def submit(pool, job, args):
+    """Queue a job in a pending slot that is released when the job finishes, not when the caller gives up"""
+    if not pending.acquire(blocking=False):
+        raise PasswordHashingBusy()
+    try:
+        future = pool.submit(job, *args)
+    except Exception:
+        pending.release()
+        raise
+    future.add_done_callback(lambda _: pending.release())
+    return future
+
+def run(job, *args):
+    if PASSWORD_HASH_WORKERS <= 0:
+        return job(*args)
+
+    try:
+        pool = get_executor()
+        try:
+            return submit(pool, job, args).result(timeout=PASSWORD_HASH_TIMEOUT_SECONDS)
+        except BrokenProcessPool:
+            # A pool process died (OOM kill, ...); start a fresh pool and retry once
+            reset_executor(pool)
+            return submit(get_executor(), job, args).result(timeout=PASSWORD_HASH_TIMEOUT_SECONDS)
+    except TimeoutError:
+        raise PasswordHashingBusy()
+
+def hash_password(password):
+    """Hash a new password with the configured method"""
+    return run(hash_job, password, PASSWORD_HASH_METHOD)
+
+def verify_password(pwhash, password):
+    """Check a password against a stored hash.
+
+    Returns (matches, upgraded) where upgraded is a fresh hash to store when the
+    stored one is weaker than the configured method, else None.
+    """
+    if not pwhash or not password:
+        return False, None
+    return run(verify_job, pwhash, password, PASSWORD_HASH_METHOD)
@@ -0,0 +1,146 @@
+from flask import current_app, g, has_request_context, request
+from collections import defaultdict
+from functools import lru_cache, wraps
+import logging
+import os
+import re
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Per-request SQL tracing for development and tests.
+#
+# With tracing on (SQL_TRACE=true, or the app in debug or testing mode) every
+# statement a request runs, whether through SQLAlchemy, db_config or the
+# SQLite store, is collected with its duration and the line of app code that
+# issued it. When the request ends the tracer logs the count and total time,
+# and warns about statements that ran SQL_REPEAT_THRESHOLD or more times with
+# only their parameters changing, which is the shape of an N+1 (a lazy
+# relationship or a query inside a loop).
+#
+# A request running more than SQL_QUERY_BUDGET statements is logged as over
+# budget; in testing mode (or with SQL_QUERY_BUDGET_STRICT=true) it raises
+# QueryBudgetExceeded, so the test that made the request fails. Views that
+# legitimately need more can say so with @query_budget(n).
+#
+# Tracing off costs one g lookup per statement.
+
+SQL_TRACE = os.environ.get('SQL_TRACE', 'false').lower() == 'true'
+SQL_QUERY_BUDGET = int(os.environ.get('SQL_QUERY_BUDGET', 25))
+SQL_QUERY_BUDGET_STRICT = os.environ.get('SQL_QUERY_BUDGET_STRICT', 'false').lower() == 'true'
+SQL_REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD', 3))
+
+# Frames in these files are the plumbing, not the code that issued the query
+SKIPPED_FILES = ('db_instrumentation.py', 'query_tracer.py', 'metrics.py')
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class QueryBudgetExceeded(Exception):
+    """A request ran more statements than its budget"""
+
+    def __init__(self, summary):
+        super().__init__(
+            f"{summary['endpoint']} ran {summary['queries']} queries (budget {summary['budget']})"
+            + ''.join(f"\n  {r['count']}x {r['statement']} at {r['location']}" for r in summary['repeated'])
+        )
+        self.summary = summary
+
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|%s|\?|:\w+")
+SQL_VALUE_LISTS = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+
+@lru_cache(maxsize=4096)
+def normalize_sql(sql):
+    """Statement with literals and placeholders replaced by ?, so repeats with new parameters match"""
+    sql = SQL_LITERALS.sub('?', ' '.join(sql.split()))
+    return SQL_VALUE_LISTS.sub('(...)', sql)
+
+@lru_cache(maxsize=1024)
+def app_file(filename):
+    """Path relative to src/ for app code outside the database plumbing, else None"""
+    path = os.path.abspath(filename)
+    if not path.startswith(APP_ROOT + os.sep) or path.endswith(SKIPPED_FILES):
+        return None
+    return os.path.relpath(path, APP_ROOT)
+
+def caller_location():
+    """file:line of the innermost app frame that issued the statement"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = app_file(frame.f_code.co_filename)
+        if filename:
+            return f'{filename}:{frame.f_lineno}'
+        frame = frame.f_back
+    return 'unknown'
+
+def tracing_enabled():
+    return SQL_TRACE or current_app.debug or current_app.testing
+
+def trace_query(driver, sql, seconds):
+    """Called by db_instrumentation after every statement"""
+    if not has_request_context():
+        return
+    trace = g.get('query_trace')
+    if trace is not None:
+        trace.append((driver, sql if isinstance(sql, str) else str(sql), seconds, caller_location()))
+
+def query_budget(limit):
+    """Allow a view more (or fewer) statements than SQL_QUERY_BUDGET"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g.query_budget = limit
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def summarize(trace, budget):
+    groups = defaultdict(lambda: {'count': 0, 'seconds': 0.0, 'location': None})
+    for driver, sql, seconds, location in trace:
+        group = groups[(driver, normalize_sql(sql))]
+        group['count'] += 1
+        group['seconds'] += seconds
+        group['location'] = group['location'] or location
+
+    repeated = sorted((
+        {'driver': driver, 'statement': statement, 'count': group['count'],
+         'ms': round(group['seconds'] * 1000, 2), 'location': group['location']}
+        for (driver, statement), group in groups.items() if group['count'] >= SQL_REPEAT_THRESHOLD
+    ), key=lambda r: -r['count'])
+
+    return {
+        'endpoint': request.endpoint or request.path,
+        'queries': len(trace),
+        'db_ms': round(sum(seconds for _, _, seconds, _ in trace) * 1000, 2),
+        'distinct': len(groups),
+        'budget': budget,
+        'repeated': repeated
+    }
+
+def begin_trace():
+    """before_request hook"""
+    if tracing_enabled():
+        g.query_trace = []
+
+def end_trace(response):
+    """after_request hook: log the request's queries and enforce its budget"""
+    trace = g.pop('query_trace', None)
+    if trace is None:
+        return response
+
+    summary = summarize(trace, g.get('query_budget', SQL_QUERY_BUDGET))
+    response.headers['X-Query-Count'] = str(summary['queries'])
+    response.headers['X-Query-Time-Ms'] = str(summary['db_ms'])
+    logger.debug('SQL trace', extra={key: summary[key] for key in ('endpoint', 'queries', 'db_ms', 'distinct')})
+    for repeat in summary['repeated']:
+        logger.warning('Repeated query (possible N+1): %dx %s at %s', repeat['count'], repeat['statement'],
+                       repeat['location'], extra={'endpoint': summary['endpoint'], 'db_ms': repeat['ms']})
+
+    if summary['queries'] > summary['budget']:
+        if current_app.testing or SQL_QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(summary)
+        logger.warning('Query budget exceeded: %s ran %d queries (budget %d)',
+                       summary['endpoint'], summary['queries'], summary['budget'])
+    return response
+
+def init_query_tracer(app):
+    app.before_request(begin_trace)
+    app.after_request(end_trace)
@@ -0,0 +1,227 @@
+from flask import g, jsonify, make_response, request
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Per-client rate limiting for public endpoints.
+#
+# Each limited endpoint has a token bucket per client: it holds up to `limit`
+# tokens, refills at limit/per_seconds tokens a second, and every request takes
+# one. An empty bucket gets 429 with Retry-After set to when the next token
+# arrives. Clients are identified by API key, then by the signed-in customer,
+# then by IP address. Only issued API keys count: the SHA-256 digests of the
+# keys are listed in RATE_LIMIT_API_KEYS, and any other X-API-Key header is
+# ignored, so sending a fresh random key can't buy a fresh bucket.
+#
+# Buckets live in a per-process store by default, which limits each gunicorn
+# worker separately. With RATE_LIMIT_STORAGE_URL (or REDIS_URL) set and the
+# redis package installed, buckets are shared across workers in Redis and
+# updated atomically by a Lua script. If Redis is unreachable requests are let
+# through rather than failing.
+#
+# Per-account limits (json_field_identity) key on the client and the account
+# together by default, so one client guessing at an account can't lock its
+# owner out. An account-only bucket (per_client=False) catches guesses spread
+# over many clients; keep it loose enough that an attacker filling it only
+# slows the owner down.
+#
+# Limits can be changed per endpoint without a deploy, e.g.
+# RATE_LIMIT_LOGIN=20/60 allows a burst of 20 and 20 a minute after that.
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() != 'false'
+RATE_LIMIT_STORAGE_URL = os.environ.get('RATE_LIMIT_STORAGE_URL') or os.environ.get('REDIS_URL')
+RATE_LIMIT_MAX_BUCKETS = int(os.environ.get('RATE_LIMIT_MAX_BUCKETS', 100000))
+
+API_KEY_HEADER = 'X-API-Key'
+# Comma-separated SHA-256 hex digests of the issued API keys
+RATE_LIMIT_API_KEYS = frozenset(
+    digest.strip().lower() for digest in os.environ.get('RATE_LIMIT_API_KEYS', '').split(',') if digest.strip()
+)
+
+class MemoryBucketStore:
+    """Token buckets in this process, least recently used evicted past max_buckets"""
+
+    name = 'memory'
+
+    def __init__(self, max_buckets=RATE_LIMIT_MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'allowed': 0, 'limited': 0, 'evictions': 0}
+
+    def take(self, key, capacity, refill_per_second, cost=1):
+        """Take cost tokens. Returns (allowed, tokens remaining, seconds until cost tokens are available)"""
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_per_second)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > self.max_buckets:
+                # An evicted bucket comes back full, which only ever errs towards allowing
+                self.buckets.popitem(last=False)
+                self.stats['evictions'] += 1
+            self.stats['allowed' if allowed else 'limited'] += 1
+
+        retry_after = 0 if allowed else (cost - tokens) / refill_per_second
+        return allowed, tokens, retry_after
+
+    def info(self):
+        with self.lock:
+            return {'backend': self.name, 'buckets': len(self.buckets), 'max_buckets': self.max_buckets, **self.stats}
+
+# KEYS[1] bucket; ARGV capacity, refill/s, cost. Uses the Redis clock so workers agree on time.
+TAKE_SCRIPT = '''
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+'''
+
+class RedisBucketStore:
+    """Token buckets shared by every worker through Redis"""
+
+    name = 'redis'
+
+    def __init__(self, url, prefix='dankdash:ratelimit:'):
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(TAKE_SCRIPT)
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.stats = {'allowed': 0, 'limited': 0, 'errors': 0}
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def take(self, key, capacity, refill_per_second, cost=1):
+        try:
+            allowed, tokens = self.script(keys=[self.prefix + key], args=[capacity, refill_per_second, cost])
+        except redis.RedisError:
+            self.count('errors')
+            return True, capacity, 0
+
+        tokens = float(tokens)
+        allowed = bool(allowed)
+        self.count('allowed' if allowed else 'limited')
+        return allowed, tokens, 0 if allowed else (cost - tokens) / refill_per_second
+
+    def info(self):
+        with self.lock:
+            return {'backend': self.name, **self.stats}
+
+def create_store():
+    """Redis when a storage URL is configured and the client is installed, else in-process"""
+    if RATE_LIMIT_STORAGE_URL and redis is not None:
+        return RedisBucketStore(RATE_LIMIT_STORAGE_URL)
+    if RATE_LIMIT_STORAGE_URL:
+        logger.warning("Rate limit storage URL is set but the redis package is not installed, using in-process buckets")
+    return MemoryBucketStore()
+
+bucket_store = create_store()
+
+def configured_limit(name, limit, per_seconds):
+    """(limit, per_seconds), overridable with RATE_LIMIT_<NAME>=limit/seconds"""
+    override = os.environ.get(f'RATE_LIMIT_{name.upper().replace("-", "_")}')
+    if override:
+        try:
+            count, _, seconds = override.partition('/')
+            return int(count), float(seconds or per_seconds)
+        except ValueError:
+            logger.warning('Ignoring malformed rate limit override for %s: %s', name, override)
+    return limit, per_seconds
+
+def client_identity():
+    """Issued API key, then signed-in customer, then IP address"""
+    api_key = request.headers.get(API_KEY_HEADER)
+    if api_key:
+        digest = hashlib.sha256(api_key.encode()).hexdigest()
+        if digest in RATE_LIMIT_API_KEYS:
+            return 'key:' + digest[:32]
+    customer_id = getattr(g, 'customer_id', None)
+    if customer_id is not None:
+        return f'customer:{customer_id}'
+    return f'ip:{request.remote_addr}'
+
+def json_field_identity(field, per_client=True):
+    """Key requests by a normalized JSON body field (e.g. the email a login targets).
+
+    With per_client the key also includes client_identity(), giving each client
+    its own bucket per account.
+    """
+    def identity():
+        data = request.get_json(silent=True) or {}
+        value = str(data.get(field) or '').strip().lower()
+        if not value:
+            return None
+        key = f'{field}:' + hashlib.sha256(value.encode()).hexdigest()[:32]
+        return f'{client_identity()}:{key}' if per_client else key
+    return identity
+
+def too_many_requests(limit, retry_after):
+    response = jsonify({
+        'success': False,
+        'error': 'Too many requests, please slow down',
+        'retry_after': retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    response.headers['X-RateLimit-Limit'] = str(limit)
+    response.headers['X-RateLimit-Remaining'] = '0'
+    return response
+
+def rate_limit(name, limit, per_seconds, identity=client_identity):
+    """Allow each client a burst of `limit` requests and `limit` per `per_seconds` after that"""
+    limit, per_seconds = configured_limit(name, limit, per_seconds)
+    refill_per_second = limit / per_seconds
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not RATE_LIMIT_ENABLED:
+                return view(*args, **kwargs)
+
+            client = identity()
+            if client is None:
+                return view(*args, **kwargs)
+
+            allowed, remaining, retry_after = bucket_store.take(f'{name}:{client}', limit, refill_per_second)
+            if not allowed:
+                return too_many_requests(limit, max(1, math.ceil(retry_after)))
+
+            response = make_response(view(*args, **kwargs))
+            response.headers['X-RateLimit-Limit'] = str(limit)
+            response.headers['X-RateLimit-Remaining'] = str(int(remaining))
+            return response
+        return wrapper
+    return decorator
+
+def rate_limit_stats():
+    return bucket_store.info()
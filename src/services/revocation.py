@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from src.database_config import db_config
+
+logger = logging.getLogger(__name__)
+
+# In-memory revocation check for access tokens.
+#
+# Access tokens name their session (the 'sid' claim) and live for
+# ACCESS_TOKEN_TTL_SECONDS, so the only revocations a worker has to know about
+# are sessions revoked within that window. Each worker keeps them in a Bloom
+# filter rebuilt from auth_sessions every REVOCATION_SYNC_SECONDS, plus the
+# sessions it revoked itself since. A token whose session isn't in the filter
+# is accepted without touching the database; a filter hit (a revoked session,
+# or a rare false positive) is confirmed with one primary-key lookup.
+#
+# A revocation made on another worker takes effect there within
+# REVOCATION_SYNC_SECONDS.
+
+ACCESS_TOKEN_TTL_SECONDS = int(os.environ.get('ACCESS_TOKEN_TTL_SECONDS', 900))
+REVOCATION_SYNC_SECONDS = int(os.environ.get('REVOCATION_SYNC_SECONDS', 15))
+REVOCATION_FALSE_POSITIVE_RATE = 0.001
+
+# Sizing floor so a quiet period doesn't produce a filter that saturates on the next few logouts
+MIN_FILTER_CAPACITY = 1024
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing of one SHA-256)"""
+
+    def __init__(self, capacity, false_positive_rate=REVOCATION_FALSE_POSITIVE_RATE):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, value):
+        digest = hashlib.sha256(value.encode()).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        for position in self.positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(value))
+
+class RevocationList:
+    """Revoked session IDs for this worker, synced periodically from auth_sessions"""
+
+    def __init__(self, sync_seconds=REVOCATION_SYNC_SECONDS):
+        self.sync_seconds = sync_seconds
+        self.filter = BloomFilter(MIN_FILTER_CAPACITY)
+        self.synced_at = 0
+        # (monotonic time, session ID) revoked here, re-applied if a sync's query raced them
+        self.local = []
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.confirmed = 0
+        self.syncs = 0
+
+    def load_revoked(self):
+        # Anything revoked longer ago than an access token lives can't be presented any more
+        conn = db_config.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id FROM auth_sessions
+                WHERE revoked_at > NOW() - (%s * INTERVAL '1 second')
+            """, (ACCESS_TOKEN_TTL_SECONDS + self.sync_seconds,))
+            return [row['id'] for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def sync(self):
+        """Rebuild the filter from the database"""
+        started = time.monotonic()
+        session_ids = self.load_revoked()
+        rebuilt = BloomFilter(max(MIN_FILTER_CAPACITY, 2 * len(session_ids)))
+        for session_id in session_ids:
+            rebuilt.add(session_id)
+        with self.lock:
+            self.local = [(at, session_id) for at, session_id in self.local if at >= started]
+            for _, session_id in self.local:
+                rebuilt.add(session_id)
+            self.filter = rebuilt
+            self.synced_at = time.monotonic()
+            self.syncs += 1
+
+    def maybe_sync(self):
+        if time.monotonic() - self.synced_at < self.sync_seconds:
+            return
+        # One thread refreshes; the rest keep using the current filter
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self.synced_at < self.sync_seconds:
+                return
+            # Claim this round even if the sync fails, so a database outage isn't retried per request
+            self.synced_at = time.monotonic()
+        finally:
+            self.lock.release()
+        try:
+            self.sync()
+        except Exception as e:
+            logger.warning('Session revocation sync failed: %s', e)
+
+    def add(self, session_id):
+        """Record a revocation made by this worker right away"""
+        with self.lock:
+            self.filter.add(session_id)
+            self.local.append((time.monotonic(), session_id))
+
+    def is_revoked(self, session_id, confirm):
+        """True if the session is revoked. confirm(session_id) is only called on a filter hit"""
+        self.maybe_sync()
+        if session_id not in self.filter:
+            return False
+        self.hits += 1
+        revoked = confirm(session_id)
+        if revoked:
+            self.confirmed += 1
+        return revoked
+
+    def info(self):
+        return {
+            'entries': self.filter.count,
+            'filter_bytes': len(self.filter.bits),
+            'hash_count': self.filter.hash_count,
+            'filter_hits': self.hits,
+            'confirmed_revocations': self.confirmed,
+            'syncs': self.syncs,
+            'sync_seconds': self.sync_seconds
+        }
+
+revocation_list = RevocationList()
@@ -0,0 +1,276 @@
+from datetime import date, datetime, timedelta
+import logging
+import os
+import shutil
+import sys
+import uuid
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+# Columnar snapshots of sales for historical analytics.
+#
+# A nightly job copies each day's sales and line items out of PostgreSQL into
+# zstd-compressed Parquet files, one hive-style partition per day:
+#
+#     <SALES_SNAPSHOT_DIR>/sales/sale_date=2026-10-18/part-0.parquet
+#     <SALES_SNAPSHOT_DIR>/line_items/sale_date=2026-10-18/part-0.parquet
+#
+# Re-running a day replaces its partition atomically, so the job is safe to
+# repeat. Analytics queries then group and sum over these files with Arrow's
+# vectorized kernels and never touch the OLTP database.
+
+SALES_SNAPSHOT_DIR = os.environ.get(
+    'SALES_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(__file__), '..', '..', 'instance', 'sales_snapshots')
+)
+
+# Offline POS terminals can sync sales days late, so the nightly run also
+# refreshes the days before yesterday.
+SNAPSHOT_LOOKBACK_DAYS = int(os.environ.get('SNAPSHOT_LOOKBACK_DAYS', 3))
+
+POS_MIRROR_PATTERN = 'ORD-POS-%'
+
+DATASETS = {
+    'sales': [
+        ('sale_id', 'string'), ('source', 'string'), ('created_at', 'timestamp'),
+        ('customer_email', 'string'), ('payment_method', 'string'), ('status', 'string'),
+        ('subtotal', 'float64'), ('tax', 'float64'), ('total', 'float64')
+    ],
+    'line_items': [
+        ('order_id', 'string'), ('source', 'string'), ('created_at', 'timestamp'),
+        ('sku', 'string'), ('name', 'string'), ('category', 'string'),
+        ('quantity', 'int64'), ('unit_price', 'float64'), ('revenue', 'float64')
+    ]
+}
+
+AGGREGATIONS = {'sum', 'count', 'mean', 'min', 'max', 'count_distinct'}
+
+# Derived grouping keys computed from sale_date at query time
+DERIVED_KEYS = {'month': '%Y-%m', 'year': '%Y'}
+
+def available():
+    """Whether pyarrow is installed"""
+    return pa is not None
+
+def arrow_schema(dataset):
+    types = {'string': pa.string(), 'timestamp': pa.timestamp('us'), 'float64': pa.float64(), 'int64': pa.int64()}
+    return pa.schema([(name, types[kind]) for name, kind in DATASETS[dataset]])
+
+def fetch_day(cursor, day):
+    """Read one day's sales and line items from PostgreSQL"""
+    start = datetime.combine(day, datetime.min.time())
+    end = start + timedelta(days=1)
+
+    cursor.execute("""
+        SELECT id AS sale_id, COALESCE(source, 'website') AS source, created_at, customer_email,
+               payment_method, status, subtotal::float AS subtotal, tax::float AS tax, total::float AS total
+        FROM orders
+        WHERE created_at >= %s AND created_at < %s AND id NOT LIKE %s
+        UNION ALL
+        SELECT sale_id, 'pos', created_at, customer_email,
+               payment_method, status, subtotal::float, tax::float, total::float
+        FROM pos_transactions
+        WHERE created_at >= %s AND created_at < %s
+    """, (start, end, POS_MIRROR_PATTERN, start, end))
+    sales = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT oi.order_id, oi.source, oi.created_at, oi.sku, oi.name,
+               COALESCE(inv.category, 'Uncategorized') AS category, oi.quantity,
+               oi.unit_price::float AS unit_price, (oi.quantity * oi.unit_price)::float AS revenue
+        FROM order_items oi
+        LEFT JOIN inventory inv ON inv.sku = oi.sku
+        WHERE oi.created_at >= %s AND oi.created_at < %s
+    """, (start, end))
+    line_items = cursor.fetchall()
+
+    return {'sales': sales, 'line_items': line_items}
+
+def write_partition(dataset, day, rows, base_dir=SALES_SNAPSHOT_DIR):
+    """Write (or replace) one day's partition. Empty days remove the partition"""
+    parent = os.path.join(base_dir, dataset)
+    partition = os.path.join(parent, f'sale_date={day.isoformat()}')
+    schema = arrow_schema(dataset)
+
+    if not rows:
+        shutil.rmtree(partition, ignore_errors=True)
+        return 0
+
+    table = pa.Table.from_pydict(
+        {name: [row[name] for row in rows] for name in schema.names},
+        schema=schema
+    )
+
+    # Write beside the partition, then swap it in so readers never see a half-written
+    # day. Dot-prefixed directories are skipped by dataset discovery.
+    staging = os.path.join(parent, f'.staging-{uuid.uuid4().hex}')
+    os.makedirs(staging)
+    pq.write_table(table, os.path.join(staging, 'part-0.parquet'), compression='zstd')
+
+    retired = None
+    if os.path.exists(partition):
+        retired = os.path.join(parent, f'.retired-{uuid.uuid4().hex}')
+        os.rename(partition, retired)
+    os.rename(staging, partition)
+    if retired:
+        shutil.rmtree(retired, ignore_errors=True)
+
+    return table.num_rows
+
+def snapshot_days(conn, date_from, date_to, base_dir=SALES_SNAPSHOT_DIR):
+    """Snapshot every day in an inclusive range. Returns rows written per dataset"""
+    if not available():
+        raise RuntimeError('pyarrow is not installed')
+
+    cursor = conn.cursor()
+    written = {dataset: 0 for dataset in DATASETS}
+    day = date_from
+    while day <= date_to:
+        rows = fetch_day(cursor, day)
+        for dataset in DATASETS:
+            written[dataset] += write_partition(dataset, day, rows[dataset], base_dir)
+        day += timedelta(days=1)
+
+    # Release the read snapshot
+    conn.rollback()
+    return written
+
+def nightly_range(today=None):
+    """Days refreshed by the nightly run: yesterday plus the lookback window"""
+    today = today or date.today()
+    return today - timedelta(days=SNAPSHOT_LOOKBACK_DAYS), today - timedelta(days=1)
+
+def list_partitions(base_dir=SALES_SNAPSHOT_DIR):
+    """Snapshot days present on disk for each dataset"""
+    partitions = {}
+    for dataset in DATASETS:
+        path = os.path.join(base_dir, dataset)
+        days = []
+        if os.path.isdir(path):
+            days = sorted(
+                name.split('=', 1)[1] for name in os.listdir(path)
+                if name.startswith('sale_date=')
+            )
+        partitions[dataset] = days
+    return partitions
+
+def query_snapshot(dataset, group_by=None, metrics=None, date_from=None, date_to=None,
+                   filters=None, order_by=None, limit=1000, base_dir=SALES_SNAPSHOT_DIR):
+    """Group-by/aggregate over the Parquet snapshot.
+
+    metrics maps column -> aggregation (sum, count, mean, min, max,
+    count_distinct); group_by may also use the derived keys month and year.
+    Raises ValueError for unknown datasets, columns or aggregations.
+    """
+    if not available():
+        raise RuntimeError('pyarrow is not installed')
+    if dataset not in DATASETS:
+        raise ValueError(f"dataset must be one of: {', '.join(DATASETS)}")
+
+    columns = {name for name, _ in DATASETS[dataset]} | {'sale_date'}
+    group_by = list(group_by or [])
+    metrics = dict(metrics or {'total' if dataset == 'sales' else 'revenue': 'sum'})
+    filters = dict(filters or {})
+
+    for key in group_by:
+        if key not in columns and key not in DERIVED_KEYS:
+            raise ValueError(f'Unknown group_by column: {key}')
+    for column, aggregation in metrics.items():
+        if column not in columns:
+            raise ValueError(f'Unknown metric column: {column}')
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Aggregation must be one of: {', '.join(sorted(AGGREGATIONS))}")
+    for column in filters:
+        if column not in columns:
+            raise ValueError(f'Unknown filter column: {column}')
+
+    path = os.path.join(base_dir, dataset)
+    if not list_partitions(base_dir)[dataset]:
+        return []
+
+    dataset_files = ds.dataset(
+        path,
+        format='parquet',
+        partitioning=ds.partitioning(pa.schema([('sale_date', pa.date32())]), flavor='hive'),
+        exclude_invalid_files=True
+    )
+
+    # Partition pruning on the day, predicate pushdown for equality filters
+    expression = None
+    conditions = []
+    if date_from:
+        conditions.append(ds.field('sale_date') >= pa.scalar(date_from, pa.date32()))
+    if date_to:
+        conditions.append(ds.field('sale_date') <= pa.scalar(date_to, pa.date32()))
+    for column, value in filters.items():
+        if isinstance(value, list):
+            conditions.append(ds.field(column).isin(value))
+        else:
+            conditions.append(ds.field(column) == value)
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+
+    needed = (set(group_by) - set(DERIVED_KEYS)) | set(metrics) | ({'sale_date'} if set(group_by) & set(DERIVED_KEYS) else set())
+    table = dataset_files.to_table(columns=sorted(needed), filter=expression)
+
+    for key in group_by:
+        if key in DERIVED_KEYS:
+            as_timestamp = pc.cast(table['sale_date'], pa.timestamp('s'))
+            table = table.append_column(key, pc.strftime(as_timestamp, format=DERIVED_KEYS[key]))
+
+    aggregations = [(column, aggregation) for column, aggregation in metrics.items()]
+    if group_by:
+        result = table.group_by(group_by).aggregate(aggregations)
+    else:
+        result = pa.table({
+            f'{column}_{aggregation}': [
+                pc.count_distinct(table[column]).as_py() if aggregation == 'count_distinct'
+                else getattr(pc, aggregation)(table[column]).as_py()
+            ]
+            for column, aggregation in aggregations
+        })
+
+    rows = result.to_pylist()
+    if order_by:
+        descending = order_by.startswith('-')
+        key = order_by.lstrip('-')
+        rows.sort(key=lambda row: (row.get(key) is None, row.get(key)), reverse=descending)
+    elif group_by:
+        rows.sort(key=lambda row: tuple(str(row[key]) for key in group_by))
+
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, date):
+                row[key] = value.isoformat()
+            elif isinstance(value, float):
+                row[key] = round(value, 2)
+    return rows[:limit]
+
+def main(argv):
+    """Nightly entry point: python -m src.services.sales_snapshot [date_from [date_to]]"""
+    from src.database_config import db_config
+
+    if argv:
+        date_from = date.fromisoformat(argv[0])
+        date_to = date.fromisoformat(argv[1]) if len(argv) > 1 else date_from
+    else:
+        date_from, date_to = nightly_range()
+
+    conn = db_config.get_connection()
+    try:
+        written = snapshot_days(conn, date_from, date_to)
+    finally:
+        conn.close()
+    logger.info('Sales snapshot %s to %s: %s', date_from, date_to, written)
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    main(sys.argv[1:])
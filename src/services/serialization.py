@@ -0,0 +1,115 @@
+from flask import Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON encoding for API responses.
+#
+# FastJSONProvider swaps Flask's encoder for orjson app-wide while keeping
+# jsonify's output rules (sorted keys, Decimal as string, HTTP dates), so
+# existing endpoints return the same documents, only faster.
+#
+# Large listings skip per-row dict building entirely: SQL aliases shape each
+# row into its response keys and json_response / stream_json_list encode the
+# rows as-is, with Decimal as float and dates/datetimes as ISO-8601 strings.
+# Everything falls back to the stdlib json module when orjson is missing.
+
+def default(value):
+    """Encode types the JSON encoders don't handle natively in listings"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+def dumps(value):
+    """Serialize to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(value, default=default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=default, separators=(',', ':')).encode()
+
+def loads(value):
+    """Parse JSON text or bytes"""
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+def json_response(payload, status=200):
+    """Build a JSON response through the fast encoder"""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+def stream_json_list(list_key, rows, envelope=None, on_close=None, batch_size=500):
+    """Stream {**envelope, list_key: [rows...], "count": n} without building the list in memory"""
+    head = dumps(dict(envelope or {}))[:-1]
+    if envelope:
+        head += b','
+    head += dumps(list_key) + b':['
+
+    def generate():
+        count = 0
+        batch = []
+        try:
+            yield head
+            for row in rows:
+                batch.append(dumps(row))
+                if len(batch) >= batch_size:
+                    yield (b',' if count else b'') + b','.join(batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                yield (b',' if count else b'') + b','.join(batch)
+                count += len(batch)
+            yield b'],"count":' + str(count).encode() + b'}'
+        finally:
+            if on_close:
+                on_close()
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+def json_column(instance, column, empty):
+    """Parse a JSON text column once per loaded value instead of on every to_dict call"""
+    raw = getattr(instance, column)
+    if not raw:
+        return empty
+
+    parsed = instance.__dict__.setdefault('_parsed_json', {})
+    cached = parsed.get(column)
+    if cached is not None and cached[0] is raw:
+        return cached[1]
+
+    value = loads(raw)
+    parsed[column] = (raw, value)
+    return value
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, producing the same output as the default one"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.encode(obj).decode()
+
+    def encode(self, obj, pretty=False):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.encode(obj, pretty) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,198 @@
+from flask import current_app, request
+from datetime import datetime, timedelta, timezone
+import hashlib
+import hmac
+import os
+import secrets
+import jwt
+from src.database_config import db_config
+from src.services.revocation import ACCESS_TOKEN_TTL_SECONDS, revocation_list
+
+# Login sessions: short-lived access tokens plus rotating refresh tokens.
+#
+# Each login creates an auth_sessions row. The client gets a JWT access token
+# naming the session ('sid', valid ACCESS_TOKEN_TTL_SECONDS) and an opaque
+# refresh token '<session id>.<secret>'; only the secret's SHA-256 is stored.
+# Every refresh replaces the secret, and presenting the one it replaced (a
+# stolen or replayed token) revokes the whole session. Logging out revokes
+# the session; revocation_list makes that visible to access-token checks
+# without a database round trip per request.
+
+REFRESH_TOKEN_TTL_DAYS = int(os.environ.get('REFRESH_TOKEN_TTL_DAYS', 30))
+
+# Two tabs refreshing with the same token at once isn't treated as theft
+REFRESH_REUSE_GRACE_SECONDS = int(os.environ.get('REFRESH_REUSE_GRACE_SECONDS', 10))
+
+JWT_ALGORITHM = 'HS256'
+
+class InvalidRefreshToken(Exception):
+    """Refresh token unknown, expired, revoked or already used"""
+
+def token_hash(secret):
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+def issue_access_token(customer_id, session_id):
+    now = datetime.now(timezone.utc)
+    payload = {
+        'customer_id': customer_id,
+        'sid': session_id,
+        'type': 'access',
+        'iat': now,
+        'exp': now + timedelta(seconds=ACCESS_TOKEN_TTL_SECONDS)
+    }
+    return jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm=JWT_ALGORITHM)
+
+def token_response(customer_id, session_id, secret):
+    return {
+        'token': issue_access_token(customer_id, session_id),
+        'token_type': 'Bearer',
+        'expires_in': ACCESS_TOKEN_TTL_SECONDS,
+        'refresh_token': f'{session_id}.{secret}'
+    }
+
+def create_session(customer_id):
+    """Start a session for a customer who just logged in. Returns the token response"""
+    session_id = secrets.token_urlsafe(16)
+    secret = secrets.token_urlsafe(32)
+
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO auth_sessions (id, customer_id, refresh_token_hash, expires_at, user_agent, ip_address)
+            VALUES (%s, %s, %s, NOW() + (%s * INTERVAL '1 day'), %s, %s)
+        """, (
+            session_id, customer_id, token_hash(secret), REFRESH_TOKEN_TTL_DAYS,
+            (request.headers.get('User-Agent') or '')[:500], request.remote_addr
+        ))
+        conn.commit()
+    finally:
+        conn.close()
+
+    return token_response(customer_id, session_id, secret)
+
+def refresh_session(refresh_token):
+    """Rotate a refresh token. Returns (customer_id, token response)"""
+    session_id, _, secret = (refresh_token or '').partition('.')
+    if not session_id or not secret:
+        raise InvalidRefreshToken('Malformed refresh token')
+
+    new_secret = secrets.token_urlsafe(32)
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE auth_sessions
+            SET previous_refresh_token_hash = refresh_token_hash,
+                refresh_token_hash = %s,
+                refreshed_at = NOW(),
+                expires_at = NOW() + (%s * INTERVAL '1 day')
+            WHERE id = %s AND refresh_token_hash = %s
+            AND revoked_at IS NULL AND expires_at > NOW()
+            RETURNING customer_id
+        """, (token_hash(new_secret), REFRESH_TOKEN_TTL_DAYS, session_id, token_hash(secret)))
+        row = cursor.fetchone()
+        if row:
+            conn.commit()
+            return row['customer_id'], token_response(row['customer_id'], session_id, new_secret)
+
+        cursor.execute("""
+            SELECT previous_refresh_token_hash, refreshed_at > NOW() - (%s * INTERVAL '1 second') AS within_grace
+            FROM auth_sessions
+            WHERE id = %s AND revoked_at IS NULL
+        """, (REFRESH_REUSE_GRACE_SECONDS, session_id))
+        session = cursor.fetchone()
+        conn.commit()
+    finally:
+        conn.close()
+
+    if session and session['previous_refresh_token_hash'] and hmac.compare_digest(
+            session['previous_refresh_token_hash'], token_hash(secret)) and not session['within_grace']:
+        # A rotated-out token came back: assume it was stolen and end the session
+        revoke_session(session_id, 'refresh_reuse')
+        raise InvalidRefreshToken('Refresh token reuse detected, session revoked')
+    raise InvalidRefreshToken('Invalid or expired refresh token')
+
+def revoke_session(session_id, reason='logout'):
+    """End one session. Its access tokens stop working on this worker at once"""
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE auth_sessions SET revoked_at = NOW(), revoked_reason = %s
+            WHERE id = %s AND revoked_at IS NULL
+        """, (reason, session_id))
+        conn.commit()
+    finally:
+        conn.close()
+    revocation_list.add(session_id)
+
+def revoke_customer_sessions(customer_id, reason='logout_all', except_session_id=None):
+    """End every session of a customer (password reset, deactivation, 'log out everywhere')"""
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE auth_sessions SET revoked_at = NOW(), revoked_reason = %s
+            WHERE customer_id = %s AND revoked_at IS NULL AND id IS DISTINCT FROM %s
+            RETURNING id
+        """, (reason, customer_id, except_session_id))
+        revoked = [row['id'] for row in cursor.fetchall()]
+        conn.commit()
+    finally:
+        conn.close()
+
+    for session_id in revoked:
+        revocation_list.add(session_id)
+    return len(revoked)
+
+def session_revoked(session_id):
+    """Authoritative check, used only when the revocation filter reports a hit"""
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT revoked_at FROM auth_sessions WHERE id = %s', (session_id,))
+        row = cursor.fetchone()
+        return row is None or row['revoked_at'] is not None
+    finally:
+        conn.close()
+
+def is_revoked(session_id):
+    return revocation_list.is_revoked(session_id, session_revoked)
+
+def list_sessions(customer_id):
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, created_at, refreshed_at, expires_at, user_agent, ip_address
+            FROM auth_sessions
+            WHERE customer_id = %s AND revoked_at IS NULL AND expires_at > NOW()
+            ORDER BY refreshed_at DESC
+        """, (customer_id,))
+        return [{
+            'id': row['id'],
+            'created_at': row['created_at'].isoformat(),
+            'last_refreshed_at': row['refreshed_at'].isoformat(),
+            'expires_at': row['expires_at'].isoformat(),
+            'user_agent': row['user_agent'],
+            'ip_address': row['ip_address']
+        } for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def purge_sessions(retention_days=7):
+    """Delete sessions that expired or were revoked more than retention_days ago"""
+    conn = db_config.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM auth_sessions
+            WHERE expires_at < NOW() - (%s * INTERVAL '1 day')
+            OR revoked_at < NOW() - (%s * INTERVAL '1 day')
+        """, (retention_days, retention_days))
+        deleted = cursor.rowcount
+        conn.commit()
+        return deleted
+    finally:
+        conn.close()
@@ -0,0 +1,34 @@
+import sqlite3
+
+# Blueprints talk to PostgreSQL (psycopg2, %s placeholders) or to the local
+# SQLite file (sqlite3, ? placeholders). Shared helpers write their SQL with
+# %s and run it through here so the same statement works on either cursor.
+
+def is_sqlite(cursor):
+    """Check whether a DB-API cursor belongs to a SQLite connection"""
+    return isinstance(cursor, sqlite3.Cursor)
+
+def adapt_query(cursor, query):
+    """Convert %s placeholders to ? for SQLite cursors"""
+    if is_sqlite(cursor):
+        return query.replace('%s', '?')
+    return query
+
+def execute(cursor, query, params=()):
+    """Execute a %s-style query on either database"""
+    cursor.execute(adapt_query(cursor, query), params)
+    return cursor
+
+def executemany(cursor, query, params_list):
+    """Execute a %s-style query once per parameter tuple on either database"""
+    cursor.executemany(adapt_query(cursor, query), params_list)
+    return cursor
+
+def chunked(values, size=500):
+    """Split a list into chunks that fit in an IN (...) clause"""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def in_clause(values):
+    """Build the placeholder list for an IN (...) clause"""
+    return ', '.join(['%s'] * len(values))
@@ -0,0 +1,159 @@
+from flask import has_request_context, request
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+# Structured, non-blocking logging.
+#
+# Loggers hand records to a QueueHandler; a QueueListener thread formats them
+# and does the actual write to stdout, so a request never waits on the log
+# pipe. The queue is bounded, and when it is full records are dropped (and
+# counted) rather than blocking the caller.
+#
+# Output is one JSON object per line (LOG_FORMAT=text for local development)
+# with the request's method, path and client address attached when logged
+# inside a request. Fields passed with extra={...} are included as-is.
+#
+#   LOG_LEVEL=INFO                                   root level
+#   LOG_LEVELS=src.routes.twilio_routes=DEBUG,...    per-module levels
+#   LOG_DEBUG_SAMPLE_RATE=0.1                        keep 10% of DEBUG records
+#
+# A single noisy line can also be sampled with extra={'sample_rate': 0.01}.
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_LEVELS = os.environ.get('LOG_LEVELS', '')
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json').lower()
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get('LOG_DEBUG_SAMPLE_RATE', 1.0))
+
+# LogRecord attributes that aren't user-supplied extras
+RESERVED_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sample_rate'}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class RequestContextFilter(logging.Filter):
+    """Attach request details while still on the request thread"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.http_method = request.method
+            record.path = request.path
+            record.client_ip = request.remote_addr
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep DEBUG records (or records with a sample_rate extra) at their sample rate"""
+
+    def __init__(self, debug_rate=LOG_DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.debug_rate = debug_rate
+
+    def filter(self, record):
+        rate = getattr(record, 'sample_rate', None)
+        if rate is None:
+            rate = self.debug_rate if record.levelno <= logging.DEBUG else 1.0
+        return rate >= 1.0 or random.random() < rate
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self.lock_dropped = threading.Lock()
+
+    def prepare(self, record):
+        # Merge the message and render the traceback here, but leave the record's
+        # fields alone (the stock prepare() flattens everything into msg)
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.lock_dropped:
+                self.dropped += 1
+
+def parse_levels(spec):
+    """'a.b=DEBUG,c=WARNING' -> {'a.b': 'DEBUG', 'c': 'WARNING'}"""
+    levels = {}
+    for part in spec.split(','):
+        name, _, level = part.strip().partition('=')
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+listener = None
+queue_handler = None
+configured_pid = None
+
+def configure_logging():
+    """Route all logging through the queue. Safe to call more than once per process"""
+    global listener, queue_handler, configured_pid
+    if configured_pid == os.getpid():
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == 'text':
+        stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    else:
+        stream.setFormatter(JsonFormatter())
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    queue_handler.addFilter(SamplingFilter())
+    queue_handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, stream, respect_handler_level=False)
+    listener.start()
+    configured_pid = os.getpid()
+
+def logging_stats():
+    return {
+        'queued': queue_handler.queue.qsize() if queue_handler else 0,
+        'dropped': queue_handler.dropped if queue_handler else 0
+    }
+
+@atexit.register
+def stop_listener():
+    # Flushes whatever is still queued
+    if listener is not None and configured_pid == os.getpid():
+        listener.stop()
@@ -0,0 +1,163 @@
+from flask import g, request, make_response, Response
+from functools import wraps
+import hashlib
+import logging
+import os
+import threading
+from src.database_config import db_config
+
+logger = logging.getLogger(__name__)
+
+# Per-table change counters used for ETags. Each counter lives in the store
+# that owns the table, so a listing is only ever tagged by writes it can see:
+# - PostgreSQL tables get one sequence each (table_version_<table>). nextval()
+#   takes no row lock and leaves no dead tuples, so concurrent writers never
+#   queue on a shared counter row. Sequences are not transactional, so writers
+#   bump right after their commit: a reader can see new rows under an old tag
+#   (one extra download), never old rows under a new tag. Versions are read on
+#   one long-lived autocommit connection per process, not a new one per GET.
+# - SQLite tables get a table_versions table in the same file, bumped inside
+#   the writer's transaction. SQLite serializes writers anyway, and reading the
+#   counter is a local file read.
+# Listings tag responses with the current counters, so a client holding an
+# up-to-date ETag gets a 304 without the listing query ever running. Place
+# conditional_get() above cached_response() so the cache keys on the same
+# counters.
+
+# Sequences are created in db_config._init_postgres_tables()
+POSTGRES_VERSIONED_TABLES = ('inventory',)
+
+SQLITE_DDL = [
+    '''
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+]
+
+_reader_lock = threading.Lock()
+_reader = {'conn': None, 'pid': None}
+
+def sequence_name(table):
+    """Name of the PostgreSQL sequence counting writes to a table"""
+    if table not in POSTGRES_VERSIONED_TABLES:
+        raise ValueError(f'{table} has no version sequence')
+    return f'table_version_{table}'
+
+def init_sqlite_versions_table(cursor):
+    """Create the table_versions table in a SQLite database"""
+    for statement in SQLITE_DDL:
+        cursor.execute(statement)
+
+def bump_version(conn, *tables):
+    """Bump PostgreSQL table versions; call right after the write's conn.commit()"""
+    # The write has committed, so a failed bump must not turn it into a 500
+    try:
+        cursor = conn.cursor()
+        for table in sorted(tables):
+            cursor.execute('SELECT nextval(%s)', (sequence_name(table),))
+        conn.commit()
+    except Exception as e:
+        logger.warning('Table version bump failed for %s: %s', ', '.join(tables), e)
+
+def bump_sqlite_version(cursor, *tables):
+    """Bump table versions inside the caller's SQLite transaction"""
+    for table in sorted(tables):
+        cursor.execute('''
+            INSERT INTO table_versions (table_name, version, updated_at)
+            VALUES (?, 1, CURRENT_TIMESTAMP)
+            ON CONFLICT (table_name) DO UPDATE SET
+                version = version + 1,
+                updated_at = CURRENT_TIMESTAMP
+        ''', (table,))
+
+def _postgres_reader():
+    """The process's version-reading connection, reconnecting after errors or a fork"""
+    conn = _reader['conn']
+    if conn is None or conn.closed or _reader['pid'] != os.getpid():
+        conn = db_config.get_connection()
+        conn.autocommit = True
+        _reader.update(conn=conn, pid=os.getpid())
+    return conn
+
+def get_versions(*tables, connect=None):
+    """Current version of each table, 0 for tables never written.
+
+    connect is the SQLite connection factory of listings served from the local
+    store; without it the versions come from the PostgreSQL sequences.
+    """
+    if connect is not None:
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT table_name, version FROM table_versions
+                WHERE table_name IN ({', '.join('?' for _ in tables)})
+            ''', tables)
+            versions = {row[0]: row[1] for row in cursor.fetchall()}
+        finally:
+            conn.close()
+        return {table: versions.get(table, 0) for table in tables}
+
+    query = ' UNION ALL '.join(
+        f'SELECT %s AS table_name, CASE WHEN is_called THEN last_value ELSE 0 END AS version FROM {sequence_name(table)}'
+        for table in tables
+    )
+    with _reader_lock:
+        conn = _postgres_reader()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, tables)
+            rows = cursor.fetchall()
+        except Exception:
+            conn.close()
+            _reader['conn'] = None
+            raise
+    return {row['table_name']: row['version'] for row in rows}
+
+def compute_etag(versions):
+    """Strong ETag value (unquoted) from table versions plus the route and normalized query args"""
+    args = '&'.join(f'{name}={value}' for name, value in sorted(request.args.items(multi=True)))
+    digest = hashlib.sha1(f'{request.path}?{args}'.encode()).hexdigest()[:12]
+    tag = '-'.join(f'{table}.{version}' for table, version in sorted(versions.items()))
+    return f'{tag}-{digest}'
+
+def conditional_get(*tables, connect=None):
+    """Answer If-None-Match with 304 when none of the listed tables changed.
+
+    Pass connect (the route module's SQLite connection factory) when the
+    listing reads the local SQLite store rather than PostgreSQL.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            # Versions are read before the view runs, so a write that lands in
+            # between yields a newer body with an older tag - never the reverse.
+            try:
+                versions = get_versions(*tables, connect=connect)
+            except Exception as e:
+                logger.warning('Table version lookup failed, serving without ETag: %s', e)
+                return view(*args, **kwargs)
+            etag = compute_etag(versions)
+            # cached_response() keys on these, so its body matches the ETag
+            g.table_versions = versions
+
+            # If-None-Match is a list of tags compared weakly, or * for any
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator